@@ -1,12 +1,23 @@
+import time
+from typing import TYPE_CHECKING, AsyncIterator
+
 import gradio as gr
 import hydra
 import omegaconf
 from dotenv import load_dotenv
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from loguru import logger
 
-from src.ucl_module_chat.chains.rag_chain import build_rag_chain
+from src.ucl_module_chat.chains.lazy_chain import LazyChain
 from src.ucl_module_chat.utils.resolve_paths import get_abs_path_using_repo_root
 
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_core.messages import BaseMessage
+    from langchain_core.runnables import Runnable
+
+    from src.ucl_module_chat.chains.caching import RagCache
+    from src.ucl_module_chat.chains.history import HistoryManager
+
 load_dotenv()
 
 # Text paragraph to be added below the title
@@ -28,8 +39,10 @@ examples = [
 ]
 
 
-def convert_history(history: list[dict]) -> list[BaseMessage]:
+def convert_history(history: list[dict]) -> list["BaseMessage"]:
     """Convert conversation history into Langchain messages"""
+    from langchain_core.messages import AIMessage, HumanMessage
+
     lc_history = []
     for msg in history:
         if msg["role"] == "user":
@@ -39,32 +52,140 @@ def convert_history(history: list[dict]) -> list[BaseMessage]:
     return lc_history
 
 
+def describe_context(context: list["Document"]) -> list[str]:
+    """Summarise retrieved documents by their title line for logging."""
+    return [doc.page_content.strip().split("\n", 1)[0] for doc in context]
+
+
+def build_llm(cfg: omegaconf.DictConfig) -> "Runnable":
+    """Instantiate the LLM shared by the RAG chain and history summaries, bounded
+    to `app.max_concurrent_llm_calls` in-flight calls."""
+    from src.ucl_module_chat.chains.from_config import llm_from_config
+
+    return llm_from_config(cfg)
+
+
+def build_chain(
+    cfg: omegaconf.DictConfig,
+    cache: "RagCache | None" = None,
+    llm: "Runnable | None" = None,
+) -> "Runnable":
+    """Instantiate the models and build the RAG chain.
+
+    LangChain, the model clients and the vectorstore are imported and loaded
+    here rather than at module import, so they can be loaded after the UI starts.
+    """
+    from src.ucl_module_chat.chains.from_config import rag_chain_from_config
+
+    return rag_chain_from_config(cfg, cache, llm)
+
+
+def build_cache(cfg: omegaconf.DictConfig) -> "RagCache | None":
+    """Create the cache for the RAG chain, if enabled."""
+    from src.ucl_module_chat.chains.from_config import cache_from_config
+
+    return cache_from_config(cfg)
+
+
+def build_history_manager(
+    cfg: omegaconf.DictConfig, llm: "Runnable | None" = None
+) -> "HistoryManager | None":
+    """Create the manager that keeps the chat history within budget, if a budget
+    is set."""
+    from src.ucl_module_chat.chains.from_config import history_manager_from_config
+
+    return history_manager_from_config(cfg, llm)
+
+
 @hydra.main(
     version_base=None, config_path="src/ucl_module_chat/conf", config_name="config"
 )
 def main(cfg: omegaconf.DictConfig) -> None:
-    """Run the UCL module chatbot in a Gradio interface."""
-
-    vectorstore_dir = get_abs_path_using_repo_root(cfg.vectorstore.dir)
-    llm = hydra.utils.instantiate(cfg.models.llm)
-    embedding_model = hydra.utils.instantiate(cfg.models.embedding)
-    rag_chain = build_rag_chain(
-        llm=llm, embedding_model=embedding_model, vectorstore_dir=vectorstore_dir
-    )
-
-    def chat(input: str, history: list[dict] = None) -> str:
-        result = rag_chain.invoke(
-            {"input": input, "chat_history": convert_history(history)},
+    """Run the UCL module chatbot in a Gradio interface.
+
+    The chain is built once and shared by all requests. With `app.fast_start`, it
+    is built in the background while the UI starts, and the first requests wait
+    for it; otherwise it is built before the UI is launched.
+    """
+    cache = None
+    history_manager = None
+
+    def build() -> "Runnable":
+        nonlocal cache, history_manager
+        cache = build_cache(cfg)
+        llm = build_llm(cfg)
+        history_manager = build_history_manager(cfg, llm)
+        return build_chain(cfg, cache, llm)
+
+    lazy_chain = LazyChain(build)
+    if cfg.app.fast_start:
+        lazy_chain.start_background_build()
+    else:
+        lazy_chain.get()
+
+    metrics = None
+    if cfg.metrics.enabled:
+        from src.ucl_module_chat.chains.tracing import TracingCallbackHandler
+        from src.ucl_module_chat.utils.metrics import (
+            RequestMetrics,
+            start_metrics_server,
         )
-        return result["answer"]
+
+        jsonl_path = cfg.metrics.jsonl_path
+        metrics = RequestMetrics(
+            get_abs_path_using_repo_root(jsonl_path) if jsonl_path else None
+        )
+        if cfg.metrics.port is not None:
+            start_metrics_server(metrics, cfg.metrics.port)
+
+    async def chat(
+        input: str, history: list[dict], request: gr.Request
+    ) -> AsyncIterator[str]:
+        """Stream the answer to the UI as tokens are generated by the qa stage."""
+        start = time.perf_counter()
+        rag_chain = await lazy_chain.aget()
+        chat_history = convert_history(history)
+        if history_manager is not None:
+            chat_history = await history_manager.acompact(
+                request.session_hash, chat_history
+            )
+        # Without metrics, no callback handler is attached to the chain
+        tracer = TracingCallbackHandler() if metrics is not None else None
+        answer = ""
+        context = []
+        async for chunk in rag_chain.astream(
+            {"input": input, "chat_history": chat_history},
+            config={"callbacks": [tracer]} if tracer is not None else None,
+        ):
+            # The "answer" key is streamed token by token from the qa-tagged chain,
+            # "context" holds the retrieved documents
+            if "context" in chunk:
+                context = chunk["context"]
+            if "answer" in chunk:
+                if not answer:
+                    ttft = time.perf_counter() - start
+                    logger.info(f"Time to first token: {ttft:.2f}s")
+                answer += chunk["answer"]
+                yield answer
+        logger.info(f"Retrieved context: {describe_context(context)}")
+        logger.info(f"Answer completed in {time.perf_counter() - start:.2f}s")
+        if cache is not None:
+            logger.debug(f"Cache stats: {cache.stats()}")
+        if tracer is not None:
+            metrics.record(tracer.trace())
 
     with gr.Blocks(fill_height=True) as module_chat:
         gr.Markdown("# Chat with the module catalogue")
         gr.Markdown(description)
         gr.ChatInterface(
-            fn=chat, type="messages", examples=examples, cache_examples=False
+            fn=chat,
+            type="messages",
+            examples=examples,
+            cache_examples=False,
+            concurrency_limit=cfg.app.concurrency_limit,
         )
 
+    module_chat.queue(max_size=cfg.app.max_queue_size)
     module_chat.launch()
 
 
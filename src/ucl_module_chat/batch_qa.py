@@ -0,0 +1,230 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import hydra
+import numpy as np
+import omegaconf
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.messages import convert_to_messages
+from langchain_core.runnables import Runnable, RunnableLambda
+from loguru import logger
+
+from ucl_module_chat.chains.from_config import (
+    cache_from_config,
+    history_manager_from_config,
+    llm_from_config,
+    rag_chain_from_config,
+)
+from ucl_module_chat.chains.history import HistoryManager
+from ucl_module_chat.chains.tracing import TracingCallbackHandler
+from ucl_module_chat.retrieval.module_codes import module_code_from_markdown
+from ucl_module_chat.utils.resolve_paths import get_abs_path_using_repo_root
+
+load_dotenv()
+
+
+def read_questions(input_path: str | Path) -> list[dict]:
+    """Read questions from a JSONL file, one object per line with a "question",
+    an optional "id" (the line number if not given) and an optional
+    "chat_history" of {"role", "content"} messages."""
+    items = []
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "question" not in item:
+                raise ValueError(f"No question on line {line_number} of {input_path}")
+            items.append(
+                {
+                    "id": item.get("id", line_number),
+                    "question": item["question"],
+                    "chat_history": item.get("chat_history", []),
+                }
+            )
+    return items
+
+
+def answered_ids(output_path: str | Path) -> set:
+    """IDs of the questions answered without error in an existing output file."""
+    ids = set()
+    if not Path(output_path).exists():
+        return ids
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be incomplete if the previous run was killed
+                continue
+            if "error" not in result:
+                ids.add(result["id"])
+    return ids
+
+
+def _end_incomplete_line(output_path: Path) -> None:
+    """End the last line of the output file if the previous run was killed while
+    writing it, so that new results start on a new line."""
+    if not output_path.exists() or output_path.stat().st_size == 0:
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(-1, 2)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def _module_codes(context: list[Document]) -> list[str]:
+    """Module codes of the documents passed to the LLM, in rank order, read from
+    the document text if missing from the metadata (as in older vectorstores)."""
+    codes = [
+        doc.metadata.get("module_code") or module_code_from_markdown(doc.page_content)
+        for doc in context
+    ]
+    return list(dict.fromkeys(code for code in codes if code))
+
+
+def answer_runnable(
+    rag_chain: Runnable, history_manager: HistoryManager | None = None
+) -> Runnable:
+    """Wrap the RAG chain to take a question item and return its output record,
+    with the retrieved module codes and the latency of each stage."""
+
+    async def answer(item: dict) -> dict:
+        tracer = TracingCallbackHandler()
+        chat_history = convert_to_messages(item["chat_history"])
+        if history_manager is not None and chat_history:
+            chat_history = await history_manager.acompact(str(item["id"]), chat_history)
+        output = await rag_chain.ainvoke(
+            {"input": item["question"], "chat_history": chat_history},
+            config={"callbacks": [tracer]},
+        )
+        trace = tracer.trace()
+        return {
+            "id": item["id"],
+            "question": item["question"],
+            "answer": output["answer"],
+            "module_codes": _module_codes(output["context"]),
+            "latency_seconds": trace["total_seconds"],
+            "stage_seconds": trace["stage_seconds"],
+            "tokens": trace["tokens"],
+            "cache_hits": trace["cache_hits"],
+            "coalesced": trace["coalesced"],
+        }
+
+    return RunnableLambda(answer, name="batch_qa")
+
+
+async def _run_batch(
+    runnable: Runnable, items: list[dict], max_concurrency: int, output_path: Path
+) -> list[dict]:
+    """Answer the items with at most `max_concurrency` at once, appending each
+    result to the output file as soon as it is complete."""
+    results = []
+    with open(output_path, "a", encoding="utf-8") as f:
+        async for i, result in runnable.abatch_as_completed(
+            items, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        ):
+            if isinstance(result, Exception):
+                logger.warning(f"Question {items[i]['id']} failed: {result!r}")
+                result = {
+                    "id": items[i]["id"],
+                    "question": items[i]["question"],
+                    "error": repr(result),
+                }
+            f.write(json.dumps(result) + "\n")
+            f.flush()
+            results.append(result)
+            if len(results) % 10 == 0 or len(results) == len(items):
+                logger.info(f"Answered {len(results)}/{len(items)} questions")
+    return results
+
+
+def _log_summary(results: list[dict], elapsed: float) -> dict[str, float]:
+    latencies = [r["latency_seconds"] for r in results if "error" not in r]
+    summary = {
+        "n_answered": len(latencies),
+        "n_errors": len(results) - len(latencies),
+        "elapsed_seconds": elapsed,
+        "questions_per_second": len(results) / elapsed if elapsed > 0 else 0.0,
+    }
+    if latencies:
+        summary["latency_p50_seconds"], summary["latency_p95_seconds"] = (
+            float(p) for p in np.percentile(latencies, [50, 95])
+        )
+    logger.info(
+        f"Answered {summary['n_answered']} questions ({summary['n_errors']} errors) "
+        f"in {elapsed:.1f}s, {summary['questions_per_second']:.2f} questions/sec"
+    )
+    if latencies:
+        logger.info(
+            f"Latency p50 {summary['latency_p50_seconds']:.2f}s, "
+            f"p95 {summary['latency_p95_seconds']:.2f}s"
+        )
+    return summary
+
+
+def run_batch_qa(
+    rag_chain: Runnable,
+    input_path: str | Path,
+    output_path: str | Path,
+    max_concurrency: int = 8,
+    resume: bool = True,
+    history_manager: HistoryManager | None = None,
+) -> dict[str, float]:
+    """Answer the questions in `input_path` and write a JSONL record per question
+    to `output_path`, with the answer, the codes of the modules retrieved as
+    context, the latency of the request and of each stage, the tokens used, any
+    cache hits and whether it shared the execution of an identical question.
+    Chat histories are compacted by `history_manager`, if given, as in the app.
+
+    Questions are answered with at most `max_concurrency` in flight, and results
+    are written in the order they complete. With `resume`, questions already
+    answered in `output_path` are skipped and new results are appended; questions
+    that failed are tried again. Otherwise the output file is overwritten.
+    Returns the throughput and latency of the run.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    items = read_questions(input_path)
+    if resume:
+        done = answered_ids(output_path)
+        n_items = len(items)
+        items = [item for item in items if item["id"] not in done]
+        logger.info(f"Skipping {n_items - len(items)} questions already answered")
+        _end_incomplete_line(output_path)
+    else:
+        output_path.unlink(missing_ok=True)
+    logger.info(f"Answering {len(items)} questions, {max_concurrency} at a time")
+
+    start = time.perf_counter()
+    results = asyncio.run(
+        _run_batch(
+            answer_runnable(rag_chain, history_manager),
+            items,
+            max_concurrency,
+            output_path,
+        )
+    )
+    return _log_summary(results, time.perf_counter() - start)
+
+
+@hydra.main(version_base=None, config_path="conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Answer a JSONL file of questions with the RAG chain configured for the app."""
+    cache = cache_from_config(cfg) if cfg.batch_qa.use_cache else None
+    llm = llm_from_config(cfg)
+    run_batch_qa(
+        rag_chain_from_config(cfg, cache, llm),
+        input_path=get_abs_path_using_repo_root(cfg.batch_qa.input_path),
+        output_path=get_abs_path_using_repo_root(cfg.batch_qa.output_path),
+        max_concurrency=cfg.batch_qa.max_concurrency,
+        resume=cfg.batch_qa.resume,
+        history_manager=history_manager_from_config(cfg, llm),
+    )
+
+
+if __name__ == "__main__":
+    main()
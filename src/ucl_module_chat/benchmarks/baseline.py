@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+from loguru import logger
+
+# Metrics for which a higher value is better, matched by name
+HIGHER_IS_BETTER = ("throughput", "recall", "mrr")
+# Timing metrics, which may be given a looser tolerance than quality metrics
+TIMING_SUFFIXES = ("_ms", "_seconds", "_rps", "_qps")
+
+
+def compare_to_baseline(
+    results: dict[str, float],
+    baseline: dict[str, float],
+    tolerance: float,
+    timing_tolerance: float | None = None,
+) -> list[str]:
+    """Log the change in each metric from the baseline and return the names of
+    metrics that are worse by more than `tolerance` (as a fraction), or by more
+    than `timing_tolerance` for timing metrics, if given."""
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline or baseline[name] == 0:
+            continue
+        change = value / baseline[name] - 1
+        worse = -change if any(s in name for s in HIGHER_IS_BETTER) else change
+        limit = tolerance
+        if timing_tolerance is not None and name.endswith(TIMING_SUFFIXES):
+            limit = timing_tolerance
+        flag = "  REGRESSION" if worse > limit else ""
+        logger.info(
+            f"{name:>40}: {value:10.2f} (baseline {baseline[name]:10.2f}, "
+            f"{change:+.1%}){flag}"
+        )
+        if worse > limit:
+            regressions.append(name)
+    return regressions
+
+
+def check_baseline(
+    results: dict[str, float],
+    params: dict,
+    baseline_path: Path,
+    tolerance: float,
+    update_baseline: bool,
+    timing_tolerance: float | None = None,
+) -> list[str]:
+    """Compare results with the baseline saved at `baseline_path`, if it was
+    recorded with the same parameters, and return the names of the metrics that
+    regressed. The baseline is written if it does not exist or if
+    `update_baseline` is set."""
+    baseline_exists = baseline_path.exists()
+    baseline = None
+    if baseline_exists:
+        baseline = json.loads(baseline_path.read_text())
+        if baseline["params"] != params:
+            logger.warning(
+                f"Baseline {baseline_path} was recorded with different parameters "
+                f"({baseline['params']}), not comparing"
+            )
+            baseline = None
+
+    regressions = []
+    if baseline is None:
+        for name, value in results.items():
+            logger.info(f"{name:>40}: {value:10.2f}")
+    else:
+        regressions = compare_to_baseline(
+            results, baseline["results"], tolerance, timing_tolerance
+        )
+        if regressions:
+            logger.warning(
+                f"{len(regressions)} metrics regressed beyond the tolerance: "
+                f"{regressions}"
+            )
+
+    if not baseline_exists or update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(
+            json.dumps({"params": params, "results": results}, indent=2)
+        )
+        logger.info(f"Saved baseline to {baseline_path}")
+    return regressions
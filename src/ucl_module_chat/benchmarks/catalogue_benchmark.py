@@ -0,0 +1,111 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import hydra
+import jinja2
+import omegaconf
+from loguru import logger
+
+from ucl_module_chat.benchmarks.synthetic_catalogue import write_synthetic_html_corpus
+from ucl_module_chat.data_processing.document_conversion import (
+    _extract_module_info_from_html,
+    _module_info_to_markdown,
+    _module_metadata,
+    convert_all_documents_html_to_markdown,
+)
+from ucl_module_chat.data_processing.document_embedding import (
+    _load_catalogue_documents,
+    _load_module_documents,
+)
+from ucl_module_chat.data_processing.document_templates import (
+    module_template,
+    module_template_source,
+)
+
+
+def _write_file_per_module(
+    html_dir: Path, md_dir: Path, template: jinja2.Template
+) -> None:
+    """Parse every page and write a markdown document and a JSON metadata file
+    per module, as in the layout before the catalogue store. A change to the
+    template meant parsing every page again."""
+    md_dir.mkdir(parents=True, exist_ok=True)
+    for module_html_path in html_dir.glob("*.html"):
+        module_info = _extract_module_info_from_html(module_html_path.read_text())
+        stem = module_html_path.stem
+        (md_dir / f"{stem}.md").write_text(
+            _module_info_to_markdown(module_info, template), encoding="utf-8"
+        )
+        (md_dir / f"{stem}.json").write_text(
+            json.dumps(_module_metadata(module_info)), encoding="utf-8"
+        )
+
+
+def _disk_usage(paths: list[Path]) -> tuple[int, int]:
+    """Bytes allocated on disk and apparent size in bytes of a list of files."""
+    stats = [path.stat() for path in paths]
+    return sum(s.st_blocks * 512 for s in stats), sum(s.st_size for s in stats)
+
+
+def run_catalogue_benchmark(n_modules: int) -> dict[str, float]:
+    """Compare the catalogue store with a markdown and a JSON file per module.
+
+    Reports the time to build each from a synthetic corpus of HTML pages, the time
+    to get the documents ready for embedding after the markdown template changes,
+    and the disk space used by each.
+    """
+    changed_template = jinja2.Template(module_template_source + "\nUpdated template")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        html_dir = Path(tmp_dir) / "html"
+        md_dir = Path(tmp_dir) / "module_md"
+        catalogue_path = Path(tmp_dir) / "module_catalogue.sqlite"
+        write_synthetic_html_corpus(html_dir, n_modules)
+
+        start = time.perf_counter()
+        _write_file_per_module(html_dir, md_dir, module_template)
+        _load_module_documents(md_dir)
+        results["files_build_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        convert_all_documents_html_to_markdown(html_dir, catalogue_path)
+        _load_catalogue_documents(catalogue_path)
+        results["store_build_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _write_file_per_module(html_dir, md_dir, changed_template)
+        _load_module_documents(md_dir)
+        results["files_template_change_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _load_catalogue_documents(catalogue_path, changed_template)
+        results["store_template_change_seconds"] = time.perf_counter() - start
+
+        allocated, apparent = _disk_usage(list(md_dir.iterdir()))
+        results["files_disk_bytes"] = allocated
+        results["files_apparent_bytes"] = apparent
+        allocated, apparent = _disk_usage([catalogue_path])
+        results["store_disk_bytes"] = allocated
+        results["store_apparent_bytes"] = apparent
+
+    logger.info(f"Catalogue benchmark: {n_modules} synthetic module pages")
+    for layout, name in [("files", "File per module"), ("store", "Catalogue store")]:
+        logger.info(
+            f"{name:>16}: build {results[f'{layout}_build_seconds']:6.2f}s, "
+            f"template change {results[f'{layout}_template_change_seconds']:6.2f}s, "
+            f"{results[f'{layout}_disk_bytes'] / 1e6:7.2f} MB on disk "
+            f"({results[f'{layout}_apparent_bytes'] / 1e6:.2f} MB of data)"
+        )
+    return results
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Benchmark the catalogue store against a file per module."""
+    run_catalogue_benchmark(**cfg.benchmarks.catalogue)
+
+
+if __name__ == "__main__":
+    main()
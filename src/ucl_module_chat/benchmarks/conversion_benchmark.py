@@ -0,0 +1,50 @@
+import tempfile
+import time
+from pathlib import Path
+
+import hydra
+import omegaconf
+from loguru import logger
+
+from ucl_module_chat.benchmarks.synthetic_catalogue import write_synthetic_html_corpus
+from ucl_module_chat.data_processing.document_conversion import (
+    convert_all_documents_html_to_markdown,
+)
+
+
+def run_conversion_benchmark(
+    n_modules: int, modes: dict[str, dict]
+) -> dict[str, float]:
+    """Convert a synthetic corpus with each set of options and report files/sec."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        html_dir = Path(tmp_dir) / "html"
+        write_synthetic_html_corpus(html_dir, n_modules)
+        for name, options in modes.items():
+            catalogue_path = Path(tmp_dir) / f"{name}.sqlite"
+            start = time.perf_counter()
+            stats = convert_all_documents_html_to_markdown(
+                html_dir, catalogue_path, use_cache=False, **options
+            )
+            elapsed_seconds = time.perf_counter() - start
+            if stats.errors:
+                logger.warning(
+                    f"{len(stats.errors)} files failed to convert in mode {name}"
+                )
+            results[name] = n_modules / elapsed_seconds
+
+    logger.info(f"Conversion benchmark: {n_modules} synthetic module pages")
+    for name, files_per_second in results.items():
+        logger.info(f"{name:>24}: {files_per_second:8.1f} files/sec")
+    return results
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Benchmark serial and parallel extraction of module information."""
+    cfg = omegaconf.OmegaConf.to_container(cfg.benchmarks.conversion)
+    run_conversion_benchmark(**cfg)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import asyncio
+import tempfile
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+import hydra
+import numpy as np
+import omegaconf
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import Runnable
+from loguru import logger
+
+from ucl_module_chat.benchmarks.baseline import check_baseline
+from ucl_module_chat.benchmarks.stub_models import (
+    SimulatedLatencyChatModel,
+    SimulatedLatencyEmbeddings,
+)
+from ucl_module_chat.benchmarks.synthetic_catalogue import (
+    write_synthetic_markdown_corpus,
+)
+from ucl_module_chat.chains.rag_chain import build_rag_chain
+from ucl_module_chat.chains.tracing import STAGES, TracingCallbackHandler
+from ucl_module_chat.data_processing.document_embedding import (
+    embed_documents,
+    save_vectorstore,
+)
+from ucl_module_chat.utils.resolve_paths import get_abs_path_using_repo_root
+
+QUESTIONS = [
+    "When can I take a module on medical statistics?",
+    "What are the prerequisites for taking Supervised Learning?",
+    "Which modules cover Bayesian inference?",
+    "How is COMP0078 assessed?",
+]
+CHAT_HISTORY = [
+    HumanMessage("Are there any modules on machine learning?"),
+    AIMessage("Yes, for example Supervised Learning (COMP0078)."),
+]
+
+# Timings of the request being served, for query embeddings to be added to
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class TimedEmbeddings(Embeddings):
+    """Embeddings that add the time spent embedding queries to the timings of the
+    current request, so that it can be separated from the search time."""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        start = time.perf_counter()
+        embedding = self.embeddings.embed_query(text)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings["embedding"] += time.perf_counter() - start
+        return embedding
+
+
+async def _run_requests(
+    rag_chain: Runnable, n_requests: int, concurrency: int
+) -> tuple[float, list[dict[str, float]]]:
+    """Send `n_requests` streamed requests with at most `concurrency` at once,
+    alternating between first-turn and follow-up questions, and return the
+    elapsed time and the timings of each request."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(i: int) -> dict[str, float]:
+        async with semaphore:
+            handler = TracingCallbackHandler()
+            _request_timings.set(handler.timings)
+            chat_history = CHAT_HISTORY if i % 2 else []
+            async for _ in rag_chain.astream(
+                {"input": QUESTIONS[i % len(QUESTIONS)], "chat_history": chat_history},
+                config={"callbacks": [handler]},
+            ):
+                pass
+            timings = dict(handler.timings)
+            timings["total"] = time.perf_counter() - handler.start
+            timings["search"] = timings["retrieval"] - timings["embedding"]
+            return timings
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*[request(i) for i in range(n_requests)])
+    return time.perf_counter() - start, timings
+
+
+def _summarise(elapsed: float, timings: list[dict[str, float]]) -> dict[str, float]:
+    """Throughput, and p50/p95 in milliseconds of each stage and in total."""
+    metrics = {"throughput_rps": len(timings) / elapsed}
+    for stage in ["total", "time_to_first_token", *STAGES, "embedding", "search"]:
+        # Contextualization only runs for follow-up questions
+        values = [t[stage] for t in timings if t.get(stage, 0) > 0]
+        if values:
+            p50, p95 = np.percentile(values, [50, 95]) * 1000
+            metrics[f"{stage}_p50_ms"] = float(p50)
+            metrics[f"{stage}_p95_ms"] = float(p95)
+    return metrics
+
+
+def run_e2e_benchmark(
+    n_modules: int,
+    n_requests: int,
+    concurrency: list[int],
+    embedding_size: int,
+    embedding_latency_seconds: float,
+    llm_latency_seconds: float,
+    llm_token_latency_seconds: float,
+    retrieval_mode: str,
+    k: int,
+    context_max_tokens: int | None,
+    speculative_retrieval: bool,
+    baseline_path: str,
+    tolerance: float,
+    update_baseline: bool,
+) -> dict[str, float]:
+    """Benchmark the whole pipeline offline, from embedding a synthetic catalogue
+    to answering questions, using fake embeddings and a fake chat model with
+    simulated latency.
+
+    Reports the time to embed the catalogue and build the chain, then, at each
+    concurrency level, throughput and p50/p95 latency of each stage of the chain:
+    contextualization, query embedding, search, prompt assembly and generation.
+    Results are compared with the baseline saved at `baseline_path`, relative to
+    the project root, if it was recorded with the same parameters. The baseline is
+    written if it does not exist or if `update_baseline` is set.
+    """
+    # Benchmark parameters, which must match those of the baseline to compare
+    params = dict(locals())
+    for name in ["baseline_path", "tolerance", "update_baseline"]:
+        params.pop(name)
+    embedding_model = TimedEmbeddings(
+        SimulatedLatencyEmbeddings(
+            size=embedding_size, latency_seconds=embedding_latency_seconds
+        )
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        md_dir = Path(tmp_dir) / "module_md"
+        vectorstore_dir = Path(tmp_dir) / "vectorstore"
+        write_synthetic_markdown_corpus(md_dir, n_modules)
+
+        start = time.perf_counter()
+        vectorstore = embed_documents(md_dir, embedding_model, chunk_sections=True)
+        save_vectorstore(vectorstore, vectorstore_dir)
+        results["embed_documents_seconds"] = time.perf_counter() - start
+
+        llm = SimulatedLatencyChatModel(
+            latency_seconds=llm_latency_seconds,
+            token_latency_seconds=llm_token_latency_seconds,
+        )
+        start = time.perf_counter()
+        rag_chain = build_rag_chain(
+            llm=llm,
+            embedding_model=embedding_model,
+            vectorstore_dir=vectorstore_dir,
+            retrieval_mode=retrieval_mode,
+            k=k,
+            context_max_tokens=context_max_tokens,
+            speculative_retrieval=speculative_retrieval,
+        )
+        results["build_chain_seconds"] = time.perf_counter() - start
+
+        for n_concurrent in concurrency:
+            elapsed, timings = asyncio.run(
+                _run_requests(rag_chain, n_requests, n_concurrent)
+            )
+            for name, value in _summarise(elapsed, timings).items():
+                results[f"concurrency_{n_concurrent}.{name}"] = value
+
+    logger.info(f"End-to-end benchmark: {n_modules} modules, {n_requests} requests")
+    check_baseline(
+        results,
+        params,
+        get_abs_path_using_repo_root(baseline_path),
+        tolerance,
+        update_baseline,
+    )
+    return results
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Benchmark the pipeline end to end against stub models and compare the
+    results with a stored baseline."""
+    run_e2e_benchmark(
+        **omegaconf.OmegaConf.to_container(cfg.benchmarks.e2e, resolve=True)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import tempfile
+import time
+
+import hydra
+import omegaconf
+from loguru import logger
+
+from ucl_module_chat.benchmarks.stub_models import SimulatedLatencyEmbeddings
+from ucl_module_chat.benchmarks.synthetic_catalogue import synthetic_catalogue
+from ucl_module_chat.data_processing.batch_embedding import BatchedEmbeddings
+from ucl_module_chat.data_processing.document_templates import module_template
+
+
+def run_embedding_benchmark(
+    n_documents: int,
+    embedding_size: int,
+    latency_seconds: float,
+    latency_per_text_seconds: float,
+    batch_size: int,
+    max_concurrent_batches: list[int],
+    requests_per_second: float | None = None,
+) -> dict[int, float]:
+    """Embed a synthetic corpus with fake embeddings and report docs/sec.
+
+    After measuring throughput at each concurrency setting, a run in which half of
+    the API calls fail is resumed with a working model to show that completed
+    batches are not embedded again.
+    """
+    texts = [module_template.render(info) for info in synthetic_catalogue(n_documents)]
+    model_kwargs = {
+        "size": embedding_size,
+        "latency_seconds": latency_seconds,
+        "latency_per_text_seconds": latency_per_text_seconds,
+    }
+
+    results = {}
+    for n_concurrent in max_concurrent_batches:
+        embedder = BatchedEmbeddings(
+            SimulatedLatencyEmbeddings(**model_kwargs),
+            batch_size=batch_size,
+            max_concurrent_batches=n_concurrent,
+            requests_per_second=requests_per_second,
+        )
+        start = time.perf_counter()
+        embedder.embed_documents(texts)
+        results[n_concurrent] = n_documents / (time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        try:
+            BatchedEmbeddings(
+                SimulatedLatencyEmbeddings(failure_rate=0.5, **model_kwargs),
+                batch_size=batch_size,
+                checkpoint_dir=checkpoint_dir,
+                max_retries=0,
+            ).embed_documents(texts)
+        except RuntimeError as e:
+            logger.info(f"Interrupted run failed as expected: {e}")
+        resumed_model = SimulatedLatencyEmbeddings(**model_kwargs)
+        BatchedEmbeddings(
+            resumed_model, batch_size=batch_size, checkpoint_dir=checkpoint_dir
+        ).embed_documents(texts)
+
+    n_batches = -(-n_documents // batch_size)
+    logger.info(
+        f"Embedding benchmark: {n_documents} documents, batch size {batch_size}"
+    )
+    for n_concurrent, docs_per_second in results.items():
+        logger.info(
+            f"max_concurrent_batches={n_concurrent:>3}: {docs_per_second:8.1f} docs/sec"
+        )
+    logger.info(
+        f"Resumed run made {resumed_model.n_calls} of {n_batches} batch calls "
+        "after an interrupted run"
+    )
+    return results
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Benchmark batched embedding with a deterministic fake embedding model."""
+    run_embedding_benchmark(**cfg.benchmarks.embedding)
+
+
+if __name__ == "__main__":
+    main()
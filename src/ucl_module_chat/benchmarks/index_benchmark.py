@@ -0,0 +1,125 @@
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import hydra
+import numpy as np
+import omegaconf
+from loguru import logger
+
+from ucl_module_chat.retrieval.faiss_index import configure_search, create_faiss_index
+from ucl_module_chat.utils.memory import current_rss_bytes
+
+
+def synthetic_vectors(
+    n_vectors: int, dimension: int, n_clusters: int = 100, seed: int = 0
+) -> np.ndarray:
+    """Generate clustered random vectors, which are more realistic than uniform
+    noise for approximate search."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_clusters, dimension)).astype(np.float32)
+    labels = rng.integers(n_clusters, size=n_vectors)
+    noise = rng.normal(scale=0.5, size=(n_vectors, dimension)).astype(np.float32)
+    return centres[labels] + noise
+
+
+def _benchmark_index(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    exact_neighbours: np.ndarray,
+    k: int,
+    index_config: dict,
+    search_params: dict,
+) -> dict[str, float]:
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    index = create_faiss_index(vectors, **index_config)
+    index.add(vectors)
+    build_seconds = time.perf_counter() - start
+    rss_mb = (current_rss_bytes() - rss_before) / 1e6
+    configure_search(index, **search_params)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_path = Path(tmp_dir) / "index.faiss"
+        faiss.write_index(index, str(index_path))
+        size_mb = index_path.stat().st_size / 1e6
+
+    latencies = []
+    neighbours = []
+    for query in queries:
+        start = time.perf_counter()
+        _, indices = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        neighbours.append(indices[0])
+    recall = np.mean(
+        [
+            len(set(found) & set(exact)) / k
+            for found, exact in zip(neighbours, exact_neighbours)
+        ]
+    )
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return {
+        "build_seconds": build_seconds,
+        "size_mb": size_mb,
+        "rss_mb": rss_mb,
+        "p50_ms": p50,
+        "p99_ms": p99,
+        "recall_at_k": recall,
+    }
+
+
+def run_index_benchmark(
+    n_vectors: list[int],
+    dimension: int,
+    n_queries: int,
+    k: int,
+    index_types: list[str],
+    index_config: dict,
+    search_params: dict,
+) -> dict[tuple[int, str], dict[str, float]]:
+    """Compare FAISS index types on synthetic vectors.
+
+    Reports build time, size on disk, growth in RSS during the build, p50/p99
+    single-query latency and recall@k against exact (flat) search.
+    """
+    index_config = dict(index_config)
+    index_config.pop("index_type", None)
+    search_params = dict(search_params)
+
+    results = {}
+    for n in n_vectors:
+        vectors = synthetic_vectors(n, dimension)
+        queries = synthetic_vectors(n_queries, dimension, seed=1)
+        exact_index = faiss.IndexFlatL2(dimension)
+        exact_index.add(vectors)
+        _, exact_neighbours = exact_index.search(queries, k)
+        del exact_index
+
+        for index_type in index_types:
+            results[(n, index_type)] = _benchmark_index(
+                vectors,
+                queries,
+                exact_neighbours,
+                k,
+                {**index_config, "index_type": index_type},
+                search_params,
+            )
+            r = results[(n, index_type)]
+            logger.info(
+                f"n={n:>8} {index_type:>6}: build {r['build_seconds']:7.2f}s, "
+                f"disk {r['size_mb']:8.1f}MB, RSS +{r['rss_mb']:8.1f}MB, "
+                f"p50 {r['p50_ms']:6.2f}ms, p99 {r['p99_ms']:6.2f}ms, "
+                f"recall@{k} {r['recall_at_k']:.3f}"
+            )
+    return results
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Benchmark FAISS index types for build cost, size, latency and recall."""
+    run_index_benchmark(**cfg.benchmarks.faiss_index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import asyncio
+import tempfile
+import time
+
+import hydra
+import numpy as np
+import omegaconf
+from langchain_core.runnables import Runnable
+from loguru import logger
+
+from ucl_module_chat.benchmarks.stub_models import (
+    SimulatedLatencyChatModel,
+    SimulatedLatencyEmbeddings,
+)
+from ucl_module_chat.benchmarks.synthetic_catalogue import build_synthetic_vectorstore
+from ucl_module_chat.chains.rag_chain import build_rag_chain
+
+QUESTIONS = [
+    "When can I take a module on medical statistics?",
+    "What are the prerequisites for taking Supervised Learning?",
+    "Which modules cover Bayesian inference?",
+    "How is COMP0078 assessed?",
+]
+
+
+async def _run_requests(
+    rag_chain: Runnable, n_requests: int, concurrency: int
+) -> tuple[float, list[float]]:
+    """Send `n_requests` streamed requests with at most `concurrency` at once."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(question: str) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            async for _ in rag_chain.astream({"input": question, "chat_history": []}):
+                pass
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(
+        *[request(QUESTIONS[i % len(QUESTIONS)]) for i in range(n_requests)]
+    )
+    return time.perf_counter() - start, latencies
+
+
+def run_load_test(
+    n_modules: int,
+    n_requests: int,
+    concurrency: list[int],
+    max_concurrent_llm_calls: int | None,
+    llm_latency_seconds: float,
+    llm_token_latency_seconds: float,
+    embedding_latency_seconds: float,
+) -> dict[int, float]:
+    """Serve requests through the async chain with a stub LLM at rising concurrency.
+
+    Reports throughput and latency percentiles at each concurrency level, along
+    with the peak number of concurrent LLM calls.
+    """
+    embedding_model = SimulatedLatencyEmbeddings(
+        size=256, latency_seconds=embedding_latency_seconds
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as vectorstore_dir:
+        build_synthetic_vectorstore(vectorstore_dir, n_modules, embedding_model)
+        for n_concurrent in concurrency:
+            llm = SimulatedLatencyChatModel(
+                latency_seconds=llm_latency_seconds,
+                token_latency_seconds=llm_token_latency_seconds,
+            )
+            rag_chain = build_rag_chain(
+                llm=llm,
+                embedding_model=embedding_model,
+                vectorstore_dir=vectorstore_dir,
+                max_concurrent_llm_calls=max_concurrent_llm_calls,
+            )
+            elapsed, latencies = asyncio.run(
+                _run_requests(rag_chain, n_requests, n_concurrent)
+            )
+            results[n_concurrent] = n_requests / elapsed
+            p50, p95 = np.percentile(latencies, [50, 95])
+            logger.info(
+                f"concurrency={n_concurrent:>3}: {results[n_concurrent]:6.2f} req/s, "
+                f"p50 {p50:.2f}s, p95 {p95:.2f}s, "
+                f"peak concurrent LLM calls {llm.max_in_flight}"
+            )
+    return results
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Load test the async RAG chain against stub models."""
+    run_load_test(**cfg.benchmarks.load_test)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import tempfile
+import time
+from pathlib import Path
+
+import hydra
+import omegaconf
+from loguru import logger
+
+from ucl_module_chat.benchmarks.stub_catalogue_server import StubCatalogueServer
+from ucl_module_chat.benchmarks.stub_models import SimulatedLatencyEmbeddings
+from ucl_module_chat.data_processing.document_conversion import (
+    convert_all_documents_html_to_markdown,
+)
+from ucl_module_chat.data_processing.document_embedding import embed_documents
+from ucl_module_chat.data_processing.document_scraping import scrape_documents
+from ucl_module_chat.data_processing.pipeline import run_pipeline
+
+
+def run_pipeline_benchmark(
+    n_modules: int,
+    page_latency_seconds: float,
+    requests_per_second: float,
+    max_in_flight: int,
+    n_workers: int,
+    embedding_size: int,
+    embedding_latency_seconds: float,
+    embedding_latency_per_text_seconds: float,
+    batch_size: int,
+    max_concurrent_batches: int,
+    queue_size: int,
+) -> dict[str, float]:
+    """Build a vectorstore from a stub catalogue with the stages run one after the
+    other and as a streaming pipeline, and report the time taken by each.
+
+    Both runs start from empty directories and use the same worker counts, so the
+    difference is the time saved by overlapping fetching, conversion and
+    embedding.
+    """
+    scrape_config = {
+        "requests_per_second": requests_per_second,
+        "max_in_flight": max_in_flight,
+        "max_retries": 3,
+        "backoff_seconds": 0.05,
+    }
+    convert_config = {"n_workers": n_workers}
+    embed_config = {
+        "batch_size": batch_size,
+        "max_concurrent_batches": max_concurrent_batches,
+        "chunk_sections": True,
+    }
+
+    def embedding_model() -> SimulatedLatencyEmbeddings:
+        return SimulatedLatencyEmbeddings(
+            size=embedding_size,
+            latency_seconds=embedding_latency_seconds,
+            latency_per_text_seconds=embedding_latency_per_text_seconds,
+        )
+
+    results = {}
+    with StubCatalogueServer(n_modules, page_latency_seconds) as server:
+        scrape_config["index_page_url"] = server.index_page_url
+        scrape_config["regex_url_pattern"] = server.regex_url_pattern
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            html_dir = Path(tmp_dir) / "html"
+            catalogue_path = Path(tmp_dir) / "catalogue.sqlite"
+            start = time.perf_counter()
+            scrape_documents(output_dir=html_dir, **scrape_config)
+            convert_all_documents_html_to_markdown(
+                input_dir=html_dir, catalogue_path=catalogue_path, **convert_config
+            )
+            vectorstore = embed_documents(
+                input_dir=None,
+                embedding_model=embedding_model(),
+                catalogue_path=catalogue_path,
+                **embed_config,
+            )
+            results["staged_seconds"] = time.perf_counter() - start
+            results["staged_vectors"] = vectorstore.index.ntotal
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            start = time.perf_counter()
+            vectorstore, _ = run_pipeline(
+                embedding_model=embedding_model(),
+                scrape_config={**scrape_config, "output_dir": Path(tmp_dir) / "html"},
+                convert_config={
+                    **convert_config,
+                    "catalogue_path": Path(tmp_dir) / "catalogue.sqlite",
+                },
+                embed_config=embed_config,
+                queue_size=queue_size,
+            )
+            results["pipelined_seconds"] = time.perf_counter() - start
+            results["pipelined_vectors"] = vectorstore.index.ntotal
+
+    logger.info(f"Pipeline benchmark: {n_modules} modules")
+    logger.info(
+        f"Staged:    {results['staged_seconds']:.2f}s, "
+        f"{results['staged_vectors']} vectors"
+    )
+    logger.info(
+        f"Pipelined: {results['pipelined_seconds']:.2f}s, "
+        f"{results['pipelined_vectors']} vectors"
+    )
+    logger.info(
+        f"Speedup: {results['staged_seconds'] / results['pipelined_seconds']:.2f}x"
+    )
+    return results
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Compare the staged and streaming setup pipelines on a stub catalogue."""
+    run_pipeline_benchmark(**cfg.benchmarks.pipeline)
+
+
+if __name__ == "__main__":
+    main()
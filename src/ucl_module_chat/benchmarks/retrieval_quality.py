@@ -0,0 +1,257 @@
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import hydra
+import numpy as np
+import omegaconf
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
+from loguru import logger
+
+from ucl_module_chat.benchmarks.baseline import check_baseline
+from ucl_module_chat.benchmarks.stub_models import HashingEmbeddings
+from ucl_module_chat.benchmarks.synthetic_catalogue import build_synthetic_vectorstore
+from ucl_module_chat.chains.rag_chain import build_retriever
+from ucl_module_chat.retrieval.docstore import load_vectorstore
+from ucl_module_chat.retrieval.module_codes import module_code_from_markdown
+from ucl_module_chat.utils.http_clients import http_client_kwargs
+from ucl_module_chat.utils.resolve_paths import get_abs_path_using_repo_root
+
+# Lines of `document_templates.module_template` that queries are generated from
+TITLE_PATTERN = re.compile(
+    r"^#\s+(?P<module_title>.+?)\s+\((?P<module_code>[A-Z]{4}\d{4})\)\s*$", re.M
+)
+KEYWORDS_PATTERN = re.compile(r"\*\*Keywords:\*\*\s*(?P<keywords>[^\\\n]*)")
+
+# Each kind of query is labelled with the module it was generated from
+QUERY_TEMPLATES = {
+    "title": "What is covered in {module_title}?",
+    "keywords": "Are there any modules on {keyword_a} and {keyword_b}?",
+    "code": "Tell me about {module_code}.",
+}
+
+
+def _document_module_code(doc: Document) -> str | None:
+    return doc.metadata.get("module_code") or module_code_from_markdown(
+        doc.page_content
+    )
+
+
+def _modules_in_corpus(documents: list[Document]) -> dict[str, dict]:
+    """The title and keywords of each module, by module code, parsed from the
+    markdown of its documents (or section chunks)."""
+    modules = {}
+    for doc in documents:
+        title_match = TITLE_PATTERN.search(doc.page_content)
+        if title_match is None:
+            continue
+        module = modules.setdefault(
+            title_match["module_code"],
+            {"module_title": title_match["module_title"], "keywords": []},
+        )
+        keywords_match = KEYWORDS_PATTERN.search(doc.page_content)
+        if keywords_match and not module["keywords"]:
+            module["keywords"] = [
+                keyword.strip().lower()
+                for keyword in keywords_match["keywords"].split(",")
+                if keyword.strip() and keyword.strip().lower() != "none"
+            ]
+    return modules
+
+
+def generate_labelled_queries(
+    documents: list[Document], n_queries: int, seed: int = 0
+) -> list[dict]:
+    """Generate up to `n_queries` queries of each kind in `QUERY_TEMPLATES` from
+    a markdown corpus, each labelled with the code of the module it targets.
+
+    Modules are sampled at random for each kind. Keyword queries pair two of the
+    module's keywords and are skipped for modules with fewer than two; as other
+    modules may share the keywords, they measure how well an ambiguous query is
+    resolved rather than having a single right answer.
+    """
+    modules = _modules_in_corpus(documents)
+    rng = random.Random(seed)
+    module_codes = sorted(modules)
+    queries = []
+    for kind, template in QUERY_TEMPLATES.items():
+        for module_code in rng.sample(module_codes, min(n_queries, len(modules))):
+            module = modules[module_code]
+            fields = {"module_code": module_code, **module}
+            if kind == "keywords":
+                if len(module["keywords"]) < 2:
+                    continue
+                fields["keyword_a"], fields["keyword_b"] = rng.sample(
+                    module["keywords"], 2
+                )
+            queries.append(
+                {
+                    "query": template.format(**fields),
+                    "module_code": module_code,
+                    "kind": kind,
+                }
+            )
+    return queries
+
+
+def _corpus_documents(vectorstore: FAISS) -> list[Document]:
+    return [
+        vectorstore.docstore.search(doc_id)
+        for doc_id in vectorstore.index_to_docstore_id.values()
+    ]
+
+
+def evaluate_retriever(
+    retriever: BaseRetriever, queries: list[dict], k: int, max_concurrency: int
+) -> dict[str, float]:
+    """Run the queries through the retriever in a batch and return recall@k and
+    mean reciprocal rank (MRR) of the target module among the first `k`
+    documents, overall and for each kind of query, with p50/p95 latency in
+    milliseconds and throughput in queries per second."""
+
+    def timed_invoke(query: str) -> tuple[list[Document], float]:
+        start = time.perf_counter()
+        docs = retriever.invoke(query)
+        return docs, time.perf_counter() - start
+
+    start = time.perf_counter()
+    outputs = RunnableLambda(timed_invoke).batch(
+        [q["query"] for q in queries], config={"max_concurrency": max_concurrency}
+    )
+    elapsed = time.perf_counter() - start
+
+    reciprocal_ranks = []
+    for query, (docs, _) in zip(queries, outputs):
+        ranks = [
+            rank
+            for rank, doc in enumerate(docs[:k], start=1)
+            if _document_module_code(doc) == query["module_code"]
+        ]
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+
+    metrics = {}
+    kinds = [None, *dict.fromkeys(q["kind"] for q in queries)]
+    for kind in kinds:
+        values = [
+            rr for q, rr in zip(queries, reciprocal_ranks) if kind in (None, q["kind"])
+        ]
+        prefix = "" if kind is None else f"{kind}."
+        metrics[f"{prefix}recall_at_k"] = float(np.mean([rr > 0 for rr in values]))
+        metrics[f"{prefix}mrr"] = float(np.mean(values))
+    p50, p95 = np.percentile([seconds for _, seconds in outputs], [50, 95]) * 1000
+    metrics["latency_p50_ms"] = float(p50)
+    metrics["latency_p95_ms"] = float(p95)
+    metrics["throughput_qps"] = len(queries) / elapsed
+    return metrics
+
+
+def run_retrieval_quality(
+    n_modules: int,
+    n_queries: int,
+    embedding_size: int,
+    retrieval_mode: str,
+    module_code_lookup: bool,
+    metadata_filtering: bool,
+    k: int,
+    n_candidates: int,
+    chunk_sections: bool,
+    index_config: dict,
+    search_params: dict,
+    max_concurrency: int,
+    baseline_path: str,
+    tolerance: float,
+    timing_tolerance: float,
+    update_baseline: bool,
+    vectorstore_dir: str | None = None,
+    embedding_model: Embeddings | None = None,
+) -> tuple[dict[str, float], list[str]]:
+    """Measure how well the retriever used by the RAG chain finds the module a
+    query is about, and how quickly.
+
+    Labelled queries are generated from the markdown documents in the vectorstore
+    (see `generate_labelled_queries`) and run through the retriever built with
+    the given settings, as in the app. By default, a synthetic catalogue of
+    `n_modules` modules is embedded offline with bag-of-words hashing embeddings
+    and an index built with `index_config`. If `vectorstore_dir` is given, that
+    vectorstore is evaluated with `embedding_model` instead.
+
+    Results are compared with the baseline saved at `baseline_path`, relative to
+    the project root, if it was recorded with the same parameters, allowing a
+    fractional change of `tolerance` in recall and MRR and `timing_tolerance` in
+    latency and throughput. Returns the results and the metrics that regressed.
+    """
+    # Benchmark parameters, which must match those of the baseline to compare
+    params = dict(locals())
+    for name in ["baseline_path", "tolerance", "timing_tolerance", "update_baseline"]:
+        params.pop(name)
+    if vectorstore_dir is not None:
+        params["vectorstore_dir"] = str(vectorstore_dir)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if vectorstore_dir is None:
+            embedding_model = HashingEmbeddings(size=embedding_size)
+            vectorstore_dir = Path(tmp_dir)
+            build_synthetic_vectorstore(
+                vectorstore_dir,
+                n_modules,
+                embedding_model,
+                chunk_sections=chunk_sections,
+                index_config=index_config,
+            )
+        params["embedding_model"] = type(embedding_model).__name__
+        vectorstore = load_vectorstore(vectorstore_dir, embedding_model)
+        queries = generate_labelled_queries(_corpus_documents(vectorstore), n_queries)
+        retriever = build_retriever(
+            embedding_model=embedding_model,
+            vectorstore_dir=vectorstore_dir,
+            module_code_lookup=module_code_lookup,
+            metadata_filtering=metadata_filtering,
+            retrieval_mode=retrieval_mode,
+            k=k,
+            n_candidates=n_candidates,
+            search_params=search_params,
+        )
+        results = evaluate_retriever(retriever, queries, k, max_concurrency)
+        index_name = type(vectorstore.index).__name__
+
+    logger.info(
+        f"Retrieval quality: {len(queries)} queries, {retrieval_mode} retrieval, "
+        f"k={k}, {index_name}"
+    )
+    regressions = check_baseline(
+        results,
+        params,
+        get_abs_path_using_repo_root(baseline_path),
+        tolerance,
+        update_baseline,
+        timing_tolerance,
+    )
+    return results, regressions
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Evaluate retrieval quality and latency against a stored baseline, exiting
+    with an error if any metric has regressed beyond the tolerance."""
+    params = omegaconf.OmegaConf.to_container(
+        cfg.benchmarks.retrieval_quality, resolve=True
+    )
+    if params.pop("use_app_vectorstore"):
+        params["vectorstore_dir"] = get_abs_path_using_repo_root(cfg.vectorstore.dir)
+        params["embedding_model"] = hydra.utils.instantiate(
+            cfg.models.embedding, **http_client_kwargs(cfg.http.embedding)
+        )
+    _, regressions = run_retrieval_quality(**params)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import tempfile
+
+import hydra
+import omegaconf
+from loguru import logger
+
+from ucl_module_chat.benchmarks.stub_catalogue_server import StubCatalogueServer
+from ucl_module_chat.data_processing.document_scraping import (
+    ScrapeStats,
+    scrape_documents,
+)
+
+
+def run_scraping_benchmark(
+    n_modules: int,
+    latency_seconds: float,
+    failure_rate: float,
+    requests_per_second: float,
+    max_in_flight: list[int],
+    max_retries: int = 3,
+    backoff_seconds: float = 0.05,
+) -> dict[int, float]:
+    """Scrape a stub catalogue at each max-in-flight setting and report pages/sec."""
+    results = {}
+    with StubCatalogueServer(n_modules, latency_seconds, failure_rate) as server:
+        for n_in_flight in max_in_flight:
+            with tempfile.TemporaryDirectory() as output_dir:
+                stats = scrape_documents(
+                    index_page_url=server.index_page_url,
+                    output_dir=output_dir,
+                    regex_url_pattern=server.regex_url_pattern,
+                    requests_per_second=requests_per_second,
+                    max_in_flight=n_in_flight,
+                    max_retries=max_retries,
+                    backoff_seconds=backoff_seconds,
+                )
+            results[n_in_flight] = stats.pages_per_second
+
+        refresh_stats = _run_incremental_refresh(
+            server,
+            requests_per_second,
+            max(max_in_flight),
+            max_retries,
+            backoff_seconds,
+        )
+
+    logger.info(f"Scraping benchmark: {n_modules} pages, {latency_seconds}s latency")
+    for n_in_flight, pages_per_second in results.items():
+        logger.info(
+            f"max_in_flight={n_in_flight:>3}: {pages_per_second:8.2f} pages/sec"
+        )
+    logger.info(
+        f"Incremental refresh: {len(refresh_stats.new)} new, "
+        f"{len(refresh_stats.changed)} changed, "
+        f"{len(refresh_stats.unchanged)} unchanged, "
+        f"{len(refresh_stats.deleted)} deleted in "
+        f"{refresh_stats.elapsed_seconds:.2f}s"
+    )
+    return results
+
+
+def _run_incremental_refresh(
+    server: StubCatalogueServer,
+    requests_per_second: float,
+    max_in_flight: int,
+    max_retries: int,
+    backoff_seconds: float,
+) -> ScrapeStats:
+    """Scrape the catalogue, edit and remove a few pages, then scrape again."""
+    scrape_kwargs = {
+        "index_page_url": server.index_page_url,
+        "regex_url_pattern": server.regex_url_pattern,
+        "requests_per_second": requests_per_second,
+        "max_in_flight": max_in_flight,
+        "max_retries": max_retries,
+        "backoff_seconds": backoff_seconds,
+    }
+    with tempfile.TemporaryDirectory() as output_dir:
+        scrape_documents(output_dir=output_dir, **scrape_kwargs)
+        paths = list(server.pages)
+        for path in paths[:5]:
+            server.update_page(path, server.pages[path] + "<!-- edited -->")
+        for path in paths[-2:]:
+            server.remove_page(path)
+        return scrape_documents(output_dir=output_dir, **scrape_kwargs)
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Benchmark the scraper against a local stub catalogue server."""
+    run_scraping_benchmark(**cfg.benchmarks.scraping)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import asyncio
+import tempfile
+import time
+
+import hydra
+import numpy as np
+import omegaconf
+from langchain_core.runnables import Runnable
+from loguru import logger
+
+from ucl_module_chat.benchmarks.stub_models import (
+    SimulatedLatencyChatModel,
+    SimulatedLatencyEmbeddings,
+)
+from ucl_module_chat.benchmarks.synthetic_catalogue import build_synthetic_vectorstore
+from ucl_module_chat.chains.rag_chain import build_rag_chain
+from ucl_module_chat.chains.tracing import TracingCallbackHandler
+from ucl_module_chat.utils.metrics import RequestMetrics
+
+# The examples shown in the app, which users often click at the same time
+QUESTIONS = [
+    "When can I take a module on medical statistics?",
+    "What are the prerequisites for taking Supervised Learning?",
+    "What is the difference between the two modules on Trauma for paediatric "
+    "dentistry?",
+]
+
+
+async def _run_burst(
+    rag_chain: Runnable, n_requests: int, metrics: RequestMetrics
+) -> tuple[float, list[float]]:
+    """Send `n_requests` first-turn requests at once, cycling through the example
+    questions, and return the elapsed time and the latency of each request."""
+
+    async def request(question: str) -> float:
+        tracer = TracingCallbackHandler()
+        async for _ in rag_chain.astream(
+            {"input": question, "chat_history": []}, config={"callbacks": [tracer]}
+        ):
+            pass
+        trace = tracer.trace()
+        metrics.record(trace)
+        return trace["total_seconds"]
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(
+        *[request(QUESTIONS[i % len(QUESTIONS)]) for i in range(n_requests)]
+    )
+    return time.perf_counter() - start, latencies
+
+
+def run_single_flight_benchmark(
+    n_modules: int,
+    n_requests: int,
+    max_concurrent_llm_calls: int | None,
+    embedding_latency_seconds: float,
+    llm_latency_seconds: float,
+    llm_token_latency_seconds: float,
+) -> dict[str, dict[str, float]]:
+    """Compare a burst of identical requests served with and without single-flight
+    coalescing, against stub models.
+
+    Reports the number of LLM calls made, the number of requests coalesced, as
+    counted by `RequestMetrics`, and the elapsed time and p50/p95 latency of the
+    burst.
+    """
+    embedding_model = SimulatedLatencyEmbeddings(
+        size=256, latency_seconds=embedding_latency_seconds
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as vectorstore_dir:
+        build_synthetic_vectorstore(vectorstore_dir, n_modules, embedding_model)
+        for single_flight in [False, True]:
+            llm = SimulatedLatencyChatModel(
+                latency_seconds=llm_latency_seconds,
+                token_latency_seconds=llm_token_latency_seconds,
+            )
+            rag_chain = build_rag_chain(
+                llm=llm,
+                embedding_model=embedding_model,
+                vectorstore_dir=vectorstore_dir,
+                max_concurrent_llm_calls=max_concurrent_llm_calls,
+                single_flight=single_flight,
+            )
+            metrics = RequestMetrics()
+            elapsed, latencies = asyncio.run(_run_burst(rag_chain, n_requests, metrics))
+            p50, p95 = np.percentile(latencies, [50, 95])
+            results["single_flight" if single_flight else "baseline"] = {
+                "llm_calls": llm.n_calls,
+                "coalesced_requests": metrics.counters["coalesced_requests"],
+                "elapsed_seconds": elapsed,
+                "p50_seconds": p50,
+                "p95_seconds": p95,
+            }
+
+    logger.info(
+        f"Single-flight benchmark: {n_requests} requests for {len(QUESTIONS)} "
+        "questions sent at once"
+    )
+    for name, result in results.items():
+        logger.info(
+            f"{name:>13}: {result['llm_calls']:3d} LLM calls, "
+            f"{result['coalesced_requests']:3d} requests coalesced, "
+            f"{result['elapsed_seconds']:.2f}s elapsed, "
+            f"p50 {result['p50_seconds']:.2f}s, p95 {result['p95_seconds']:.2f}s"
+        )
+    return results
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Benchmark single-flight coalescing of identical concurrent requests."""
+    run_single_flight_benchmark(
+        **omegaconf.OmegaConf.to_container(cfg.benchmarks.single_flight, resolve=True)
+    )
+
+
+if __name__ == "__main__":
+    main()
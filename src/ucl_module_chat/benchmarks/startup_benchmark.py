@@ -0,0 +1,170 @@
+import multiprocessing
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+# Only light modules are imported at the top level, because worker processes
+# re-import this module before the imports being timed
+import hydra
+import omegaconf
+from loguru import logger
+
+CONFIG_DIR = Path(__file__).resolve().parents[1] / "conf"
+QUESTIONS = [
+    "What are the prerequisites for taking Supervised Learning?",
+    "Which modules cover Bayesian inference?",
+]
+
+
+def _time_git_root(n_calls: int) -> float | None:
+    """Time finding the repo root with `git rev-parse`, as was done for every path
+    resolved, or return None if not in a git checkout."""
+    if shutil.which("git") is None:
+        return None
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        result = subprocess.run(
+            ["git", "rev-parse", "--show-toplevel"], capture_output=True
+        )
+        if result.returncode != 0:
+            return None
+    return time.perf_counter() - start
+
+
+def _startup_in_worker(
+    vectorstore_dir: str,
+    embedding_size: int,
+    llm_latency_seconds: float,
+    n_path_resolutions: int,
+    results: multiprocessing.Queue,
+) -> None:
+    """Start the app's components from a fresh interpreter, timing each stage."""
+    timings = {}
+
+    start = time.perf_counter()
+    import gradio  # noqa: F401
+
+    timings["import_gradio"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from ucl_module_chat.chains.rag_chain import build_rag_chain
+    from ucl_module_chat.retrieval.docstore import load_vectorstore
+
+    timings["import_chain"] = time.perf_counter() - start
+
+    from ucl_module_chat.utils.resolve_paths import (
+        find_project_root,
+        get_abs_path_using_repo_root,
+    )
+
+    start = time.perf_counter()
+    for _ in range(n_path_resolutions):
+        get_abs_path_using_repo_root("data")
+    timings["resolve_paths"] = time.perf_counter() - start
+    find_project_root.cache_clear()
+    timings["resolve_paths_git"] = _time_git_root(n_path_resolutions)
+
+    start = time.perf_counter()
+    with hydra.initialize_config_dir(config_dir=str(CONFIG_DIR), version_base=None):
+        cfg = hydra.compose(config_name="config")
+    timings["config"] = time.perf_counter() - start
+
+    from ucl_module_chat.benchmarks.stub_models import (
+        HashingEmbeddings,
+        SimulatedLatencyChatModel,
+    )
+
+    embedding_model = HashingEmbeddings(size=embedding_size)
+    start = time.perf_counter()
+    load_vectorstore(vectorstore_dir, embedding_model)
+    timings["vectorstore_load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rag_chain = build_rag_chain(
+        llm=SimulatedLatencyChatModel(
+            latency_seconds=llm_latency_seconds, token_latency_seconds=0
+        ),
+        embedding_model=embedding_model,
+        vectorstore_dir=vectorstore_dir,
+        module_code_lookup=cfg.app.module_code_lookup,
+        metadata_filtering=cfg.app.metadata_filtering,
+        retrieval_mode=cfg.app.retrieval_mode,
+        k=cfg.app.k,
+        n_candidates=cfg.app.n_candidates,
+        context_max_tokens=cfg.app.context_max_tokens,
+        search_params=cfg.vectorstore.search,
+    )
+    timings["chain_build"] = time.perf_counter() - start
+
+    for name, question in zip(["first_request", "second_request"], QUESTIONS):
+        start = time.perf_counter()
+        for _ in rag_chain.stream({"input": question, "chat_history": []}):
+            pass
+        timings[name] = time.perf_counter() - start
+    results.put(timings)
+
+
+def run_startup_benchmark(
+    n_modules: int,
+    embedding_size: int,
+    llm_latency_seconds: float,
+    n_path_resolutions: int,
+) -> dict[str, float | None]:
+    """Break down the cold start of the app in a fresh process.
+
+    Times importing Gradio and the chain modules, resolving paths against the
+    project root (and, for comparison, with `git rev-parse`), composing the hydra
+    config, loading the vectorstore, building the chain (which loads the
+    vectorstore again along with its indexes) and the first and second requests,
+    using stub models and a synthetic vectorstore of `n_modules` modules. Also
+    reports the time until the UI can be launched with and without
+    `app.fast_start`.
+    """
+    from ucl_module_chat.benchmarks.stub_models import HashingEmbeddings
+    from ucl_module_chat.benchmarks.synthetic_catalogue import (
+        build_synthetic_vectorstore,
+    )
+
+    with tempfile.TemporaryDirectory() as vectorstore_dir:
+        build_synthetic_vectorstore(
+            vectorstore_dir, n_modules, HashingEmbeddings(size=embedding_size)
+        )
+        mp_context = multiprocessing.get_context("spawn")
+        queue = mp_context.Queue()
+        worker = mp_context.Process(
+            target=_startup_in_worker,
+            args=(
+                vectorstore_dir,
+                embedding_size,
+                llm_latency_seconds,
+                n_path_resolutions,
+                queue,
+            ),
+        )
+        worker.start()
+        timings = queue.get()
+        worker.join()
+
+    ready = timings["import_gradio"] + timings["resolve_paths"] + timings["config"]
+    timings["ui_ready_fast_start"] = ready
+    timings["ui_ready_eager"] = ready + timings["import_chain"] + timings["chain_build"]
+
+    logger.info(f"Startup benchmark: {n_modules} modules")
+    for name, seconds in timings.items():
+        if seconds is None:
+            logger.info(f"{name:>20}: unavailable")
+        else:
+            logger.info(f"{name:>20}: {seconds * 1000:9.1f}ms")
+    return timings
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Benchmark cold start of the app, broken down by stage."""
+    run_startup_benchmark(**cfg.benchmarks.startup)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ucl_module_chat.benchmarks.synthetic_catalogue import (
+    synthetic_catalogue,
+    synthetic_module_html,
+    synthetic_module_id,
+)
+from ucl_module_chat.utils.file_io import content_hash
+
+
+class StubCatalogueServer:
+    """Local HTTP server that serves a synthetic module catalogue.
+
+    The index page lists every module page in `<cite data-url=...>` tags, as on the
+    real search page. Module pages are served after `latency_seconds`, and a
+    fraction `failure_rate` of requests is answered with HTTP 503 to exercise
+    retries. Module pages carry ETag and Last-Modified headers and conditional
+    requests for unchanged pages are answered with HTTP 304.
+    """
+
+    def __init__(
+        self,
+        n_modules: int,
+        latency_seconds: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.n_requests = 0
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+        self.pages = {
+            f"/modules/{synthetic_module_id(info)}": synthetic_module_html(info)
+            for info in synthetic_catalogue(n_modules, seed)
+        }
+        self.last_modified = {path: time.time() for path in self.pages}
+        self._thread = None
+
+    def update_page(self, path: str, html: str) -> None:
+        """Replace the content of a module page, e.g. to simulate an edit."""
+        with self._lock:
+            self.pages[path] = html
+            self.last_modified[path] = time.time()
+
+    def remove_page(self, path: str) -> None:
+        """Remove a module page from the catalogue and the index page."""
+        with self._lock:
+            del self.pages[path]
+            del self.last_modified[path]
+
+    @property
+    def index_page_url(self) -> str:
+        return f"{self.base_url}/index"
+
+    @property
+    def regex_url_pattern(self) -> str:
+        return rf"{self.base_url}/modules/[a-zA-Z0-9-]+[A-Z]{{4}}\d{{4}}"
+
+    def _index_page_html(self) -> str:
+        cites = "\n".join(
+            f'<cite data-url="{self.base_url}{path}">{path}</cite>'
+            for path in self.pages
+        )
+        return f"<html><body>{cites}</body></html>"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.n_requests += 1
+                    fail = server._rng.random() < server.failure_rate
+                time.sleep(server.latency_seconds)
+                if self.path == "/index":
+                    self._respond(200, server._index_page_html())
+                elif self.path not in server.pages:
+                    self._respond(404, "Not found")
+                elif fail:
+                    self._respond(503, "Service unavailable")
+                else:
+                    self._respond_module_page(self.path)
+
+            def _respond_module_page(self, path: str):
+                body = server.pages[path]
+                headers = {
+                    "ETag": f'"{content_hash(body)[:16]}"',
+                    "Last-Modified": formatdate(
+                        server.last_modified[path], usegmt=True
+                    ),
+                }
+                if self.headers.get("If-None-Match") == headers["ETag"]:
+                    self._respond(304, "", headers)
+                else:
+                    self._respond(200, body, headers)
+
+            def _respond(self, status: int, body: str, headers: dict | None = None):
+                encoded = body.encode("utf-8")
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                if status != 304:
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "StubCatalogueServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.embeddings.fake import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import BaseModel
+
+
+class SimulatedLatencyEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic fake embeddings with simulated API latency and failures.
+
+    Each call sleeps for `latency_seconds` plus `latency_per_text_seconds` for every
+    text, and raises a `ConnectionError` with probability `failure_rate`, so that
+    batching, concurrency and retries can be exercised offline.
+    """
+
+    latency_seconds: float = 0.0
+    latency_per_text_seconds: float = 0.0
+    failure_rate: float = 0.0
+    seed: int = 0
+    n_calls: int = 0
+
+    def model_post_init(self, __context) -> None:
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def _simulate_call(self, n_texts: int) -> None:
+        with self._lock:
+            self.n_calls += 1
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(self.latency_seconds + n_texts * self.latency_per_text_seconds)
+        if fail:
+            raise ConnectionError("Simulated embedding API failure")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self._simulate_call(len(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self._simulate_call(1)
+        return super().embed_query(text)
+
+
+class HashingEmbeddings(Embeddings, BaseModel):
+    """Bag-of-words embeddings using the hashing trick.
+
+    Unlike `DeterministicFakeEmbedding`, texts that share words have similar
+    embeddings, so retrieval quality can be compared offline. This is only a
+    crude stand-in for a semantic embedding model.
+    """
+
+    size: int = 256
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.size
+            vector[index] += 1.0 if digest[4] % 2 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+class SimulatedLatencyChatModel(BaseChatModel):
+    """Fake chat model that streams a fixed response with simulated latency.
+
+    The first token arrives after `latency_seconds` and each further token after
+    `token_latency_seconds`. Usage metadata is reported using a whitespace token
+    count, and the peak number of concurrent calls is recorded.
+    """
+
+    response: str = "This is a simulated answer about the module COMP0078."
+    latency_seconds: float = 0.5
+    token_latency_seconds: float = 0.01
+    n_calls: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+    def model_post_init(self, __context) -> None:
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated-latency-chat-model"
+
+    def _start_call(self) -> None:
+        with self._lock:
+            self.n_calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _end_call(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _tokens(self) -> list[str]:
+        words = self.response.split(" ")
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    def _usage(self, messages: list[BaseMessage]) -> dict:
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = len(self._tokens())
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._start_call()
+        try:
+            time.sleep(
+                self.latency_seconds
+                + self.token_latency_seconds * (len(self._tokens()) - 1)
+            )
+        finally:
+            self._end_call()
+        message = AIMessage(self.response, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._start_call()
+        try:
+            await asyncio.sleep(
+                self.latency_seconds
+                + self.token_latency_seconds * (len(self._tokens()) - 1)
+            )
+        finally:
+            self._end_call()
+        message = AIMessage(self.response, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._start_call()
+        try:
+            time.sleep(self.latency_seconds)
+            tokens = self._tokens()
+            for i, token in enumerate(tokens):
+                if i > 0:
+                    time.sleep(self.token_latency_seconds)
+                usage = self._usage(messages) if i == len(tokens) - 1 else None
+                chunk = ChatGenerationChunk(
+                    message=AIMessageChunk(content=token, usage_metadata=usage)
+                )
+                if run_manager:
+                    run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+        finally:
+            self._end_call()
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self._start_call()
+        try:
+            await asyncio.sleep(self.latency_seconds)
+            tokens = self._tokens()
+            for i, token in enumerate(tokens):
+                if i > 0:
+                    await asyncio.sleep(self.token_latency_seconds)
+                usage = self._usage(messages) if i == len(tokens) - 1 else None
+                chunk = ChatGenerationChunk(
+                    message=AIMessageChunk(content=token, usage_metadata=usage)
+                )
+                if run_manager:
+                    await run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+        finally:
+            self._end_call()
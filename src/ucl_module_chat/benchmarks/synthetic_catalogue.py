@@ -0,0 +1,256 @@
+import json
+import random
+from pathlib import Path
+
+from jinja2 import Template
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings.embeddings import Embeddings
+
+from ucl_module_chat.data_processing.document_conversion import _module_metadata
+from ucl_module_chat.data_processing.document_embedding import (
+    embed_documents,
+    save_vectorstore,
+)
+from ucl_module_chat.data_processing.document_templates import module_template
+
+# Vocabulary used to generate varied but deterministic synthetic modules
+DEPARTMENTS = [
+    ("COMP", "Computer Science", "Faculty of Engineering Sciences"),
+    ("STAT", "Statistical Science", "Faculty of Mathematical and Physical Sciences"),
+    ("MATH", "Mathematics", "Faculty of Mathematical and Physical Sciences"),
+    ("CHEM", "Chemistry", "Faculty of Mathematical and Physical Sciences"),
+    ("ECON", "Economics", "Faculty of Social and Historical Sciences"),
+    ("HIST", "History", "Faculty of Social and Historical Sciences"),
+    ("ENGL", "English Language and Literature", "Faculty of Arts and Humanities"),
+    ("CHME", "Population Health", "Faculty of Population Health Sciences"),
+]
+TOPICS = [
+    "Learning",
+    "Statistics",
+    "Algorithms",
+    "Inference",
+    "Dynamics",
+    "Optimisation",
+    "Modelling",
+    "Networks",
+    "Literature",
+    "History",
+    "Markets",
+    "Epidemiology",
+    "Chemistry",
+    "Geometry",
+    "Analysis",
+    "Computation",
+    "Theory",
+    "Methods",
+]
+QUALIFIERS = [
+    "Supervised",
+    "Applied",
+    "Advanced",
+    "Bayesian",
+    "Introductory",
+    "Medieval",
+    "Quantum",
+    "Financial",
+    "Medical",
+    "Computational",
+    "Modern",
+    "Stochastic",
+    "Organic",
+    "Numerical",
+    "Probabilistic",
+    "Global",
+    "Clinical",
+    "Experimental",
+]
+TERMS = ["Term 1", "Term 2", "Term 3", "Term 1 and Term 2"]
+LEVELS = [("Undergraduate", "6"), ("Undergraduate", "5"), ("Postgraduate", "7")]
+CREDITS = ["15", "30", "60"]
+ASSESSMENTS = [
+    "80% Exam",
+    "20% Coursework",
+    "50% Coursework",
+    "50% Exam",
+    "100% Coursework",
+]
+
+module_page_template = Template(
+    """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta name="og:title" content="{{ module_title }} ({{ module_code }})">
+<meta property="og:url" content="{{ url }}">
+<meta name="ucl:sanitized_faculty" content="{{ faculty }}">
+<meta name="ucl:sanitized_teaching_department" content="{{ teaching_department }}">
+<meta name="ucl:sanitized_level" content="{{ level }}">
+<meta name="ucl:sanitized_intended_teaching_term" content="{{ teaching_term }}">
+<meta name="ucl:sanitized_credit_value" content="{{ credit_value }}">
+<meta name="ucl:sanitized_subject" content="{{ subject }}">
+<meta name="ucl:sanitized_keywords" content="{{ keywords }}">
+<script>var analytics = {};</script>
+<style>body { font-family: sans-serif; }</style>
+</head>
+<body>
+<header><nav><ul>
+{% for i in range(20) %}<li><a href="/nav/{{ i }}">Link {{ i }}</a></li>
+{% endfor %}
+</ul></nav></header>
+<div class="site-content">
+<h1>{{ module_title }} ({{ module_code }})</h1>
+<dl>
+<dt>Faculty</dt><dd>{{ faculty }}</dd>
+<dt>Restrictions</dt><dd>
+{{ restrictions }}
+</dd>
+</dl>
+<h2>Alternative credit options</h2>
+<p>{{ alternative_credit_options }}</p>
+<div class="module-description"><p>{{ description }}</p></div>
+{% for d in deliveries %}
+<div class="box tagged box--bar-thick">
+<h2>Intended teaching term: {{ d.teaching_term }}
+{{ d.type }} (FHEQ Level {{ d.fheq_level }})</h2>
+<h3>Teaching and assessment</h3>
+<section class="middle-split__column1">
+<dl>
+<dt>Mode of study</dt><dd>{{ d.mode_of_study }}</dd>
+<dt>Methods of assessment</dt><dd>
+{% for m in d.methods_of_assessment.split(", ") %}<div>{{ m }}</div>
+{% endfor %}
+</dd>
+<dt>Mark scheme</dt><dd>{{ d.mark_scheme }}</dd>
+</dl>
+</section>
+<section class="middle-split__column2">
+<dl>
+<dt>Number of students on module in previous year</dt>
+<dd>{{ d.number_of_students_prior_year }}</dd>
+<dt>Who to contact for more information</dt>
+<dd><a href="mailto:{{ d.contact_email }}">{{ d.contact_email }}</a></dd>
+</dl>
+</section>
+</div>
+{% endfor %}
+</div>
+<footer>{% for i in range(20) %}<p>Footer paragraph {{ i }}</p>{% endfor %}</footer>
+<script>window.loaded = true;</script>
+</body>
+</html>
+"""
+)
+
+
+def synthetic_module_info(index: int, seed: int = 0) -> dict:
+    """Generate a deterministic module information dictionary.
+
+    The dictionary has the same structure as the output of
+    `document_conversion._extract_module_info_from_html`, so it can be rendered into
+    both an HTML module page and a markdown document with known ground truth.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    prefix, department, faculty = DEPARTMENTS[index % len(DEPARTMENTS)]
+    module_code = f"{prefix}{index:04d}"
+    qualifier = rng.choice(QUALIFIERS)
+    topic = rng.choice(TOPICS)
+    module_title = f"{qualifier} {topic} {index}"
+    slug = module_title.lower().replace(" ", "-")
+    keywords = ",".join(
+        sorted({topic.upper(), qualifier.upper(), rng.choice(TOPICS).upper()})
+    )
+
+    level_type, fheq_level = rng.choice(LEVELS)
+    teaching_term = rng.choice(TERMS)
+    deliveries = []
+    for _ in range(rng.choice([1, 1, 2])):
+        deliveries.append(
+            {
+                "teaching_term": teaching_term,
+                "type": level_type,
+                "fheq_level": fheq_level,
+                "mode_of_study": "In person",
+                "methods_of_assessment": ", ".join(rng.sample(ASSESSMENTS, 2)),
+                "mark_scheme": "Numeric Marks",
+                "contact_email": f"{module_code.lower()}@ucl.ac.uk",
+                "number_of_students_prior_year": str(rng.randint(5, 300)),
+            }
+        )
+        level_type, fheq_level = rng.choice(LEVELS)
+
+    description = " ".join(
+        f"This module covers {rng.choice(QUALIFIERS).lower()} "
+        f"{rng.choice(TOPICS).lower()} with applications in {department.lower()}."
+        for _ in range(rng.randint(4, 12))
+    )
+
+    return {
+        "module_title": module_title,
+        "module_code": module_code,
+        "url": f"https://www.ucl.ac.uk/module-catalogue/modules/{slug}-{module_code}",
+        "faculty": faculty,
+        "teaching_department": department,
+        "level": f"FHEQ Level {fheq_level}",
+        "teaching_term": teaching_term,
+        "credit_value": rng.choice(CREDITS),
+        "subject": department,
+        "keywords": keywords,
+        "alternative_credit_options": "There are no alternative credit options.",
+        "description": description,
+        "restrictions": "Only available to students on relevant programmes.",
+        "deliveries": deliveries,
+    }
+
+
+def synthetic_module_id(module_info: dict) -> str:
+    """Return the file stem used for a module, matching the scraper naming."""
+    return module_info["url"].split("/modules/")[1]
+
+
+def synthetic_module_html(module_info: dict) -> str:
+    """Render a module information dictionary as a UCL-style module page."""
+    return module_page_template.render(module_info)
+
+
+def synthetic_catalogue(n_modules: int, seed: int = 0) -> list[dict]:
+    """Generate a list of `n_modules` synthetic module information dictionaries."""
+    return [synthetic_module_info(i, seed) for i in range(n_modules)]
+
+
+def write_synthetic_html_corpus(output_dir: str | Path, n_modules: int) -> None:
+    """Write `n_modules` synthetic module pages to a directory."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for module_info in synthetic_catalogue(n_modules):
+        html_path = output_dir / f"{synthetic_module_id(module_info)}.html"
+        html_path.write_text(synthetic_module_html(module_info), encoding="utf-8")
+
+
+def write_synthetic_markdown_corpus(output_dir: str | Path, n_modules: int) -> None:
+    """Write `n_modules` synthetic markdown documents using the module template,
+    each with a JSON file of its module metadata."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for module_info in synthetic_catalogue(n_modules):
+        md_path = output_dir / f"{synthetic_module_id(module_info)}.md"
+        md_path.write_text(module_template.render(module_info), encoding="utf-8")
+        md_path.with_suffix(".json").write_text(
+            json.dumps(_module_metadata(module_info)), encoding="utf-8"
+        )
+
+
+def build_synthetic_vectorstore(
+    output_dir: str | Path,
+    n_modules: int,
+    embedding_model: Embeddings,
+    **embed_kwargs,
+) -> FAISS:
+    """Embed a synthetic markdown corpus and save the vectorstore to `output_dir`.
+
+    Keyword arguments, e.g. `chunk_sections` or `index_config`, are passed to
+    `embed_documents`."""
+    output_dir = Path(output_dir)
+    md_dir = output_dir / "module_md"
+    write_synthetic_markdown_corpus(md_dir, n_modules)
+    vectorstore = embed_documents(md_dir, embedding_model, **embed_kwargs)
+    save_vectorstore(vectorstore, output_dir)
+    return vectorstore
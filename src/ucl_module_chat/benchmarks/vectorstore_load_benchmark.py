@@ -0,0 +1,141 @@
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+import hydra
+import numpy as np
+import omegaconf
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings.fake import DeterministicFakeEmbedding
+from loguru import logger
+
+from ucl_module_chat.benchmarks.synthetic_catalogue import synthetic_catalogue
+from ucl_module_chat.data_processing.document_templates import module_template
+from ucl_module_chat.retrieval.docstore import load_vectorstore, write_vectorstore
+from ucl_module_chat.retrieval.faiss_index import create_faiss_index
+from ucl_module_chat.utils.memory import current_rss_bytes, private_rss_bytes
+
+
+def _build_vectorstore(n_documents: int, dimension: int, index_type: str) -> FAISS:
+    """Build a vectorstore of synthetic documents with random vectors."""
+    catalogue = synthetic_catalogue(min(n_documents, 2000))
+    texts = [
+        module_template.render(catalogue[i % len(catalogue)])
+        for i in range(n_documents)
+    ]
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n_documents, dimension)).astype(np.float32)
+    vectorstore = FAISS(
+        embedding_function=DeterministicFakeEmbedding(size=dimension),
+        index=create_faiss_index(vectors, index_type=index_type),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    vectorstore.add_embeddings(
+        zip(texts, vectors.tolist()),
+        metadatas=[{"position": i} for i in range(n_documents)],
+        ids=[str(i) for i in range(n_documents)],
+    )
+    return vectorstore
+
+
+def _load_in_worker(
+    vectorstore_dir: str, dimension: int, mode: str, results: multiprocessing.Queue
+) -> None:
+    """Load the vectorstore, run a query and report load time and memory."""
+    embedding_model = DeterministicFakeEmbedding(size=dimension)
+    rss_before = current_rss_bytes()
+    private_before = private_rss_bytes() or 0
+    start = time.perf_counter()
+    if mode == "pickle":
+        vectorstore = FAISS.load_local(
+            vectorstore_dir,
+            embeddings=embedding_model,
+            allow_dangerous_deserialization=True,
+        )
+    else:
+        vectorstore = load_vectorstore(vectorstore_dir, embedding_model, mmap=True)
+    load_seconds = time.perf_counter() - start
+    vectorstore.similarity_search("Which modules cover Bayesian inference?", k=4)
+    results.put(
+        {
+            "load_seconds": load_seconds,
+            "rss_mb": (current_rss_bytes() - rss_before) / 1e6,
+            "private_mb": ((private_rss_bytes() or 0) - private_before) / 1e6,
+        }
+    )
+
+
+def _run_workers(
+    vectorstore_dir: Path, dimension: int, mode: str, n_workers: int
+) -> dict[str, float]:
+    """Load the vectorstore in `n_workers` processes at once and average the
+    results."""
+    mp_context = multiprocessing.get_context("spawn")
+    queue = mp_context.Queue()
+    workers = [
+        mp_context.Process(
+            target=_load_in_worker, args=(str(vectorstore_dir), dimension, mode, queue)
+        )
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    worker_results = [queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return {
+        key: float(np.mean([r[key] for r in worker_results]))
+        for key in worker_results[0]
+    }
+
+
+def run_vectorstore_load_benchmark(
+    n_documents: int, dimension: int, n_workers: int, index_types: list[str]
+) -> dict[tuple[str, str], dict[str, float]]:
+    """Compare startup of `n_workers` processes loading the pickled vectorstore
+    with loading the memory-mapped index and SQLite docstore.
+
+    Reports mean load time, and mean growth in RSS and in private (anonymous)
+    memory per worker. File-backed pages of a memory-mapped index count towards
+    RSS but are shared between workers through the page cache. With FAISS 1.9,
+    only the inverted lists of IVF indexes are memory-mapped; flat indexes are
+    still read into private memory.
+    """
+    results = {}
+    for index_type in index_types:
+        vectorstore = _build_vectorstore(n_documents, dimension, index_type)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pickle_dir = Path(tmp_dir) / "pickle"
+            vectorstore.save_local(pickle_dir)
+            mmap_dir = Path(tmp_dir) / "mmap"
+            write_vectorstore(vectorstore, mmap_dir)
+            del vectorstore
+            for mode, vectorstore_dir in [("pickle", pickle_dir), ("mmap", mmap_dir)]:
+                results[(index_type, mode)] = _run_workers(
+                    vectorstore_dir, dimension, mode, n_workers
+                )
+
+    logger.info(
+        f"Vectorstore load benchmark: {n_documents} documents, dimension "
+        f"{dimension}, {n_workers} workers"
+    )
+    for (index_type, mode), result in results.items():
+        logger.info(
+            f"{index_type:>6} {mode:>6}: load {result['load_seconds']:.3f}s, "
+            f"RSS +{result['rss_mb']:.1f}MB, private +{result['private_mb']:.1f}MB "
+            "per worker"
+        )
+    return results
+
+
+@hydra.main(version_base=None, config_path="../conf", config_name="config")
+def main(cfg: omegaconf.DictConfig) -> None:
+    """Benchmark vectorstore startup time and per-worker memory."""
+    run_vectorstore_load_benchmark(**cfg.benchmarks.vectorstore_load)
+
+
+if __name__ == "__main__":
+    main()
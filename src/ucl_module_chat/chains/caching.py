@@ -0,0 +1,367 @@
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Hashable, Iterator, Optional
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManager,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableConfig
+from loguru import logger
+
+from ..retrieval.module_codes import MODULE_CODE_PATTERN
+from .delegating import DelegatingRunnable
+
+# Custom callback event dispatched with {"layer": ...} when a cache layer is hit
+CACHE_HIT_EVENT = "cache_hit"
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl_seconds`."""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float | None = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, stored_at: float) -> bool:
+        return (
+            self.ttl_seconds is not None
+            and time.monotonic() - stored_at > self.ttl_seconds
+        )
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[1]):
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        """Unexpired entries, from least to most recently used."""
+        with self._lock:
+            return [
+                (key, value)
+                for key, (value, stored_at) in self._entries.items()
+                if not self._expired(stored_at)
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def record_lookup(self, hit: bool) -> None:
+        """Count a hit or miss for a lookup made without `get`, e.g. by scanning
+        the entries."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that caches query embeddings."""
+
+    def __init__(self, embedding_model: Embeddings, cache: TTLCache):
+        self.embedding_model = embedding_model
+        self.cache = cache
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embedding_model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        embedding = self.cache.get(text)
+        if embedding is None:
+            embedding = self.embedding_model.embed_query(text)
+            self.cache.set(text, embedding)
+        return embedding
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embedding_model.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        embedding = self.cache.get(text)
+        if embedding is None:
+            embedding = await self.embedding_model.aembed_query(text)
+            self.cache.set(text, embedding)
+        return embedding
+
+
+class RagCache:
+    """Layered cache for the RAG chain.
+
+    - an LRU/TTL cache of query embeddings;
+    - a cache of retrieval results keyed by the standalone question;
+    - optionally, a semantic cache of answers to first-turn questions, returned
+      for a new question whose embedding has cosine similarity of at least
+      `similarity_threshold` to a cached question that mentions the same module
+      codes.
+
+    The vectorstore files in `vectorstore_dir` are checked at most every
+    `check_interval_seconds`, and all layers are cleared if they have changed. The
+    chain keeps serving the vectorstore it loaded, so a rebuilt vectorstore is
+    only used after a restart; a warning is logged when one is detected.
+    """
+
+    def __init__(
+        self,
+        vectorstore_dir: str | Path,
+        max_size: int = 1024,
+        ttl_seconds: float | None = 3600,
+        semantic_answer_cache: bool = True,
+        similarity_threshold: float = 0.95,
+        check_interval_seconds: float = 60,
+    ):
+        self.vectorstore_dir = Path(vectorstore_dir)
+        self.check_interval_seconds = check_interval_seconds
+        self.semantic_answer_cache = semantic_answer_cache
+        self.similarity_threshold = similarity_threshold
+        self.query_embeddings = TTLCache(max_size, ttl_seconds)
+        self.retrieval = TTLCache(max_size, ttl_seconds)
+        self.answers = TTLCache(max_size, ttl_seconds)
+        self._fingerprint = self._vectorstore_fingerprint()
+        self._last_checked = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _vectorstore_fingerprint(self) -> tuple:
+        fingerprint = []
+        for path in sorted(self.vectorstore_dir.glob("index.*")):
+            stat = path.stat()
+            fingerprint.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def check_vectorstore(self) -> None:
+        """Clear all layers if the vectorstore has been rebuilt since last checked,
+        checking the files at most every `check_interval_seconds`."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_checked < self.check_interval_seconds:
+                return
+            self._last_checked = now
+        fingerprint = self._vectorstore_fingerprint()
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._fingerprint = fingerprint
+                self.clear()
+                logger.warning(
+                    f"Vectorstore in {self.vectorstore_dir} has been rebuilt, caches "
+                    "cleared; restart the app to serve the new vectorstore"
+                )
+
+    def clear(self) -> None:
+        for layer in [self.query_embeddings, self.retrieval, self.answers]:
+            layer.clear()
+
+    def stats(self) -> dict:
+        return {
+            "query_embeddings": self.query_embeddings.stats(),
+            "retrieval": self.retrieval.stats(),
+            "answers": self.answers.stats(),
+        }
+
+    def lookup_answer(self, question: str, embedding: list[float]) -> dict | None:
+        """Return the cached result for a semantically equivalent question."""
+        codes = frozenset(MODULE_CODE_PATTERN.findall(question))
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        best_result, best_similarity = None, self.similarity_threshold
+        for (_, cached_codes), (cached_embedding, result) in self.answers.items():
+            if cached_codes != codes:
+                continue
+            similarity = float(np.dot(query, cached_embedding))
+            if similarity >= best_similarity:
+                best_result, best_similarity = result, similarity
+        self.answers.record_lookup(best_result is not None)
+        return best_result
+
+    def store_answer(self, question: str, embedding: list[float], result: dict) -> None:
+        codes = frozenset(MODULE_CODE_PATTERN.findall(question))
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        self.answers.set((question, codes), (vector, result))
+
+
+class CachedRetriever(BaseRetriever):
+    """Retriever wrapper that caches results keyed by the (standalone) query."""
+
+    retriever: BaseRetriever
+    rag_cache: RagCache
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        self.rag_cache.check_vectorstore()
+        docs = self.rag_cache.retrieval.get(query)
+        if docs is None:
+            docs = self.retriever.invoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+            self.rag_cache.retrieval.set(query, docs)
+        else:
+            run_manager.get_child().on_custom_event(
+                CACHE_HIT_EVENT, {"layer": "retrieval"}
+            )
+        return docs
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        self.rag_cache.check_vectorstore()
+        docs = self.rag_cache.retrieval.get(query)
+        if docs is None:
+            docs = await self.retriever.ainvoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+            self.rag_cache.retrieval.set(query, docs)
+        else:
+            await run_manager.get_child().on_custom_event(
+                CACHE_HIT_EVENT, {"layer": "retrieval"}
+            )
+        return docs
+
+
+def accumulate_chunk(result: dict, chunk: dict) -> None:
+    """Add a chunk streamed by the RAG chain to the result, concatenating the
+    tokens of the answer."""
+    for key, value in chunk.items():
+        if key == "answer":
+            result["answer"] = result.get("answer", "") + value
+        else:
+            result[key] = value
+
+
+class SemanticAnswerCacheRunnable(DelegatingRunnable):
+    """Wrap a RAG chain so questions without chat history can be answered from a
+    RagCache."""
+
+    def __init__(self, bound: Runnable, cache: RagCache, embedding_model: Embeddings):
+        super().__init__(bound)
+        self.cache = cache
+        self.embedding_model = embedding_model
+
+    @staticmethod
+    def _report_hit(config: Optional[RunnableConfig]) -> None:
+        """Let callback handlers know the answer came from the cache, since the
+        chain, and so its callbacks, did not run."""
+        callbacks = (config or {}).get("callbacks")
+        if callbacks:
+            CallbackManager.configure(callbacks).on_custom_event(
+                CACHE_HIT_EVENT, {"layer": "answers"}
+            )
+
+    def _cached_result(
+        self, input: dict, embedding: list[float]
+    ) -> tuple[list[float], dict | None]:
+        cached = self.cache.lookup_answer(input["input"], embedding)
+        if cached is not None:
+            cached = {**cached, "input": input["input"], "chat_history": []}
+        return embedding, cached
+
+    def _lookup(self, input: dict) -> tuple[list[float] | None, dict | None]:
+        self.cache.check_vectorstore()
+        if input.get("chat_history"):
+            return None, None
+        embedding = self.embedding_model.embed_query(input["input"])
+        return self._cached_result(input, embedding)
+
+    async def _alookup(self, input: dict) -> tuple[list[float] | None, dict | None]:
+        self.cache.check_vectorstore()
+        if input.get("chat_history"):
+            return None, None
+        embedding = await self.embedding_model.aembed_query(input["input"])
+        return self._cached_result(input, embedding)
+
+    def _store(self, input: dict, embedding: list[float] | None, result: dict) -> None:
+        if embedding is not None and "answer" in result:
+            self.cache.store_answer(
+                input["input"],
+                embedding,
+                {"context": result.get("context", []), "answer": result["answer"]},
+            )
+
+    def invoke(
+        self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> dict:
+        embedding, cached = self._lookup(input)
+        if cached is not None:
+            self._report_hit(config)
+            return cached
+        result = self.bound.invoke(input, config, **kwargs)
+        self._store(input, embedding, result)
+        return result
+
+    async def ainvoke(
+        self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> dict:
+        embedding, cached = await self._alookup(input)
+        if cached is not None:
+            self._report_hit(config)
+            return cached
+        result = await self.bound.ainvoke(input, config, **kwargs)
+        self._store(input, embedding, result)
+        return result
+
+    def stream(
+        self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[dict]:
+        embedding, cached = self._lookup(input)
+        if cached is not None:
+            self._report_hit(config)
+            yield cached
+            return
+        result = {}
+        for chunk in self.bound.stream(input, config, **kwargs):
+            accumulate_chunk(result, chunk)
+            yield chunk
+        self._store(input, embedding, result)
+
+    async def astream(
+        self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[dict]:
+        embedding, cached = await self._alookup(input)
+        if cached is not None:
+            self._report_hit(config)
+            yield cached
+            return
+        result = {}
+        async for chunk in self.bound.astream(input, config, **kwargs):
+            accumulate_chunk(result, chunk)
+            yield chunk
+        self._store(input, embedding, result)
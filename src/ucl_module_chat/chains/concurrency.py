@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from .delegating import DelegatingRunnable
+
+
+class ConcurrencyLimitedRunnable(DelegatingRunnable):
+    """Wrap a runnable, such as an LLM, so at most `max_concurrency` sync and at
+    most `max_concurrency` async calls (per event loop) run at once."""
+
+    def __init__(self, bound: Runnable, max_concurrency: int):
+        if max_concurrency < 1:
+            raise ValueError(
+                f"max_concurrency must be at least 1, got {max_concurrency}"
+            )
+        super().__init__(bound)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._thread_semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._async_semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_semaphores:
+            self._async_semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._async_semaphores[loop]
+
+    def _enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def invoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        with self._thread_semaphore:
+            self._enter()
+            try:
+                return self.bound.invoke(input, config, **kwargs)
+            finally:
+                self._exit()
+
+    async def ainvoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        async with self._async_semaphore():
+            self._enter()
+            try:
+                return await self.bound.ainvoke(input, config, **kwargs)
+            finally:
+                self._exit()
+
+    def stream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[Any]:
+        with self._thread_semaphore:
+            self._enter()
+            try:
+                yield from self.bound.stream(input, config, **kwargs)
+            finally:
+                self._exit()
+
+    async def astream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        async with self._async_semaphore():
+            self._enter()
+            try:
+                async for chunk in self.bound.astream(input, config, **kwargs):
+                    yield chunk
+            finally:
+                self._exit()
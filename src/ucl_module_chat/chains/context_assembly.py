@@ -0,0 +1,80 @@
+from langchain_core.documents import Document
+from loguru import logger
+
+from ..retrieval.chunking import regroup_by_parent
+from ..utils.tokens import count_tokens
+
+# A document is not trimmed to fit into less than this many tokens of the budget
+MIN_TRIMMED_TOKENS = 50
+
+
+def _trim_to_tokens(text: str, max_tokens: int, model_name: str | None) -> str:
+    """Keep whole lines from the start of the text up to `max_tokens`."""
+    kept = []
+    n_tokens = 0
+    for line in text.split("\n"):
+        line_tokens = count_tokens(line + "\n", model_name)
+        if n_tokens + line_tokens > max_tokens:
+            break
+        kept.append(line)
+        n_tokens += line_tokens
+    return "\n".join(kept)
+
+
+def assemble_context(
+    docs: list[Document],
+    max_tokens: int | None = None,
+    regroup: bool = True,
+    model_name: str | None = None,
+) -> list[Document]:
+    """Prepare retrieved documents for the QA prompt.
+
+    Duplicate documents are removed and, with `regroup`, section chunks are
+    merged into one document per module. Documents are then added in rank order
+    until `max_tokens`, counted with the tokenizer of `model_name`, is reached,
+    with the last document trimmed to fit. The
+    number of tokens saved by the budget, compared with stuffing every regrouped
+    document into the prompt, is logged, along with the tokens removed as
+    duplicates and the tokens added or removed by regrouping.
+    """
+    tokens_retrieved = sum(count_tokens(doc.page_content, model_name) for doc in docs)
+
+    unique_docs = list({doc.page_content: doc for doc in docs}.values())
+    tokens_unique = sum(
+        count_tokens(doc.page_content, model_name) for doc in unique_docs
+    )
+    tokens_regrouped = tokens_unique
+    if regroup:
+        unique_docs = regroup_by_parent(unique_docs)
+        tokens_regrouped = sum(
+            count_tokens(doc.page_content, model_name) for doc in unique_docs
+        )
+
+    context = []
+    tokens_used = 0
+    for doc in unique_docs:
+        doc_tokens = count_tokens(doc.page_content, model_name)
+        remaining = None if max_tokens is None else max_tokens - tokens_used
+        if remaining is None or doc_tokens <= remaining:
+            context.append(doc)
+            tokens_used += doc_tokens
+            continue
+        if remaining >= MIN_TRIMMED_TOKENS:
+            trimmed = _trim_to_tokens(doc.page_content, remaining, model_name)
+            context.append(
+                Document(
+                    page_content=trimmed,
+                    metadata={**doc.metadata, "trimmed": True},
+                )
+            )
+            tokens_used += count_tokens(trimmed, model_name)
+        break
+
+    logger.info(
+        f"Context: {len(docs)} retrieved documents ({tokens_retrieved} tokens) "
+        f"assembled into {len(context)} ({tokens_used} tokens): "
+        f"{tokens_retrieved - tokens_unique} duplicate tokens removed, "
+        f"{tokens_regrouped - tokens_unique:+d} tokens from regrouping, "
+        f"{tokens_regrouped - tokens_used} tokens saved by the budget"
+    )
+    return context
@@ -0,0 +1,40 @@
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+class DelegatingRunnable(Runnable):
+    """Base class for wrappers of a runnable, passing every call through to
+    `bound` unless overridden."""
+
+    def __init__(self, bound: Runnable):
+        self.bound = bound
+
+    @property
+    def InputType(self) -> Any:
+        return self.bound.InputType
+
+    @property
+    def OutputType(self) -> Any:
+        return self.bound.OutputType
+
+    def invoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        return self.bound.invoke(input, config, **kwargs)
+
+    async def ainvoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        return await self.bound.ainvoke(input, config, **kwargs)
+
+    def stream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[Any]:
+        yield from self.bound.stream(input, config, **kwargs)
+
+    async def astream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        async for chunk in self.bound.astream(input, config, **kwargs):
+            yield chunk
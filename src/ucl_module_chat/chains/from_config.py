@@ -0,0 +1,88 @@
+import hydra
+import omegaconf
+from langchain_core.runnables import Runnable
+
+from ..utils.http_clients import http_client_kwargs
+from ..utils.resolve_paths import get_abs_path_using_repo_root
+from .caching import RagCache
+from .concurrency import ConcurrencyLimitedRunnable
+from .history import HistoryManager
+from .rag_chain import build_rag_chain
+
+
+def llm_from_config(cfg: omegaconf.DictConfig) -> Runnable:
+    """Instantiate the LLM, bounded to `app.max_concurrent_llm_calls` in-flight
+    calls if set. The same LLM should be used for the chain and for history
+    summaries, so that their calls share the bound."""
+    llm = hydra.utils.instantiate(cfg.models.llm, **http_client_kwargs(cfg.http.llm))
+    if cfg.app.max_concurrent_llm_calls is not None:
+        llm = ConcurrencyLimitedRunnable(llm, cfg.app.max_concurrent_llm_calls)
+    return llm
+
+
+def rag_chain_from_config(
+    cfg: omegaconf.DictConfig,
+    cache: RagCache | None = None,
+    llm: Runnable | None = None,
+) -> Runnable:
+    """Instantiate the models and build the RAG chain with the `app` settings,
+    using `llm` from `llm_from_config` if given."""
+    vectorstore_dir = get_abs_path_using_repo_root(cfg.vectorstore.dir)
+    if llm is None:
+        llm = llm_from_config(cfg)
+    embedding_model = hydra.utils.instantiate(
+        cfg.models.embedding, **http_client_kwargs(cfg.http.embedding)
+    )
+    return build_rag_chain(
+        llm=llm,
+        embedding_model=embedding_model,
+        vectorstore_dir=vectorstore_dir,
+        cache=cache,
+        module_code_lookup=cfg.app.module_code_lookup,
+        metadata_filtering=cfg.app.metadata_filtering,
+        retrieval_mode=cfg.app.retrieval_mode,
+        k=cfg.app.k,
+        n_candidates=cfg.app.n_candidates,
+        context_max_tokens=cfg.app.context_max_tokens,
+        search_params=cfg.vectorstore.search,
+        speculative_retrieval=cfg.app.speculative_retrieval,
+        min_query_overlap=cfg.app.min_query_overlap,
+        single_flight=cfg.app.single_flight,
+        model_name=cfg.models.llm.get("model"),
+    )
+
+
+def cache_from_config(cfg: omegaconf.DictConfig) -> RagCache | None:
+    """Create the cache for the RAG chain, if enabled."""
+    if not cfg.cache.enabled:
+        return None
+    return RagCache(
+        get_abs_path_using_repo_root(cfg.vectorstore.dir),
+        max_size=cfg.cache.max_size,
+        ttl_seconds=cfg.cache.ttl_seconds,
+        semantic_answer_cache=cfg.cache.semantic_answer_cache,
+        similarity_threshold=cfg.cache.similarity_threshold,
+        check_interval_seconds=cfg.cache.check_interval_seconds,
+    )
+
+
+def history_manager_from_config(
+    cfg: omegaconf.DictConfig, llm: Runnable | None = None
+) -> HistoryManager | None:
+    """Create the manager that keeps the chat history within budget, if a budget
+    is set. Summaries are written by `llm`, which should be the LLM passed to
+    `rag_chain_from_config`, or one from `llm_from_config` if not given."""
+    if cfg.history.max_turns is None and cfg.history.max_tokens is None:
+        return None
+    if not cfg.history.summarize:
+        llm = None
+    elif llm is None:
+        llm = llm_from_config(cfg)
+    return HistoryManager(
+        llm=llm,
+        max_turns=cfg.history.max_turns,
+        max_tokens=cfg.history.max_tokens,
+        max_sessions=cfg.history.max_sessions,
+        ttl_seconds=cfg.history.ttl_seconds,
+        model_name=cfg.models.llm.get("model"),
+    )
@@ -0,0 +1,177 @@
+import hashlib
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from loguru import logger
+
+from ..utils.tokens import count_tokens
+from .caching import TTLCache
+
+summary_prompt = """Summarise the conversation below, between a user and an
+        assistant that answers questions about modules at University College
+        London (UCL), for use as context in the rest of the conversation.
+        Build on the existing summary, if there is one. Keep the names and
+        codes of modules discussed and what the user wants to know, and use
+        at most 100 words.
+
+        Existing summary: {summary}
+
+        Conversation:
+        {conversation}"""
+
+
+def split_turns(messages: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """Group messages into turns, each starting with a user message."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _fingerprint(turns: list[list[BaseMessage]]) -> str:
+    digest = hashlib.sha256()
+    for turn in turns:
+        for message in turn:
+            digest.update(f"{message.type}:{message.content}\n".encode())
+    return digest.hexdigest()
+
+
+class HistoryManager:
+    """Keep the chat history sent to the LLM within a budget.
+
+    The most recent turns that fit within `max_turns` turns and `max_tokens`
+    tokens, counted with the tokenizer of `model_name`, are kept verbatim, always
+    including the latest turn. When the history outgrows the budget, the oldest
+    turns are folded into a running summary written by `llm`, and enough turns
+    are folded to bring the history down to half the budget, so the summary is
+    only updated every few turns. Without an `llm`, turns beyond the budget are
+    dropped instead.
+
+    The summary of each session is cached, along with a fingerprint of the turns
+    it covers, so it is extended rather than recomputed as the conversation goes
+    on, and recomputed if the earlier history changes (e.g. the chat is cleared).
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel | None = None,
+        max_turns: int | None = None,
+        max_tokens: int | None = None,
+        max_sessions: int = 1024,
+        ttl_seconds: float | None = 3600,
+        model_name: str | None = None,
+    ):
+        self.summary_chain = None
+        if llm is not None:
+            self.summary_chain = (
+                ChatPromptTemplate.from_messages([("human", summary_prompt)])
+                | llm
+                | StrOutputParser()
+            ).with_config(run_name="summarize_history")
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.model_name = model_name
+        self.summaries = TTLCache(max_sessions, ttl_seconds)
+
+    def _n_recent_turns(self, turns: list[list[BaseMessage]], fraction: float) -> int:
+        """Number of most recent turns that fit within `fraction` of the budget,
+        at least one."""
+        max_turns = len(turns) if self.max_turns is None else self.max_turns
+        max_tokens = None if self.max_tokens is None else self.max_tokens * fraction
+        n_turns, n_tokens = 0, 0
+        for turn in reversed(turns):
+            n_tokens += sum(count_tokens(str(m.content), self.model_name) for m in turn)
+            if n_turns >= max(1, int(max_turns * fraction)) or (
+                max_tokens is not None and n_tokens > max_tokens
+            ):
+                break
+            n_turns += 1
+        return max(1, n_turns)
+
+    def _cached_summary(
+        self, session_id: str, turns: list[list[BaseMessage]]
+    ) -> tuple[int, str | None]:
+        """Number of turns covered by the cached summary of the session, and the
+        summary, if the summary is still valid for these turns."""
+        entry = self.summaries.get(session_id)
+        if entry is not None:
+            n_folded, fingerprint, summary = entry
+            if n_folded <= len(turns) and _fingerprint(turns[:n_folded]) == fingerprint:
+                return n_folded, summary
+        return 0, None
+
+    def _plan(
+        self, session_id: str, messages: list[BaseMessage]
+    ) -> tuple[list[list[BaseMessage]], int, str | None, int]:
+        turns = split_turns(messages)
+        n_folded, summary = self._cached_summary(session_id, turns)
+        n_fold = n_folded
+        if len(turns) - n_folded > self._n_recent_turns(turns, 1.0):
+            # Turns are only dropped, not summarised, without an LLM
+            fraction = 1.0 if self.summary_chain is None else 0.5
+            n_fold = len(turns) - self._n_recent_turns(turns, fraction)
+        return turns, n_folded, summary, n_fold
+
+    def _summary_input(
+        self, turns: list[list[BaseMessage]], summary: str | None
+    ) -> dict:
+        conversation = "\n".join(
+            f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}"
+            for turn in turns
+            for m in turn
+        )
+        return {"summary": summary or "None", "conversation": conversation}
+
+    def _store(
+        self,
+        session_id: str,
+        turns: list[list[BaseMessage]],
+        n_folded: int,
+        summary: str | None,
+    ) -> list[BaseMessage]:
+        logger.debug(f"Folded {n_folded} turns of session {session_id} into summary")
+        self.summaries.set(
+            session_id, (n_folded, _fingerprint(turns[:n_folded]), summary)
+        )
+        return self._messages(turns, n_folded, summary)
+
+    @staticmethod
+    def _messages(
+        turns: list[list[BaseMessage]], n_folded: int, summary: str | None
+    ) -> list[BaseMessage]:
+        messages = [m for turn in turns[n_folded:] for m in turn]
+        if summary:
+            messages.insert(
+                0, SystemMessage(f"Summary of the earlier conversation: {summary}")
+            )
+        return messages
+
+    def compact(
+        self, session_id: str, messages: list[BaseMessage]
+    ) -> list[BaseMessage]:
+        """Return the history to send to the LLM for a session."""
+        turns, n_folded, summary, n_fold = self._plan(session_id, messages)
+        if n_fold == n_folded:
+            return self._messages(turns, n_folded, summary)
+        if self.summary_chain is not None:
+            summary = self.summary_chain.invoke(
+                self._summary_input(turns[n_folded:n_fold], summary)
+            )
+        return self._store(session_id, turns, n_fold, summary)
+
+    async def acompact(
+        self, session_id: str, messages: list[BaseMessage]
+    ) -> list[BaseMessage]:
+        """Return the history to send to the LLM for a session."""
+        turns, n_folded, summary, n_fold = self._plan(session_id, messages)
+        if n_fold == n_folded:
+            return self._messages(turns, n_folded, summary)
+        if self.summary_chain is not None:
+            summary = await self.summary_chain.ainvoke(
+                self._summary_input(turns[n_folded:n_fold], summary)
+            )
+        return self._store(session_id, turns, n_fold, summary)
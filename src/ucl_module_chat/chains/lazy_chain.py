@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Callable
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+
+class LazyChain:
+    """Build a chain on first use, at most once, and reuse it for every request.
+
+    `builder` is called in whichever thread first needs the chain, or in a
+    background thread started by `start_background_build`, so that a UI can start
+    serving while the models and vectorstore load. Other threads wait for the
+    build in progress rather than starting their own. If the build fails, the
+    error is raised to every caller.
+    """
+
+    def __init__(self, builder: Callable[[], "Runnable"]):
+        self.builder = builder
+        self.build_seconds: float | None = None
+        self._chain: "Runnable | None" = None
+        self._error: BaseException | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_built(self) -> bool:
+        return self._chain is not None
+
+    def get(self) -> "Runnable":
+        """Return the chain, building it if this is the first call."""
+        with self._lock:
+            if self._chain is None and self._error is None:
+                start = time.perf_counter()
+                try:
+                    self._chain = self.builder()
+                except BaseException as e:
+                    self._error = e
+                else:
+                    self.build_seconds = time.perf_counter() - start
+                    logger.info(f"Chain built in {self.build_seconds:.2f}s")
+            if self._error is not None:
+                raise self._error
+            return self._chain
+
+    async def aget(self) -> "Runnable":
+        """Return the chain, waiting in a worker thread for any build to finish so
+        that the event loop is not blocked."""
+        if self._chain is not None:
+            return self._chain
+        return await asyncio.to_thread(self.get)
+
+    def start_background_build(self) -> threading.Thread:
+        """Start building the chain in a daemon thread."""
+
+        def build() -> None:
+            try:
+                self.get()
+            except BaseException as e:
+                logger.error(f"Failed to build chain: {e}")
+
+        thread = threading.Thread(target=build, name="build-chain", daemon=True)
+        thread.start()
+        return thread
@@ -3,10 +3,27 @@ from pathlib import Path
 from dotenv import load_dotenv
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.vectorstores import FAISS
 from langchain_core.embeddings.embeddings import Embeddings
 from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
+
+from ..retrieval.bm25 import RETRIEVAL_MODES, HybridRetriever, load_bm25_index
+from ..retrieval.docstore import load_vectorstore
+from ..retrieval.faiss_index import configure_search
+from ..retrieval.metadata import FilteredRetriever, load_metadata_index
+from ..retrieval.module_codes import ModuleCodeRetriever, load_module_code_index
+from .caching import (
+    CachedQueryEmbeddings,
+    CachedRetriever,
+    RagCache,
+    SemanticAnswerCacheRunnable,
+)
+from .concurrency import ConcurrencyLimitedRunnable
+from .context_assembly import assemble_context
+from .single_flight import SingleFlightRunnable
+from .speculative_retrieval import SpeculativeHistoryAwareRetriever
 
 load_dotenv()
 
@@ -37,14 +54,106 @@ rag_prompt = """You are an assistant for question-answering tasks related
         {context}"""
 
 
+def build_retriever(
+    embedding_model: Embeddings,
+    vectorstore_dir: str | Path,
+    cache: RagCache | None = None,
+    module_code_lookup: bool = True,
+    metadata_filtering: bool = True,
+    retrieval_mode: str = "hybrid",
+    k: int = 4,
+    n_candidates: int = 20,
+    search_params: dict | None = None,
+) -> BaseRetriever:
+    """Build the retriever used by the RAG chain to search for the standalone
+    question, before the context is assembled. See `build_rag_chain` for the
+    parameters."""
+    if retrieval_mode not in RETRIEVAL_MODES:
+        raise ValueError(
+            f"retrieval_mode must be one of {RETRIEVAL_MODES}, got {retrieval_mode}"
+        )
+
+    vectorstore = load_vectorstore(vectorstore_dir, embedding_model)
+    configure_search(vectorstore.index, **(search_params or {}))
+    metadata_index = None
+    dense_k = k if retrieval_mode == "dense" else n_candidates
+    if metadata_filtering:
+        metadata_index = load_metadata_index(vectorstore_dir, vectorstore)
+        retriever = FilteredRetriever(
+            vectorstore=vectorstore, metadata_index=metadata_index, k=dense_k
+        )
+    else:
+        retriever = vectorstore.as_retriever(search_kwargs={"k": dense_k})
+    if retrieval_mode != "dense":
+        retriever = HybridRetriever(
+            dense_retriever=retriever,
+            vectorstore=vectorstore,
+            bm25_index=load_bm25_index(vectorstore_dir, vectorstore),
+            metadata_index=metadata_index,
+            mode=retrieval_mode,
+            k=k,
+            n_candidates=n_candidates,
+        )
+    if module_code_lookup:
+        retriever = ModuleCodeRetriever(
+            retriever=retriever,
+            vectorstore=vectorstore,
+            module_code_index=load_module_code_index(vectorstore_dir, vectorstore),
+        )
+    if cache is not None:
+        retriever = CachedRetriever(retriever=retriever, rag_cache=cache)
+    return retriever
+
+
 def build_rag_chain(
     llm: BaseChatModel,
     embedding_model: Embeddings,
     vectorstore_dir: str | Path,
     context_system_prompt: str = context_prompt,
     rag_system_prompt: str = rag_prompt,
+    max_concurrent_llm_calls: int | None = None,
+    cache: RagCache | None = None,
+    module_code_lookup: bool = True,
+    metadata_filtering: bool = True,
+    retrieval_mode: str = "hybrid",
+    k: int = 4,
+    n_candidates: int = 20,
+    context_max_tokens: int | None = None,
+    search_params: dict | None = None,
+    speculative_retrieval: bool = False,
+    min_query_overlap: float = 0.7,
+    single_flight: bool = False,
+    model_name: str | None = None,
 ):
-    """Build a RAG chain for the UCL module chatbot."""
+    """Build a RAG chain for the UCL module chatbot.
+
+    If `max_concurrent_llm_calls` is set, the number of in-flight LLM calls made by
+    the chain, across all concurrent requests, is bounded to stay within provider
+    rate limits. If a `cache` is provided, query embeddings, retrieval results and
+    (optionally) answers to first-turn questions are cached. With
+    `module_code_lookup`, documents for module codes named in the question are
+    fetched directly and merged with the vector search results. With
+    `metadata_filtering`, filters such as level, teaching term and department
+    inferred from the standalone question restrict the vector search to matching
+    modules.
+
+    `retrieval_mode` selects "dense" (FAISS) search, "lexical" (BM25) search or
+    "hybrid" search, which fuses the top `n_candidates` from each with reciprocal
+    rank fusion. `k` documents are retrieved, and are deduplicated, regrouped by
+    module if they are section chunks and trimmed to `context_max_tokens` before
+    being passed to the LLM as context, counting tokens with the tokenizer of
+    `model_name`. `search_params` (`nprobe`, `ef_search`) are applied to IVF and
+    HNSW indexes.
+
+    With `speculative_retrieval`, follow-up questions are searched for while they
+    are being contextualized, and self-contained follow-up questions are not
+    rephrased (see `SpeculativeHistoryAwareRetriever`).
+
+    With `single_flight`, concurrent identical requests share one execution of
+    the chain and its streamed output (see `SingleFlightRunnable`).
+    """
+    if max_concurrent_llm_calls is not None:
+        llm = ConcurrencyLimitedRunnable(llm, max_concurrent_llm_calls)
 
     contextualize_q_prompt = ChatPromptTemplate.from_messages(
         [
@@ -53,15 +162,33 @@ def build_rag_chain(
             ("human", "{input}"),
         ]
     )
-    vectorstore = FAISS.load_local(
-        vectorstore_dir,
-        embeddings=embedding_model,
-        allow_dangerous_deserialization=True,
+    if cache is not None:
+        embedding_model = CachedQueryEmbeddings(embedding_model, cache.query_embeddings)
+    retriever = build_retriever(
+        embedding_model=embedding_model,
+        vectorstore_dir=vectorstore_dir,
+        cache=cache,
+        module_code_lookup=module_code_lookup,
+        metadata_filtering=metadata_filtering,
+        retrieval_mode=retrieval_mode,
+        k=k,
+        n_candidates=n_candidates,
+        search_params=search_params,
     )
-    retriever = vectorstore.as_retriever()
 
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_q_prompt
+    if speculative_retrieval:
+        history_aware_retriever = SpeculativeHistoryAwareRetriever(
+            llm, retriever, contextualize_q_prompt, min_overlap=min_query_overlap
+        )
+    else:
+        history_aware_retriever = create_history_aware_retriever(
+            llm, retriever, contextualize_q_prompt
+        )
+    history_aware_retriever = history_aware_retriever | RunnableLambda(
+        lambda docs: assemble_context(
+            docs, max_tokens=context_max_tokens, model_name=model_name
+        ),
+        name="assemble_context",
     )
 
     qa_prompt = ChatPromptTemplate.from_messages(
@@ -83,4 +210,9 @@ def build_rag_chain(
         history_aware_retriever, question_answer_chain
     ).with_config(tags=["rag"])
 
+    if cache is not None and cache.semantic_answer_cache:
+        rag_chain = SemanticAnswerCacheRunnable(rag_chain, cache, embedding_model)
+    if single_flight:
+        rag_chain = SingleFlightRunnable(rag_chain)
+
     return rag_chain
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, AsyncIterator, Hashable, Optional
+
+from langchain_core.callbacks import CallbackManager
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+from loguru import logger
+
+from .caching import accumulate_chunk
+from .delegating import DelegatingRunnable
+
+# Custom callback event dispatched when a request is served by another request's
+# in-flight execution of the chain
+SINGLE_FLIGHT_EVENT = "single_flight"
+
+
+def _request_key(input: dict) -> Hashable:
+    """Key of a request to the RAG chain: the question, ignoring case and
+    whitespace, and the chat history."""
+    question = " ".join(input["input"].split()).casefold()
+    history = tuple(
+        (m.type, str(m.content)) if isinstance(m, BaseMessage) else repr(m)
+        for m in input.get("chat_history", [])
+    )
+    return question, history
+
+
+class _Flight:
+    """An in-flight execution of the chain, with the chunks streamed so far."""
+
+    def __init__(self):
+        self.chunks: list[Any] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.n_consumers = 0
+        self.condition = asyncio.Condition()
+        self.task: asyncio.Task | None = None
+
+
+class SingleFlightRunnable(DelegatingRunnable):
+    """Wrap a RAG chain so concurrent identical async requests share one execution,
+    each caller being streamed every chunk. Sync calls are passed through."""
+
+    def __init__(self, bound: Runnable):
+        super().__init__(bound)
+        self.n_executions = 0
+        self.n_coalesced = 0
+        self._flights = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        return {"executions": self.n_executions, "coalesced": self.n_coalesced}
+
+    def _loop_flights(self) -> dict[Hashable, _Flight]:
+        loop = asyncio.get_running_loop()
+        if loop not in self._flights:
+            self._flights[loop] = {}
+        return self._flights[loop]
+
+    async def _produce(
+        self,
+        flight: _Flight,
+        flights: dict[Hashable, _Flight],
+        key: Hashable,
+        input: dict,
+        config: Optional[RunnableConfig],
+        **kwargs: Any,
+    ) -> None:
+        try:
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                async with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+        except BaseException as e:
+            flight.error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            flights.pop(key, None)
+            async with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    async def _consume(self, flight: _Flight) -> AsyncIterator[Any]:
+        flight.n_consumers += 1
+        n_consumed = 0
+        try:
+            while True:
+                async with flight.condition:
+                    await flight.condition.wait_for(
+                        lambda: flight.done or len(flight.chunks) > n_consumed
+                    )
+                    chunks = flight.chunks[n_consumed:]
+                    done = flight.done
+                for chunk in chunks:
+                    n_consumed += 1
+                    yield chunk
+                if done and n_consumed == len(flight.chunks):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            flight.n_consumers -= 1
+            if flight.n_consumers == 0 and not flight.done:
+                flight.task.cancel()
+
+    def _join_or_start(
+        self, input: dict, config: Optional[RunnableConfig], **kwargs: Any
+    ) -> _Flight:
+        flights = self._loop_flights()
+        key = _request_key(input)
+        flight = flights.get(key)
+        if flight is not None:
+            with self._lock:
+                self.n_coalesced += 1
+            logger.debug(f"Coalesced request with an in-flight request, {self.stats()}")
+            callbacks = (config or {}).get("callbacks")
+            if callbacks:
+                CallbackManager.configure(callbacks).on_custom_event(
+                    SINGLE_FLIGHT_EVENT, {"coalesced": True}
+                )
+            return flight
+        with self._lock:
+            self.n_executions += 1
+        flight = _Flight()
+        flights[key] = flight
+        flight.task = asyncio.create_task(
+            self._produce(flight, flights, key, input, config, **kwargs)
+        )
+        return flight
+
+    async def astream(
+        self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[dict]:
+        flight = self._join_or_start(input, config, **kwargs)
+        async for chunk in self._consume(flight):
+            yield chunk
+
+    async def ainvoke(
+        self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> dict:
+        result = {}
+        async for chunk in self.astream(input, config, **kwargs):
+            accumulate_chunk(result, chunk)
+        return result
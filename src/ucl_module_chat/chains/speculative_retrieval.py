@@ -0,0 +1,202 @@
+import asyncio
+import re
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.callbacks import CallbackManager
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import get_executor_for_config
+
+from ..retrieval.bm25 import tokenize
+from ..retrieval.module_codes import MODULE_CODE_PATTERN
+
+# Custom callback event dispatched with {"outcome": ..., "latency_saved_seconds":
+# ...} for each follow-up question
+SPECULATIVE_RETRIEVAL_EVENT = "speculative_retrieval"
+
+WORD_PATTERN = re.compile(r"[a-z']+")
+
+# Words that usually refer back to something earlier in the conversation
+REFERENCE_WORDS = frozenset(
+    """it its it's they them their theirs this that these those he him his she
+    her hers one ones former latter above same other another previous""".split()
+)
+
+# Questions with fewer content words than this are likely to be elliptical,
+# e.g. "And in term 2?"
+MIN_CONTENT_WORDS = 3
+
+# Weight of the latest call in the running estimate of contextualization latency
+LATENCY_SMOOTHING = 0.2
+
+
+def is_self_contained(question: str) -> bool:
+    """Whether a follow-up question can be understood without the chat history:
+    it names a module code, or it has no words that refer back to the
+    conversation and is not too short to stand alone."""
+    if MODULE_CODE_PATTERN.search(question):
+        return True
+    if set(WORD_PATTERN.findall(question.lower())) & REFERENCE_WORDS:
+        return False
+    return len(tokenize(question)) >= MIN_CONTENT_WORDS
+
+
+def query_overlap(question: str, speculative_query: str) -> float:
+    """Fraction of the content words of `question` found in `speculative_query`."""
+    question_terms = set(tokenize(question))
+    if not question_terms:
+        return 1.0
+    return len(question_terms & set(tokenize(speculative_query))) / len(question_terms)
+
+
+class SpeculativeHistoryAwareRetriever(Runnable):
+    """History-aware retriever, like `create_history_aware_retriever`, that skips
+    rephrasing self-contained follow-up questions and otherwise searches
+    speculatively while the question is rephrased."""
+
+    def __init__(
+        self,
+        llm: BaseChatModel | Runnable,
+        retriever: BaseRetriever | Runnable,
+        prompt: BasePromptTemplate,
+        min_overlap: float = 0.7,
+    ):
+        self.retriever = retriever
+        self.contextualize_chain = (prompt | llm | StrOutputParser()).with_config(
+            run_name="contextualize_question"
+        )
+        self.min_overlap = min_overlap
+        self.contextualize_seconds: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def InputType(self) -> Any:
+        return dict
+
+    @property
+    def OutputType(self) -> Any:
+        return list[Document]
+
+    @staticmethod
+    def _speculative_query(input: dict) -> str:
+        for message in reversed(input["chat_history"]):
+            if isinstance(message, HumanMessage):
+                return f"{message.content}\n{input['input']}"
+        return input["input"]
+
+    def _record_contextualize_seconds(self, seconds: float) -> None:
+        with self._lock:
+            if self.contextualize_seconds is None:
+                self.contextualize_seconds = seconds
+            else:
+                self.contextualize_seconds += LATENCY_SMOOTHING * (
+                    seconds - self.contextualize_seconds
+                )
+
+    @staticmethod
+    def _report(
+        config: Optional[RunnableConfig], outcome: str, latency_saved: float
+    ) -> None:
+        callbacks = (config or {}).get("callbacks")
+        if callbacks:
+            CallbackManager.configure(callbacks).on_custom_event(
+                SPECULATIVE_RETRIEVAL_EVENT,
+                {"outcome": outcome, "latency_saved_seconds": latency_saved},
+            )
+
+    def _resolve(
+        self,
+        config: Optional[RunnableConfig],
+        question: str,
+        speculative_query: str,
+        start: float,
+        contextualized_at: float,
+        speculative_done_at: float,
+    ) -> bool:
+        """Record the timings of a speculative search and return whether its
+        results can be used for the standalone `question`."""
+        self._record_contextualize_seconds(contextualized_at - start)
+        if query_overlap(question, speculative_query) < self.min_overlap:
+            self._report(config, "rerun", 0.0)
+            return False
+        # The search would have started once the question was contextualized
+        search_seconds = speculative_done_at - start
+        latency_saved = search_seconds - max(
+            0.0, speculative_done_at - contextualized_at
+        )
+        self._report(config, "reused", latency_saved)
+        return True
+
+    def invoke(
+        self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> list[Document]:
+        if not input.get("chat_history"):
+            return self.retriever.invoke(input["input"], config)
+        if is_self_contained(input["input"]):
+            self._report(config, "skipped_rephrase", self.contextualize_seconds or 0.0)
+            return self.retriever.invoke(input["input"], config)
+
+        speculative_query = self._speculative_query(input)
+
+        def speculate() -> tuple[list[Document], float]:
+            docs = self.retriever.invoke(speculative_query, config)
+            return docs, time.perf_counter()
+
+        start = time.perf_counter()
+        with get_executor_for_config(config) as executor:
+            future = executor.submit(speculate)
+            question = self.contextualize_chain.invoke(input, config)
+            contextualized_at = time.perf_counter()
+            docs, speculative_done_at = future.result()
+        if self._resolve(
+            config,
+            question,
+            speculative_query,
+            start,
+            contextualized_at,
+            speculative_done_at,
+        ):
+            return docs
+        return self.retriever.invoke(question, config)
+
+    async def ainvoke(
+        self, input: dict, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> list[Document]:
+        if not input.get("chat_history"):
+            return await self.retriever.ainvoke(input["input"], config)
+        if is_self_contained(input["input"]):
+            self._report(config, "skipped_rephrase", self.contextualize_seconds or 0.0)
+            return await self.retriever.ainvoke(input["input"], config)
+
+        speculative_query = self._speculative_query(input)
+
+        async def speculate() -> tuple[list[Document], float]:
+            docs = await self.retriever.ainvoke(speculative_query, config)
+            return docs, time.perf_counter()
+
+        start = time.perf_counter()
+        speculation = asyncio.create_task(speculate())
+        try:
+            question = await self.contextualize_chain.ainvoke(input, config)
+        except BaseException:
+            speculation.cancel()
+            raise
+        contextualized_at = time.perf_counter()
+        docs, speculative_done_at = await speculation
+        if self._resolve(
+            config,
+            question,
+            speculative_query,
+            start,
+            contextualized_at,
+            speculative_done_at,
+        ):
+            return docs
+        return await self.retriever.ainvoke(question, config)
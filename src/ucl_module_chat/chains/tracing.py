@@ -0,0 +1,155 @@
+import time
+from collections import defaultdict
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .caching import CACHE_HIT_EVENT
+from .single_flight import SINGLE_FLIGHT_EVENT
+from .speculative_retrieval import SPECULATIVE_RETRIEVAL_EVENT
+
+STAGES = ("contextualize", "retrieval", "prompt_assembly", "generation")
+
+# Runs that turn the retrieved documents and the question into the QA prompt.
+# The "format_inputs" step of the QA chain is not included because, when
+# streaming, it starts as soon as the request does and waits for retrieval.
+PROMPT_ASSEMBLY_RUNS = {"assemble_context"}
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Trace one request to the RAG chain: the wall time spent in each stage, the
+    tokens used by each LLM call, the IDs of the retrieved documents, the cache
+    layers that were hit, the outcome of any speculative retrieval and whether
+    the request shared the execution of an identical in-flight request.
+
+    Stages are identified from the callbacks of the chain built by
+    `build_rag_chain`:
+
+    - "contextualize": the LLM call that rephrases the question using the chat
+      history (skipped when there is no history).
+    - "retrieval": the outermost retriever, including embedding the query.
+    - "prompt_assembly": assembling the context and formatting the QA prompt.
+    - "generation": the LLM call in the "qa"-tagged chain.
+
+    The time to the first generated token, measured from when the handler was
+    created, is recorded as "time_to_first_token". Use a new handler for each
+    request.
+    """
+
+    # Record times as events happen rather than in a thread pool
+    run_inline = True
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings: dict[str, float] = defaultdict(float)
+        self.tokens: dict[str, dict[str, int]] = {}
+        self.document_ids: list[str] = []
+        self.cache_hits: list[str] = []
+        self.speculative_retrieval: dict | None = None
+        self.coalesced = False
+        self._runs: dict[UUID, tuple[str, float]] = {}
+        self._retriever_runs: set[UUID] = set()
+
+    def _start(self, run_id: UUID, stage: str | None) -> None:
+        if stage is not None:
+            self._runs[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> str | None:
+        if run_id not in self._runs:
+            return None
+        stage, start = self._runs.pop(run_id)
+        self.timings[stage] += time.perf_counter() - start
+        return stage
+
+    def trace(self) -> dict:
+        """Return the trace of the request, for logging or aggregation."""
+        return {
+            "total_seconds": time.perf_counter() - self.start,
+            "stage_seconds": dict(self.timings),
+            "tokens": self.tokens,
+            "document_ids": self.document_ids,
+            "cache_hits": self.cache_hits,
+            "speculative_retrieval": self.speculative_retrieval,
+            "coalesced": self.coalesced,
+        }
+
+    def on_chat_model_start(
+        self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        tags = kwargs.get("tags") or []
+        self._start(run_id, "generation" if "qa" in tags else "contextualize")
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if (
+            "time_to_first_token" not in self.timings
+            and self._runs.get(run_id, ("",))[0] == "generation"
+        ):
+            self.timings["time_to_first_token"] = time.perf_counter() - self.start
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        stage = self._end(run_id)
+        if stage is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    stage_tokens = self.tokens.setdefault(
+                        stage, {"input": 0, "output": 0}
+                    )
+                    stage_tokens["input"] += usage.get("input_tokens", 0)
+                    stage_tokens["output"] += usage.get("output_tokens", 0)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_retriever_start(
+        self,
+        serialized: dict,
+        query: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        # Retrievers wrapping other retrievers are timed once, at the outermost
+        if parent_run_id not in self._retriever_runs:
+            self._start(run_id, "retrieval")
+        self._retriever_runs.add(run_id)
+
+    def on_retriever_end(self, documents: Any, *, run_id: UUID, **kwargs) -> None:
+        if self._end(run_id) is not None:
+            self.document_ids.extend(doc.id for doc in documents if doc.id)
+
+    def on_retriever_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end(run_id)
+
+    def on_chain_start(
+        self, serialized: dict, inputs: Any, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        name = kwargs.get("name")
+        tags = kwargs.get("tags") or []
+        if name in PROMPT_ASSEMBLY_RUNS or (
+            name == "ChatPromptTemplate" and "qa" in tags
+        ):
+            self._start(run_id, "prompt_assembly")
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end(run_id)
+
+    def on_custom_event(self, name: str, data: Any, **kwargs: Any) -> None:
+        if name == CACHE_HIT_EVENT:
+            self.cache_hits.append(data["layer"])
+        elif name == SPECULATIVE_RETRIEVAL_EVENT:
+            self.speculative_retrieval = data
+        elif name == SINGLE_FLIGHT_EVENT:
+            self.coalesced = True
@@ -0,0 +1,142 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings.embeddings import Embeddings
+from loguru import logger
+from tqdm import tqdm
+
+from ucl_module_chat.utils.file_io import content_hash
+from ucl_module_chat.utils.rate_limiting import TokenBucket
+from ucl_module_chat.utils.tokens import count_tokens
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embed documents in concurrent, rate-limited and checkpointed batches.
+
+    Documents are split into batches of `batch_size` and up to
+    `max_concurrent_batches` batches are sent to the underlying model at once, at
+    no more than `requests_per_second`. Failed batches are retried with
+    exponential backoff. If `checkpoint_dir` is set, each completed batch is saved
+    to disk under a hash of its texts, so a rerun after a failure resumes from the
+    batches that had not yet completed. Checkpoints are removed once every batch
+    has been embedded. Set `show_progress` to False to disable the progress bar
+    and throughput report, e.g. when called for each batch by another stage.
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        batch_size: int = 256,
+        max_concurrent_batches: int = 4,
+        requests_per_second: float | None = None,
+        checkpoint_dir: str | Path | None = None,
+        max_retries: int = 3,
+        backoff_seconds: float = 2.0,
+        show_progress: bool = True,
+    ):
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self.rate_limiter = (
+            TokenBucket(requests_per_second) if requests_per_second else None
+        )
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.show_progress = show_progress
+
+    def _checkpoint_path(self, batch: list[str]) -> Path | None:
+        if self.checkpoint_dir is None:
+            return None
+        batch_hash = content_hash("".join(content_hash(text) for text in batch))
+        return self.checkpoint_dir / f"{batch_hash}.npy"
+
+    def _embed_batch(self, batch: list[str]) -> np.ndarray:
+        """Embed a batch, retrying on failure and saving a checkpoint."""
+        checkpoint_path = self._checkpoint_path(batch)
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                vectors = np.asarray(
+                    self.embedding_model.embed_documents(batch), dtype=np.float32
+                )
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_seconds * 2**attempt
+                logger.warning(f"Embedding batch failed ({e}), retrying in {delay}s")
+                time.sleep(delay)
+        if checkpoint_path is not None:
+            # Write then rename so an interrupted run never leaves a partial file
+            tmp_path = checkpoint_path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, vectors)
+            os.replace(tmp_path, checkpoint_path)
+        return vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        batches = [
+            texts[i : i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        results = [None] * len(batches)
+        if self.checkpoint_dir is not None:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+        pending = []
+        for i, batch in enumerate(batches):
+            checkpoint_path = self._checkpoint_path(batch)
+            if checkpoint_path is not None and checkpoint_path.exists():
+                results[i] = np.load(checkpoint_path)
+            else:
+                pending.append(i)
+        if len(pending) < len(batches):
+            logger.info(
+                f"Resuming from {len(batches) - len(pending)} checkpointed batches"
+            )
+
+        n_docs = sum(len(batches[i]) for i in pending)
+        n_tokens = sum(count_tokens(text) for i in pending for text in batches[i])
+        start = time.perf_counter()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_batches) as executor:
+            futures = {
+                executor.submit(self._embed_batch, batches[i]): i for i in pending
+            }
+            for future in tqdm(
+                as_completed(futures),
+                total=len(futures),
+                disable=not self.show_progress,
+            ):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    logger.error(f"Embedding batch {futures[future]} failed: {e}")
+                    failed += 1
+        elapsed_seconds = time.perf_counter() - start
+
+        if failed:
+            raise RuntimeError(
+                f"{failed} of {len(batches)} embedding batches failed, rerun to "
+                "resume from the completed batches"
+            )
+        if self.show_progress and elapsed_seconds > 0 and n_docs > 0:
+            logger.info(
+                f"Embedding throughput: {n_docs / elapsed_seconds:.1f} docs/sec, "
+                f"{n_tokens / elapsed_seconds:.0f} tokens/sec"
+            )
+
+        for batch in batches:
+            checkpoint_path = self._checkpoint_path(batch)
+            if checkpoint_path is not None:
+                checkpoint_path.unlink(missing_ok=True)
+
+        return [vector.tolist() for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embedding_model.embed_query(text)
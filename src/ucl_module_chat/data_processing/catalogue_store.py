@@ -0,0 +1,199 @@
+import json
+import sqlite3
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+
+# Fields of the module information extracted by `_extract_module_info_from_html`,
+# each stored in its own column; any other fields are stored as JSON in "extra"
+MODULE_FIELDS = (
+    "module_title",
+    "module_code",
+    "url",
+    "faculty",
+    "teaching_department",
+    "level",
+    "teaching_term",
+    "credit_value",
+    "subject",
+    "keywords",
+    "alternative_credit_options",
+    "description",
+    "restrictions",
+)
+DELIVERY_FIELDS = (
+    "teaching_term",
+    "type",
+    "fheq_level",
+    "mode_of_study",
+    "methods_of_assessment",
+    "mark_scheme",
+    "contact_email",
+    "number_of_students_prior_year",
+)
+
+# Value columns have no declared type so that values keep the type they were
+# extracted with. "fields" lists the fields present in each record, so that a
+# missing field and a field set to None are told apart when records are read.
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS modules (
+    stem TEXT PRIMARY KEY,
+    html_hash TEXT NOT NULL,
+    extractor_version TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    extra TEXT,
+    {", ".join(MODULE_FIELDS)}
+);
+CREATE INDEX IF NOT EXISTS modules_module_code ON modules (module_code);
+CREATE TABLE IF NOT EXISTS deliveries (
+    stem TEXT NOT NULL REFERENCES modules (stem) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    fields TEXT NOT NULL,
+    extra TEXT,
+    {", ".join(DELIVERY_FIELDS)},
+    PRIMARY KEY (stem, position)
+) WITHOUT ROWID;
+"""
+
+
+def _row_values(record: dict, columns: tuple[str, ...], nested: str = "") -> tuple:
+    """The list of fields present in a record and any fields other than
+    `columns` and the `nested` field, both as JSON, followed by the values of
+    `columns`."""
+    extra = {
+        key: value
+        for key, value in record.items()
+        if key not in columns and key != nested
+    }
+    return (
+        json.dumps(list(record)),
+        json.dumps(extra) if extra else None,
+        *(record.get(column) for column in columns),
+    )
+
+
+def _record_from_row(row: sqlite3.Row, columns: tuple[str, ...], **nested) -> dict:
+    values = {column: row[column] for column in columns} | nested
+    if row["extra"] is not None:
+        values.update(json.loads(row["extra"]))
+    return {key: values[key] for key in json.loads(row["fields"])}
+
+
+class CatalogueStore:
+    """Module information extracted from the catalogue pages, in a single SQLite
+    file.
+
+    Each module is stored under the stem of its HTML file, with a row in
+    "modules" for the module fields and a row in "deliveries" for each delivery,
+    along with the hash of the HTML it was extracted from and the extractor
+    version so that unchanged pages need not be parsed again. Module codes are
+    indexed for lookup. Records read back are equal to the module information
+    that was stored.
+
+    A single connection is shared by all threads and guarded by a lock, as
+    SQLite allows one writer at a time in any case.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "CatalogueStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def versions(self) -> dict[str, tuple[str, str]]:
+        """The HTML hash and extractor version of each stored module, by stem."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT stem, html_hash, extractor_version FROM modules"
+            ).fetchall()
+        return {stem: (html_hash, version) for stem, html_hash, version in rows}
+
+    def put_many(self, records: Iterable[tuple[str, dict, str, str]]) -> None:
+        """Insert or replace modules, given as (stem, module info, HTML hash,
+        extractor version), in a single transaction."""
+        module_sql = (
+            f"INSERT INTO modules VALUES "
+            f"(?, ?, ?, ?, ?, {', '.join('?' * len(MODULE_FIELDS))})"
+        )
+        delivery_sql = (
+            f"INSERT INTO deliveries VALUES "
+            f"(?, ?, ?, ?, {', '.join('?' * len(DELIVERY_FIELDS))})"
+        )
+        with self._lock, self.connection:
+            for stem, module_info, html_hash, version in records:
+                # Deleting the module deletes its deliveries by cascade
+                self.connection.execute("DELETE FROM modules WHERE stem = ?", (stem,))
+                self.connection.execute(
+                    module_sql,
+                    (
+                        stem,
+                        html_hash,
+                        version,
+                        *_row_values(module_info, MODULE_FIELDS, "deliveries"),
+                    ),
+                )
+                self.connection.executemany(
+                    delivery_sql,
+                    [
+                        (stem, i, *_row_values(delivery, DELIVERY_FIELDS))
+                        for i, delivery in enumerate(module_info.get("deliveries", []))
+                    ],
+                )
+
+    def put(self, stem: str, module_info: dict, html_hash: str, version: str) -> None:
+        self.put_many([(stem, module_info, html_hash, version)])
+
+    def delete(self, stems: Iterable[str]) -> None:
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM modules WHERE stem = ?", [(stem,) for stem in stems]
+            )
+
+    def _records(self, where: str = "", params: tuple = ()) -> list[tuple[str, dict]]:
+        with self._lock:
+            module_rows = self.connection.execute(
+                f"SELECT * FROM modules {where} ORDER BY stem", params
+            ).fetchall()
+            delivery_rows = self.connection.execute(
+                "SELECT * FROM deliveries WHERE stem IN "
+                f"(SELECT stem FROM modules {where}) ORDER BY stem, position",
+                params,
+            ).fetchall()
+        deliveries = {}
+        for row in delivery_rows:
+            deliveries.setdefault(row["stem"], []).append(
+                _record_from_row(row, DELIVERY_FIELDS)
+            )
+        records = []
+        for row in module_rows:
+            module_info = _record_from_row(
+                row, MODULE_FIELDS, deliveries=deliveries.get(row["stem"], [])
+            )
+            records.append((row["stem"], module_info))
+        return records
+
+    def records(self) -> list[tuple[str, dict]]:
+        """All modules as (stem, module info), ordered by stem."""
+        return self._records()
+
+    def get(self, stem: str) -> dict | None:
+        records = self._records("WHERE stem = ?", (stem,))
+        return records[0][1] if records else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM modules").fetchone()[0]
@@ -1,58 +1,110 @@
+import multiprocessing
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
 
 import hydra
 import jinja2
 import omegaconf
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from loguru import logger
 from tqdm import tqdm
 
+from ucl_module_chat.data_processing.catalogue_store import CatalogueStore
 from ucl_module_chat.data_processing.document_templates import module_template
+from ucl_module_chat.utils.file_io import atomic_write_text, content_hash
 from ucl_module_chat.utils.resolve_paths import get_abs_path_using_repo_root
 
+# Bump when a change to the extraction logic should invalidate catalogue records
+EXTRACTOR_VERSION = "1"
 
-def _extract_module_info_from_html(module_html: str) -> dict:
-    """Parse HTML content for a UCL module page and extract key information."""
-
-    soup = BeautifulSoup(module_html, "html.parser")
+# Fields of the extracted module info that are not kept as document metadata;
+# the description is already in the markdown document and is the bulk of the page
+METADATA_EXCLUDED_FIELDS = {"description"}
 
-    # Extract the module title and code from the og:title meta tag
-    pattern = r"""
+# Patterns are compiled once at import rather than on every call
+OG_TITLE_PATTERN = re.compile(
+    r"""
     (?P<module_title>.*?)                # Capture the module title
     \s*                                  # Optional whitespace
     \((?P<module_code>[A-Z]{4}\d{4})\)   # Capture the alphanumeric code
-    """
-    og_title = soup.find("meta", attrs={"name": "og:title"})["content"]
-    match = re.search(pattern, og_title, re.VERBOSE)
+    """,
+    re.VERBOSE,
+)
+
+# Might need to modify this regex pattern if some modules are different
+DELIVERY_HEADER_PATTERN = re.compile(
+    r"""
+    Intended\steaching\sterm:               # Matches 'Intended teaching term:'
+    \s*                                     # Optional whitespace
+    (?P<term>[\w\s,\(\)]+)                  # Capture the term
+    \s*                                     # Optional whitespace
+    (?P<type>Undergraduate|Postgraduate)    # Matches UG or PG
+    \s*                                     # Optional whitespace
+    \(FHEQ\sLevel\s(?P<fheq_level>\d+)\)    # Matches 'FHEQ Level X'
+    """,  # and captures level number
+    re.VERBOSE,
+)
+
+MAILTO_PATTERN = re.compile(r"^mailto:")
+
+# Only these top-level elements are kept when parsing with `targeted_parse`;
+# scripts, styles, navigation and other page furniture are skipped
+MODULE_PAGE_STRAINER = SoupStrainer(["meta", "div", "dl", "h2", "p"])
+
+
+def _resolve_parser(parser: str) -> str:
+    """Return the requested BeautifulSoup parser, falling back if not installed."""
+    if parser == "lxml":
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            logger.warning("lxml is not installed, falling back to html.parser")
+            return "html.parser"
+    return parser
+
+
+def _extract_module_info_from_html(
+    module_html: str, parser: str = "html.parser", targeted_parse: bool = False
+) -> dict:
+    """Parse HTML content for a UCL module page and extract key information."""
+
+    parse_only = MODULE_PAGE_STRAINER if targeted_parse else None
+    soup = BeautifulSoup(module_html, parser, parse_only=parse_only)
+
+    # Collect all meta tags in a single pass rather than searching for each
+    meta_by_name = {}
+    meta_by_property = {}
+    for meta in soup.find_all("meta"):
+        if meta.has_attr("name"):
+            meta_by_name.setdefault(meta["name"], meta.get("content"))
+        if meta.has_attr("property"):
+            meta_by_property.setdefault(meta["property"], meta.get("content"))
+
+    # Extract the module title and code from the og:title meta tag
+    og_title = meta_by_name["og:title"]
+    match = OG_TITLE_PATTERN.search(og_title)
     module_title = match.group("module_title").strip()
     module_code = match.group("module_code").strip()
 
-    url = soup.find("meta", attrs={"property": "og:url"})["content"]
+    url = meta_by_property["og:url"]
 
-    faculty = soup.find("meta", attrs={"name": "ucl:sanitized_faculty"})["content"]
+    faculty = meta_by_name["ucl:sanitized_faculty"]
 
-    teaching_department = soup.find(
-        "meta", attrs={"name": "ucl:sanitized_teaching_department"}
-    )["content"]
+    teaching_department = meta_by_name["ucl:sanitized_teaching_department"]
 
-    level = soup.find("meta", attrs={"name": "ucl:sanitized_level"})["content"]
+    level = meta_by_name["ucl:sanitized_level"]
 
-    teaching_term = soup.find(
-        "meta", attrs={"name": "ucl:sanitized_intended_teaching_term"}
-    )["content"]
+    teaching_term = meta_by_name["ucl:sanitized_intended_teaching_term"]
 
-    credit_value = soup.find("meta", attrs={"name": "ucl:sanitized_credit_value"})[
-        "content"
-    ]
+    credit_value = meta_by_name["ucl:sanitized_credit_value"]
 
-    sanitized_subject = soup.find("meta", attrs={"name": "ucl:sanitized_subject"})[
-        "content"
-    ]
+    sanitized_subject = meta_by_name["ucl:sanitized_subject"]
 
-    sanitized_keywords = soup.find("meta", attrs={"name": "ucl:sanitized_keywords"})[
-        "content"
-    ]
+    sanitized_keywords = meta_by_name["ucl:sanitized_keywords"]
 
     restrictions = (
         soup.find("dt", string="Restrictions")
@@ -84,19 +136,9 @@ def _extract_module_info_from_html(module_html: str) -> dict:
 
         # Info from the header
         header = d.find("h2").get_text()
-        # Might need to modify this regex pattern if some modules are different
-        pattern = r"""
-            Intended\steaching\sterm:               # Matches 'Intended teaching term:'
-            \s*                                     # Optional whitespace
-            (?P<term>[\w\s,\(\)]+)                  # Capture the term
-            \s*                                     # Optional whitespace
-            (?P<type>Undergraduate|Postgraduate)    # Matches UG or PG
-            \s*                                     # Optional whitespace
-            \(FHEQ\sLevel\s(?P<fheq_level>\d+)\)    # Matches 'FHEQ Level X' 
-            """  # and captures level number
 
         # Search for matches in the header string
-        match = re.search(pattern, header, re.VERBOSE)
+        match = DELIVERY_HEADER_PATTERN.search(header)
 
         if match:
             # Extracted values from the regex groups
@@ -126,7 +168,7 @@ def _extract_module_info_from_html(module_html: str) -> dict:
 
         col_2 = d.find("section", class_="middle-split__column2")
 
-        email = col_2.find("a", href=re.compile(r"^mailto:"))
+        email = col_2.find("a", href=MAILTO_PATTERN)
         delivery_info["contact_email"] = email.text.strip() if email else None
 
         delivery_info["number_of_students_prior_year"] = (
@@ -157,6 +199,19 @@ def _extract_module_info_from_html(module_html: str) -> dict:
     return info
 
 
+def _configure_extract_function(
+    extract_function: callable, parser: str, targeted_parse: bool
+) -> callable:
+    """Apply the parser options if using the default extract function."""
+    if extract_function is _extract_module_info_from_html:
+        return partial(
+            _extract_module_info_from_html,
+            parser=_resolve_parser(parser),
+            targeted_parse=targeted_parse,
+        )
+    return extract_function
+
+
 def _module_info_to_markdown(module_info: dict, template: jinja2.Template) -> str:
     """Process module information dictionary into markdown document using template."""
     return template.render(module_info)
@@ -171,46 +226,277 @@ def _convert_module_html_to_markdown(
     return module_markdown
 
 
+def _module_metadata(module_info: dict) -> dict:
+    """Select the module information to be stored as document metadata."""
+    return {
+        key: value
+        for key, value in module_info.items()
+        if key not in METADATA_EXCLUDED_FIELDS
+    }
+
+
+def _extract_module_html_file(
+    module_html_path: Path, extract_function: callable
+) -> dict:
+    """Extract the module information from a single HTML module file."""
+    with open(module_html_path, "r") as f:
+        module_html = f.read()
+    return extract_function(module_html)
+
+
+def _extract_files(
+    module_html_paths: list[Path], extract_function: callable
+) -> tuple[list[tuple[str, dict]], list[tuple[str, str]]]:
+    """Extract module information from HTML module files, returning (file stem,
+    module info) for each file and (file stem, error) for any failures."""
+    results = []
+    errors = []
+    for module_html_path in module_html_paths:
+        try:
+            module_info = _extract_module_html_file(module_html_path, extract_function)
+            results.append((module_html_path.stem, module_info))
+        except Exception as e:
+            errors.append((module_html_path.stem, str(e)))
+    return results, errors
+
+
+# Extract function for worker processes, set once per worker by the initializer
+_worker_settings = {}
+
+
+def _init_worker(extract_function: callable) -> None:
+    _worker_settings.update(extract_function=extract_function)
+
+
+def _extract_files_in_worker(
+    module_html_paths: list[Path],
+) -> tuple[list[tuple[str, dict]], list[tuple[str, str]]]:
+    return _extract_files(module_html_paths, **_worker_settings)
+
+
+def _extract_file_in_worker(module_html_path: Path) -> dict:
+    return _extract_module_html_file(module_html_path, **_worker_settings)
+
+
+def extraction_process_pool(
+    extract_function: callable, n_workers: int
+) -> ProcessPoolExecutor:
+    """Process pool whose workers are set up to extract module information.
+
+    Workers are forked where possible so that the extract function, which is set
+    once per worker, does not need to be pickled.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = None
+    return ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(extract_function,),
+    )
+
+
+def _extract_files_in_parallel(
+    module_html_paths: list[Path],
+    extract_function: callable,
+    n_workers: int,
+    chunksize: int,
+    on_results: callable,
+) -> list[tuple[str, str]]:
+    """Extract module information from HTML module files in a process pool, in
+    chunks of `chunksize` files, passing the results of each chunk to
+    `on_results` as it completes."""
+    chunks = [
+        module_html_paths[i : i + chunksize]
+        for i in range(0, len(module_html_paths), chunksize)
+    ]
+    errors = []
+    with extraction_process_pool(extract_function, n_workers) as executor:
+        futures = {
+            executor.submit(_extract_files_in_worker, chunk): len(chunk)
+            for chunk in chunks
+        }
+        with tqdm(total=len(module_html_paths)) as progress:
+            for future in as_completed(futures):
+                results, chunk_errors = future.result()
+                on_results(results)
+                errors.extend(chunk_errors)
+                progress.update(futures[future])
+    return errors
+
+
+@dataclass
+class ConversionStats:
+    """Summary of a conversion run, listing module IDs (file stems) by outcome."""
+
+    converted: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    errors: list[tuple[str, str]] = field(default_factory=list)
+
+
+def _extractor_version(
+    extract_function: callable, parser: str, targeted_parse: bool
+) -> str:
+    """Hash identifying the extractor used to produce a catalogue record, and the
+    parser options, which can change the extracted text."""
+    extractor_name = getattr(extract_function, "__qualname__", repr(extract_function))
+    return content_hash(
+        f"{EXTRACTOR_VERSION}:{extractor_name}:{parser}:{targeted_parse}"
+    )
+
+
+def _remove_orphaned_modules(
+    store: CatalogueStore, markdown_dir: Path | None, html_stems: set[str]
+) -> list[str]:
+    """Delete modules, and any markdown documents, whose source HTML file no
+    longer exists."""
+    removed = [stem for stem in store.versions() if stem not in html_stems]
+    store.delete(removed)
+    if markdown_dir is not None:
+        for module_md_path in markdown_dir.glob("*.md"):
+            if module_md_path.stem not in html_stems:
+                module_md_path.unlink()
+    return removed
+
+
+def render_markdown_documents(
+    store: CatalogueStore,
+    markdown_dir: str | Path,
+    markdown_template: jinja2.Template = module_template,
+) -> int:
+    """Render a markdown document for each module in the catalogue to
+    `markdown_dir`, returning the number of documents written.
+
+    Documents whose content is unchanged are not rewritten, and documents for
+    modules no longer in the catalogue are removed.
+    """
+    markdown_dir = Path(markdown_dir)
+    markdown_dir.mkdir(parents=True, exist_ok=True)
+    stems = set()
+    n_written = 0
+    for stem, module_info in store.records():
+        stems.add(stem)
+        module_md_path = markdown_dir / f"{stem}.md"
+        module_markdown = _module_info_to_markdown(module_info, markdown_template)
+        if (
+            not module_md_path.exists()
+            or module_md_path.read_text(encoding="utf-8") != module_markdown
+        ):
+            atomic_write_text(module_md_path, module_markdown)
+            n_written += 1
+    for module_md_path in markdown_dir.glob("*.md"):
+        if module_md_path.stem not in stems:
+            module_md_path.unlink()
+    return n_written
+
+
 def convert_all_documents_html_to_markdown(
     input_dir: str | Path,
-    output_dir: str | Path,
+    catalogue_path: str | Path,
+    markdown_dir: str | Path | None = None,
     extract_function: callable = _extract_module_info_from_html,
     markdown_template: jinja2.Template = module_template,
-):
-    """Convert all UCL module HTML pages in a directory to markdown documents."""
+    parser: str = "html.parser",
+    targeted_parse: bool = False,
+    n_workers: int = 1,
+    chunksize: int = 32,
+    use_cache: bool = True,
+) -> ConversionStats:
+    """Extract the module information from all UCL module HTML pages in a
+    directory into the catalogue store at `catalogue_path`, and render the
+    markdown documents to `markdown_dir`, if given.
+
+    With `n_workers` greater than one, files are parsed in a process pool. The
+    `parser` and `targeted_parse` options are passed to the default extract
+    function; "lxml" is considerably faster than "html.parser" if installed.
+
+    With `use_cache`, files whose HTML content hash and extractor version match
+    the record in the catalogue are skipped without being parsed. Modules whose
+    HTML page has been deleted are removed from the catalogue. Markdown documents
+    are rendered from the catalogue when the documents are embedded, so changing
+    `markdown_template` does not require the pages to be parsed again. The same
+    documents are written to `markdown_dir` (`data/module_md` in the setup
+    config) for inspection and for embedding from a directory.
+    """
 
     input_dir = Path(input_dir)
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
+    markdown_dir = Path(markdown_dir) if markdown_dir is not None else None
+    parser = _resolve_parser(parser)
+    version = _extractor_version(extract_function, parser, targeted_parse)
+    extract_function = _configure_extract_function(
+        extract_function, parser, targeted_parse
+    )
 
-    logger.info("""Converting HTML module files to markdown documents""")
+    logger.info("""Extracting module information from HTML module files""")
 
     all_module_html_files = list(input_dir.glob("*.html"))
 
     n_modules = len(all_module_html_files)
 
-    logger.info(
-        f"Identified {n_modules} HTML module files to convert to markdown documents"
-    )
+    logger.info(f"Identified {n_modules} HTML module files")
 
-    errors = 0
-    for module_html_path in tqdm(all_module_html_files):
-        try:
-            with open(module_html_path, "r") as f:
-                module_html = f.read()
+    stats = ConversionStats()
+    with CatalogueStore(catalogue_path) as store:
+        stats.removed = _remove_orphaned_modules(
+            store, markdown_dir, {path.stem for path in all_module_html_files}
+        )
+        cached = store.versions() if use_cache else {}
+
+        files_to_convert = []
+        html_hashes = {}
+        for module_html_path in all_module_html_files:
+            stem = module_html_path.stem
+            html_hashes[stem] = content_hash(module_html_path.read_bytes())
+            if cached.get(stem) == (html_hashes[stem], version):
+                stats.skipped.append(stem)
+            else:
+                files_to_convert.append(module_html_path)
+
+        logger.info(
+            f"{len(files_to_convert)} HTML module files to extract, "
+            f"{len(stats.skipped)} unchanged"
+        )
 
-            module_markdown = _convert_module_html_to_markdown(
-                module_html, extract_function, markdown_template
+        def store_results(results: list[tuple[str, dict]]) -> None:
+            store.put_many(
+                (stem, module_info, html_hashes[stem], version)
+                for stem, module_info in results
             )
+            stats.converted.extend(stem for stem, _ in results)
 
-            output_path = output_dir / f"{module_html_path.stem}.md"
-            with open(output_path, "w") as f:
-                f.write(module_markdown)
-        except Exception as e:
-            errors += 1
-            logger.error(f"Error converting {module_html_path.stem}: {e}")
-    logger.info(f"{n_modules - errors} HTML files successfully converted to markdown")
-    logger.info(f"{errors} HTML files could not be converted.")
+        start = time.perf_counter()
+        if n_workers > 1:
+            stats.errors = _extract_files_in_parallel(
+                files_to_convert, extract_function, n_workers, chunksize, store_results
+            )
+        else:
+            results, stats.errors = _extract_files(
+                tqdm(files_to_convert), extract_function
+            )
+            store_results(results)
+        elapsed_seconds = time.perf_counter() - start
+
+        # Failed pages are not kept at an older version
+        store.delete(stem for stem, _ in stats.errors)
+
+        if markdown_dir is not None:
+            n_written = render_markdown_documents(
+                store, markdown_dir, markdown_template
+            )
+            logger.info(f"{n_written} markdown documents written to {markdown_dir}")
+
+    for stem, error in stats.errors:
+        logger.error(f"Error converting {stem}: {error}")
+    logger.info(f"{len(stats.converted)} HTML files successfully extracted")
+    logger.info(f"{len(stats.errors)} HTML files could not be extracted.")
+    logger.info(f"{len(stats.removed)} orphaned modules removed.")
+    if files_to_convert and elapsed_seconds > 0:
+        files_per_second = len(files_to_convert) / elapsed_seconds
+        logger.info(f"Conversion throughput: {files_per_second:.1f} files/sec")
+    return stats
 
 
 @hydra.main(version_base=None, config_path="../conf", config_name="config")
@@ -218,7 +504,9 @@ def main(cfg: omegaconf.DictConfig) -> None:
     """Run the document conversion process."""
     cfg = cfg.setup.convert_documents
     cfg.input_dir = get_abs_path_using_repo_root(cfg.input_dir)
-    cfg.output_dir = get_abs_path_using_repo_root(cfg.output_dir)
+    cfg.catalogue_path = get_abs_path_using_repo_root(cfg.catalogue_path)
+    if cfg.markdown_dir is not None:
+        cfg.markdown_dir = get_abs_path_using_repo_root(cfg.markdown_dir)
 
     convert_all_documents_html_to_markdown(**cfg)
 
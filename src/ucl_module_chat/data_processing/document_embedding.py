@@ -1,47 +1,293 @@
+import json
+import re
 from pathlib import Path
 
 import hydra
+import jinja2
+import numpy as np
 import omegaconf
 from dotenv import load_dotenv
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from langchain_core.embeddings.embeddings import Embeddings
 from loguru import logger
 
+from ucl_module_chat.data_processing.batch_embedding import BatchedEmbeddings
+from ucl_module_chat.data_processing.catalogue_store import CatalogueStore
+from ucl_module_chat.data_processing.document_conversion import (
+    _module_info_to_markdown,
+    _module_metadata,
+)
+from ucl_module_chat.data_processing.document_templates import module_template
+from ucl_module_chat.retrieval.bm25 import save_bm25_index
+from ucl_module_chat.retrieval.chunking import split_module_document
+from ucl_module_chat.retrieval.docstore import (
+    FAISS_INDEX_FILENAME,
+    load_vectorstore,
+    write_vectorstore,
+)
+from ucl_module_chat.retrieval.faiss_index import (
+    create_faiss_index,
+    faiss_index_type,
+    supports_removal,
+)
+from ucl_module_chat.retrieval.metadata import save_metadata_index
+from ucl_module_chat.retrieval.module_codes import (
+    module_code_from_markdown,
+    save_module_code_index,
+)
+from ucl_module_chat.utils.file_io import content_hash, read_json
+from ucl_module_chat.utils.http_clients import http_client_kwargs
 from ucl_module_chat.utils.resolve_paths import get_abs_path_using_repo_root
 
 load_dotenv()
 
+# Module codes appear at the end of the file stems, e.g. supervised-learning-COMP0078
+MODULE_CODE_PATTERN = re.compile(r"[A-Z]{4}\d{4}$")
 
-def embed_documents(input_dir: str | Path, embedding_model: Embeddings) -> FAISS:
-    """Create a FAISS vectorstore from a directory of markdown documents."""
-    input_dir = Path(input_dir)
 
-    all_module_document_paths = list(input_dir.glob("*.md"))
+def _module_document(module_md: str, module_info: dict, stem: str) -> Document:
+    """Build a module document with a stable ID derived from the module code.
 
+    The module information, other than the description, is attached as document
+    metadata, along with a hash of the content.
+    """
+    # Prefer the code extracted from the page, which is rendered in the title
+    module_code = module_code_from_markdown(module_md)
+    if module_code is None:
+        match = MODULE_CODE_PATTERN.search(stem)
+        module_code = match.group(0) if match else None
+
+    # Include the metadata in the hash so a change to it updates the document
+    if module_info:
+        doc_hash = content_hash(module_md + json.dumps(module_info, sort_keys=True))
+    else:
+        doc_hash = content_hash(module_md)
+    metadata = {
+        **module_info,
+        "module_code": module_code,
+        "source": stem,
+        "content_hash": doc_hash,
+    }
+    return Document(page_content=module_md, metadata=metadata, id=module_code or stem)
+
+
+def _ensure_unique_id(doc: Document, seen_ids: set[str]) -> None:
+    """Fall back to the file stem as the ID of a document whose ID is taken."""
+    if doc.id in seen_ids:
+        logger.warning(f"Duplicate module code {doc.id}, using file stem as ID")
+        doc.id = doc.metadata["source"]
+    seen_ids.add(doc.id)
+
+
+def _load_catalogue_documents(
+    catalogue_path: str | Path, markdown_template: jinja2.Template = module_template
+) -> list[Document]:
+    """Render a markdown document for each module in the catalogue store."""
     module_docs = []
+    seen_ids = set()
+    with CatalogueStore(catalogue_path) as store:
+        for stem, module_info in store.records():
+            module_md = _module_info_to_markdown(module_info, markdown_template)
+            doc = _module_document(module_md, _module_metadata(module_info), stem)
+            _ensure_unique_id(doc, seen_ids)
+            module_docs.append(doc)
+    return module_docs
+
 
-    for module_md_path in all_module_document_paths:
+def _load_module_documents(input_dir: Path) -> list[Document]:
+    """Load the markdown documents in a directory, with the module information in
+    any JSON file of the same name as metadata."""
+    module_docs = []
+    seen_ids = set()
+    for module_md_path in sorted(input_dir.glob("*.md")):
         with open(module_md_path, "r") as f:
             module_md = f.read()
-        module_docs.append(module_md)
+        module_info = read_json(module_md_path.with_suffix(".json"), default={})
+        doc = _module_document(module_md, module_info, module_md_path.stem)
+        _ensure_unique_id(doc, seen_ids)
+        module_docs.append(doc)
+    return module_docs
+
+
+def _cache_backed_embeddings(
+    embedder: Embeddings, embedding_model: Embeddings, cache_dir: str | Path
+) -> CacheBackedEmbeddings:
+    """Wrap an embedder in a persistent cache keyed by content hash.
+
+    The cache is namespaced by the underlying model so that changing model does
+    not return stale embeddings.
+    """
+    namespace = getattr(embedding_model, "model", type(embedding_model).__name__)
+    return CacheBackedEmbeddings.from_bytes_store(
+        embedder, LocalFileStore(cache_dir), namespace=str(namespace)
+    )
+
+
+def _stale_document_ids(vectorstore: FAISS, module_docs: list[Document]) -> list[str]:
+    """IDs in the vectorstore that have been removed or whose content changed."""
+    current_hashes = {doc.id: doc.metadata["content_hash"] for doc in module_docs}
+    stale_ids = []
+    for doc_id in vectorstore.index_to_docstore_id.values():
+        existing_doc = vectorstore.docstore.search(doc_id)
+        existing_hash = existing_doc.metadata.get("content_hash")
+        if current_hashes.get(doc_id) != existing_hash:
+            stale_ids.append(doc_id)
+    return stale_ids
+
+
+def _empty_vectorstore(
+    embedding_model: Embeddings, embeddings: list[list[float]], index_config: dict
+) -> FAISS:
+    """Create an empty vectorstore with an index trained on `embeddings`, if the
+    index type needs training."""
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    return FAISS(
+        embedding_function=embedding_model,
+        index=create_faiss_index(vectors, **index_config),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
 
-    logger.info(f"Embedding {len(module_docs)} documents")
-    vectorstore = FAISS.from_texts(module_docs, embedding=embedding_model)
+
+def embed_documents(
+    input_dir: str | Path | None,
+    embedding_model: Embeddings,
+    output_dir: str | Path | None = None,
+    update: bool = False,
+    cache_dir: str | Path | None = None,
+    batch_size: int = 256,
+    max_concurrent_batches: int = 4,
+    requests_per_second: float | None = None,
+    checkpoint_dir: str | Path | None = None,
+    chunk_sections: bool = False,
+    index_config: dict | None = None,
+    catalogue_path: str | Path | None = None,
+) -> FAISS:
+    """Create a FAISS vectorstore from the modules in the catalogue store at
+    `catalogue_path`, rendered as markdown documents, or, if not given, from a
+    directory of markdown documents.
+
+    With `update`, the existing vectorstore in `output_dir` is loaded, vectors for
+    removed or changed documents are deleted by ID, and only new or changed
+    documents are embedded. With `cache_dir`, embeddings are also looked up in and
+    saved to a persistent cache keyed by the hash of the document content.
+
+    Documents are embedded in concurrent, rate-limited batches, and completed
+    batches are checkpointed to `checkpoint_dir` so that a failed run can be
+    resumed (see `BatchedEmbeddings`).
+
+    With `chunk_sections`, each module document is split into one chunk per
+    section, each of which is embedded separately and keeps the metadata of its
+    module (see `split_module_document`).
+
+    `index_config` selects the FAISS index type and its build parameters (see
+    `create_faiss_index`); the default is an exact flat index. In update mode, the
+    vectorstore is rebuilt from scratch if the configured index type has changed
+    or if stale vectors cannot be removed from the index (any type but flat).
+    """
+    if catalogue_path is not None:
+        module_docs = _load_catalogue_documents(catalogue_path)
+    else:
+        module_docs = _load_module_documents(Path(input_dir))
+    if chunk_sections:
+        module_docs = [
+            chunk for doc in module_docs for chunk in split_module_document(doc)
+        ]
+        logger.info(f"Split documents into {len(module_docs)} section chunks")
+
+    index_config = dict(index_config or {})
+    index_type = index_config.get("index_type", "flat")
+
+    vectorstore = None
+    docs_to_embed = module_docs
+    if (
+        update
+        and output_dir is not None
+        and (Path(output_dir) / FAISS_INDEX_FILENAME).exists()
+    ):
+        vectorstore = load_vectorstore(output_dir, embedding_model, in_memory=True)
+        stale_ids = _stale_document_ids(vectorstore, module_docs)
+        if faiss_index_type(vectorstore.index) != index_type:
+            logger.info(f"Index type changed to {index_type}, rebuilding vectorstore")
+            vectorstore = None
+        elif stale_ids and not supports_removal(vectorstore.index):
+            logger.info("Index does not support removing vectors, rebuilding")
+            vectorstore = None
+        else:
+            if stale_ids:
+                vectorstore.delete(stale_ids)
+            indexed_ids = set(vectorstore.index_to_docstore_id.values())
+            docs_to_embed = [doc for doc in module_docs if doc.id not in indexed_ids]
+            logger.info(
+                f"Loaded vectorstore from {output_dir}, removed {len(stale_ids)} "
+                "stale vectors"
+            )
+    elif update:
+        logger.warning(f"No vectorstore found in {output_dir}, building from scratch")
+
+    embedder = BatchedEmbeddings(
+        embedding_model,
+        batch_size=batch_size,
+        max_concurrent_batches=max_concurrent_batches,
+        requests_per_second=requests_per_second,
+        checkpoint_dir=checkpoint_dir,
+    )
+    n_cached = 0
+    if cache_dir is not None:
+        embedder = _cache_backed_embeddings(embedder, embedding_model, cache_dir)
+        cached = embedder.document_embedding_store.mget(
+            [doc.page_content for doc in docs_to_embed]
+        )
+        n_cached = sum(vector is not None for vector in cached)
+
+    logger.info(f"Embedding {len(docs_to_embed)} of {len(module_docs)} documents")
+    texts = [doc.page_content for doc in docs_to_embed]
+    embeddings = embedder.embed_documents(texts)
+    metadatas = [doc.metadata for doc in docs_to_embed]
+    ids = [doc.id for doc in docs_to_embed]
+    if vectorstore is None:
+        vectorstore = _empty_vectorstore(embedding_model, embeddings, index_config)
+    if docs_to_embed:
+        vectorstore.add_embeddings(zip(texts, embeddings), metadatas=metadatas, ids=ids)
+
+    n_reused = len(module_docs) - len(docs_to_embed) + n_cached
+    logger.info(
+        f"{n_reused} embeddings reused and {len(docs_to_embed) - n_cached} computed"
+    )
     logger.info(f"Vectorstore created with {vectorstore.index.ntotal} vectors")
     return vectorstore
 
 
+def save_vectorstore(vectorstore: FAISS, output_dir: str | Path) -> None:
+    """Save the vectorstore along with its module code, metadata and BM25
+    indexes."""
+    write_vectorstore(vectorstore, output_dir)
+    save_module_code_index(vectorstore, output_dir)
+    save_metadata_index(vectorstore, output_dir)
+    save_bm25_index(vectorstore, output_dir)
+    logger.info(f"Vectorstore saved to {output_dir}")
+
+
 @hydra.main(version_base=None, config_path="../conf", config_name="config")
 def main(cfg: omegaconf.DictConfig) -> None:
     """Run the document embedding process."""
-    embedding_model = hydra.utils.instantiate(cfg.models.embedding)
-    cfg.setup.embed_documents.input_dir = get_abs_path_using_repo_root(
-        cfg.setup.embed_documents.input_dir
+    embedding_model = hydra.utils.instantiate(
+        cfg.models.embedding, **http_client_kwargs(cfg.http.embedding)
     )
+    for path_key in ["input_dir", "catalogue_path", "cache_dir", "checkpoint_dir"]:
+        if cfg.setup.embed_documents[path_key] is not None:
+            cfg.setup.embed_documents[path_key] = get_abs_path_using_repo_root(
+                cfg.setup.embed_documents[path_key]
+            )
     cfg.vectorstore.dir = get_abs_path_using_repo_root(cfg.vectorstore.dir)
-    vectorstore = embed_documents(cfg.setup.embed_documents.input_dir, embedding_model)
-    vectorstore.save_local(cfg.vectorstore.dir)
-    logger.info(f"Vectorstore saved to {cfg.vectorstore.dir}")
+    vectorstore = embed_documents(
+        embedding_model=embedding_model, **cfg.setup.embed_documents
+    )
+    save_vectorstore(vectorstore, cfg.vectorstore.dir)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,8 @@
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path
 
 import hydra
@@ -7,14 +10,117 @@ import omegaconf
 import requests
 from bs4 import BeautifulSoup
 from loguru import logger
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
+from ucl_module_chat.utils.file_io import (
+    atomic_write_json,
+    atomic_write_text,
+    content_hash,
+    read_json,
+)
+from ucl_module_chat.utils.rate_limiting import TokenBucket
 from ucl_module_chat.utils.resolve_paths import get_abs_path_using_repo_root
 
+# Responses with these status codes are retried with exponential backoff
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
-def _get_index_page_html(index_page_url: str):
+# Files written to the output directory alongside the HTML pages
+MANIFEST_FILENAME = "manifest.json"
+SUMMARY_FILENAME = "scrape_summary.json"
+
+
+class ModulePageFetcher:
+    """Fetch pages over a pooled keep-alive session with rate limiting and retries.
+
+    A single fetcher is shared by all worker threads so that connections are reused
+    and `requests_per_second` is enforced globally rather than per thread.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = 2.0,
+        max_in_flight: int = 4,
+        max_retries: int = 3,
+        backoff_seconds: float = 2.0,
+        timeout_seconds: float = 30.0,
+    ):
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff_delay(self, attempt: int, response: requests.Response | None) -> float:
+        """Seconds to wait before the next attempt, honouring Retry-After if set."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff_seconds * 2**attempt
+
+    def get(self, url: str, headers: dict | None = None) -> requests.Response:
+        """GET a URL, retrying on connection errors, 429 and 5xx responses."""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(
+                    url, headers=headers, timeout=self.timeout_seconds
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt, None)
+                logger.debug(f"{e} for {url}, retrying in {delay:.1f}s")
+            else:
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt == self.max_retries
+                ):
+                    response.raise_for_status()  # Raise an exception for HTTP errors
+                    return response
+                delay = self._backoff_delay(attempt, response)
+                logger.debug(
+                    f"HTTP {response.status_code} for {url}, retrying in {delay:.1f}s"
+                )
+            time.sleep(delay)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+@dataclass
+class ScrapeStats:
+    """Summary of a scraping run.
+
+    The `new`, `changed`, `unchanged` and `deleted` lists hold module IDs (the
+    HTML file stems) so that downstream stages can reprocess only what changed.
+    """
+
+    n_pages: int
+    n_errors: int
+    elapsed_seconds: float
+    new: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+
+    @property
+    def pages_per_second(self) -> float:
+        n_saved = self.n_pages - self.n_errors
+        return n_saved / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+
+def _get_index_page_html(index_page_url: str, fetcher: ModulePageFetcher = None):
     """Get the HTML content of the index page."""
-    response = requests.get(index_page_url)
+    if fetcher is None:
+        response = requests.get(index_page_url)
+    else:
+        response = fetcher.get(index_page_url)
     index_page_html = response.text
     return index_page_html
 
@@ -34,52 +140,162 @@ def _get_module_urls_from_index_page(index_page_html: str, regex_url_pattern: st
     return module_urls
 
 
-def _save_module_page_html(module_url: str, output_dir: str | Path):
-    """Save the HTML content of a module page to a text file."""
+def _module_id_from_url(module_url: str) -> str:
+    """Extract the part of the URL after "/modules/" for use as the filename."""
+    return module_url.split("/modules/")[1]
+
+
+def _conditional_headers(manifest_entry: dict | None) -> dict:
+    """Build If-None-Match/If-Modified-Since headers from a manifest entry."""
+    headers = {}
+    if manifest_entry is None:
+        return headers
+    if manifest_entry.get("etag"):
+        headers["If-None-Match"] = manifest_entry["etag"]
+    if manifest_entry.get("last_modified"):
+        headers["If-Modified-Since"] = manifest_entry["last_modified"]
+    return headers
+
+
+def _save_module_page_html(
+    module_url: str,
+    output_dir: str | Path,
+    fetcher: ModulePageFetcher = None,
+    manifest_entry: dict | None = None,
+) -> tuple[str, dict]:
+    """Save the HTML content of a module page to a text file.
+
+    If a manifest entry from a previous run is provided, and the saved file still
+    exists, a conditional GET is sent and the file is left untouched if the page
+    has not changed. Returns the page status ("new", "changed" or "unchanged")
+    and the updated manifest entry.
+    """
     output_dir = Path(output_dir)
+    module_id = _module_id_from_url(module_url)
+    file_path = output_dir / f"{module_id}.html"
+    if not file_path.exists():
+        manifest_entry = None
 
     # Send a GET request to fetch the HTML content
-    response = requests.get(module_url)
-    response.raise_for_status()  # Raise an exception for HTTP errors
+    headers = _conditional_headers(manifest_entry)
+    if fetcher is None:
+        response = requests.get(module_url, headers=headers)
+        response.raise_for_status()  # Raise an exception for HTTP errors
+    else:
+        response = fetcher.get(module_url, headers=headers)
 
-    # Extract the part of the URL after "/modules/" for the filename
-    module_id = module_url.split("/modules/")[1]
+    fetched_at = datetime.now(timezone.utc).isoformat()
+    if response.status_code == 304:
+        return "unchanged", {**manifest_entry, "fetched_at": fetched_at}
+
+    page_hash = content_hash(response.text)
+    entry = {
+        "file": file_path.name,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": page_hash,
+        "fetched_at": fetched_at,
+    }
+    if manifest_entry is not None and manifest_entry["content_hash"] == page_hash:
+        return "unchanged", entry
 
     # Save the HTML content to a text file
-    file_path = output_dir / f"{module_id}.html"
-    with open(file_path, "w", encoding="utf-8") as file:
-        file.write(response.text)
+    atomic_write_text(file_path, response.text)
+    return ("new" if manifest_entry is None else "changed"), entry
+
+
+def _remove_deleted_modules(
+    manifest: dict, module_urls: list[str], output_dir: Path
+) -> list[str]:
+    """Delete saved pages for modules no longer listed on the index page."""
+    current_urls = set(module_urls)
+    deleted = []
+    for url in [url for url in manifest if url not in current_urls]:
+        entry = manifest.pop(url)
+        (output_dir / entry["file"]).unlink(missing_ok=True)
+        deleted.append(Path(entry["file"]).stem)
+    return deleted
 
 
 def scrape_documents(
     index_page_url: str | Path,
     output_dir: str | Path,
     regex_url_pattern: str,
-    wait_time_seconds: int = 2,
-):
-    """Scrape module pages and save HTML content to text files."""
+    requests_per_second: float = 2.0,
+    max_in_flight: int = 4,
+    max_retries: int = 3,
+    backoff_seconds: float = 2.0,
+    timeout_seconds: float = 30.0,
+) -> ScrapeStats:
+    """Scrape module pages concurrently and save HTML content to text files.
+
+    Up to `max_in_flight` pages are fetched at once over a shared connection pool,
+    and the total request rate is capped at `requests_per_second` to avoid abusing
+    the server.
+
+    A manifest of ETag, Last-Modified, content hash and fetch time for each URL is
+    kept in the output directory. On later runs, conditional GETs are used so that
+    unchanged pages are not re-downloaded, pages for modules that are no longer
+    listed are deleted, and a summary of new, changed, unchanged and deleted pages
+    is written for downstream stages.
+    """
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_FILENAME
+    manifest = read_json(manifest_path, default={})
+
+    fetcher = ModulePageFetcher(
+        requests_per_second=requests_per_second,
+        max_in_flight=max_in_flight,
+        max_retries=max_retries,
+        backoff_seconds=backoff_seconds,
+        timeout_seconds=timeout_seconds,
+    )
 
     logger.info(f"Identifying module pages from {index_page_url}")
-    index_page_html = _get_index_page_html(index_page_url)
+    index_page_html = _get_index_page_html(index_page_url, fetcher)
 
     module_urls = _get_module_urls_from_index_page(index_page_html, regex_url_pattern)
     n_modules = len(module_urls)
     logger.info(f"Identified {len(module_urls)} module pages to save to {output_dir}.")
 
-    errors = 0
+    stats = ScrapeStats(n_pages=n_modules, n_errors=0, elapsed_seconds=0.0)
+    if n_modules > 0:
+        stats.deleted = _remove_deleted_modules(manifest, module_urls, output_dir)
+    else:
+        logger.warning("No module pages found, skipping detection of removed modules")
 
-    for url in tqdm(module_urls):
-        try:
-            _save_module_page_html(url, output_dir)
-            time.sleep(wait_time_seconds)  # Pause to avoid abusing the server
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error saving HTML for {url}: {e}")
-            errors += 1
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            futures = {
+                executor.submit(
+                    _save_module_page_html, url, output_dir, fetcher, manifest.get(url)
+                ): url
+                for url in module_urls
+            }
+            for future in tqdm(as_completed(futures), total=n_modules):
+                url = futures[future]
+                try:
+                    status, manifest[url] = future.result()
+                    getattr(stats, status).append(_module_id_from_url(url))
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"Error saving HTML for {url}: {e}")
+                    stats.n_errors += 1
+    finally:
+        fetcher.close()
+        atomic_write_json(manifest_path, manifest)
+    stats.elapsed_seconds = time.perf_counter() - start
+    atomic_write_json(output_dir / SUMMARY_FILENAME, asdict(stats))
 
-    logger.info(f"{n_modules - errors} module pages successfully saved")
-    logger.info(f"{errors} module pages could not be saved.")
+    logger.info(f"{n_modules - stats.n_errors} module pages successfully saved")
+    logger.info(f"{stats.n_errors} module pages could not be saved.")
+    logger.info(
+        f"{len(stats.new)} new, {len(stats.changed)} changed, "
+        f"{len(stats.unchanged)} unchanged and {len(stats.deleted)} deleted pages"
+    )
+    logger.info(f"Scraping throughput: {stats.pages_per_second:.2f} pages/sec")
+    return stats
 
 
 @hydra.main(version_base=None, config_path="../conf", config_name="config")
@@ -1,7 +1,6 @@
 from jinja2 import Template
 
-module_template = Template(
-    """
+module_template_source = """
 # {{ module_title }} ({{module_code}})
 
 ## Key information
@@ -37,4 +36,5 @@ module_template = Template(
 **Who to contact for more information:** {{ delivery.contact_email }}
 {% endfor %}
 """
-)
+
+module_template = Template(module_template_source)
@@ -0,0 +1,581 @@
+import queue
+import threading
+import time
+from collections.abc import Callable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import requests
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings.embeddings import Embeddings
+from loguru import logger
+
+from ucl_module_chat.data_processing.batch_embedding import BatchedEmbeddings
+from ucl_module_chat.data_processing.catalogue_store import CatalogueStore
+from ucl_module_chat.data_processing.document_conversion import (
+    ConversionStats,
+    _configure_extract_function,
+    _extract_file_in_worker,
+    _extract_module_html_file,
+    _extract_module_info_from_html,
+    _extractor_version,
+    _module_info_to_markdown,
+    _module_metadata,
+    _remove_orphaned_modules,
+    _resolve_parser,
+    extraction_process_pool,
+)
+from ucl_module_chat.data_processing.document_embedding import (
+    _cache_backed_embeddings,
+    _empty_vectorstore,
+    _ensure_unique_id,
+    _module_document,
+)
+from ucl_module_chat.data_processing.document_scraping import (
+    MANIFEST_FILENAME,
+    SUMMARY_FILENAME,
+    ModulePageFetcher,
+    ScrapeStats,
+    _get_index_page_html,
+    _get_module_urls_from_index_page,
+    _module_id_from_url,
+    _remove_deleted_modules,
+    _save_module_page_html,
+)
+from ucl_module_chat.data_processing.document_templates import module_template
+from ucl_module_chat.retrieval.chunking import split_module_document
+from ucl_module_chat.utils.file_io import (
+    atomic_write_json,
+    atomic_write_text,
+    content_hash,
+    read_json,
+)
+
+# Put on a queue once for each consumer when its producers have finished
+_DONE = object()
+
+# How often workers waiting on a queue check whether the pipeline has stopped
+_STOP_POLL_SECONDS = 0.1
+
+
+@dataclass
+class StageStats:
+    """Items processed by one stage of the pipeline.
+
+    `busy_seconds` is the time the stage's workers spent working, summed over
+    workers, and `blocked_seconds` the time they spent waiting for space in the
+    queue to the next stage, i.e. held back by a slower stage downstream.
+    """
+
+    n_workers: int
+    n_items: int = 0
+    n_errors: int = 0
+    busy_seconds: float = 0.0
+    blocked_seconds: float = 0.0
+
+
+@dataclass
+class PipelineStats:
+    """Summary of a pipelined run, with the scraping and conversion outcomes in
+    the same form as when the stages are run one after the other."""
+
+    scrape: ScrapeStats
+    conversion: ConversionStats
+    stages: dict[str, StageStats]
+    n_cached_embeddings: int = 0
+    n_vectors: int = 0
+    elapsed_seconds: float = 0.0
+
+
+class _StreamingPipeline:
+    """State shared by the worker threads of `run_pipeline`."""
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        scrape_config: Mapping,
+        convert_config: Mapping,
+        embed_config: Mapping,
+        queue_size: int,
+        extract_function: Callable,
+        markdown_template,
+    ):
+        self.embedding_model = embedding_model
+        self.scrape_config = scrape_config
+        self.embed_config = embed_config
+
+        self.html_dir = Path(scrape_config["output_dir"])
+        self.html_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest = read_json(self.html_dir / MANIFEST_FILENAME, default={})
+
+        self.store = CatalogueStore(convert_config["catalogue_path"])
+        self.cached_versions = (
+            self.store.versions() if convert_config.get("use_cache", True) else {}
+        )
+        self.markdown_dir = None
+        if convert_config.get("markdown_dir") is not None:
+            self.markdown_dir = Path(convert_config["markdown_dir"])
+            self.markdown_dir.mkdir(parents=True, exist_ok=True)
+        parser = _resolve_parser(convert_config.get("parser", "html.parser"))
+        targeted_parse = convert_config.get("targeted_parse", False)
+        self.version = _extractor_version(extract_function, parser, targeted_parse)
+        self.extract_function = _configure_extract_function(
+            extract_function, parser, targeted_parse
+        )
+        self.markdown_template = markdown_template
+
+        # Pages waiting to be fetched are all known up front, so are not bounded
+        self.url_queue = queue.Queue()
+        self.html_queue = queue.Queue(maxsize=queue_size)
+        self.doc_queue = queue.Queue(maxsize=queue_size)
+
+        self.stats = PipelineStats(
+            scrape=ScrapeStats(n_pages=0, n_errors=0, elapsed_seconds=0.0),
+            conversion=ConversionStats(),
+            stages={
+                "fetch": StageStats(scrape_config.get("max_in_flight", 4)),
+                "convert": StageStats(convert_config.get("n_workers", 1)),
+                "embed": StageStats(embed_config.get("max_concurrent_batches", 4)),
+            },
+        )
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.fetcher = None
+        self.process_pool = None
+
+    def _record(
+        self, stage: str, start: float, n_items: int = 1, error: bool = False
+    ) -> None:
+        with self.lock:
+            stage_stats = self.stats.stages[stage]
+            stage_stats.busy_seconds += time.perf_counter() - start
+            if error:
+                stage_stats.n_errors += 1
+            else:
+                stage_stats.n_items += n_items
+
+    def _offer(self, output_queue: queue.Queue, item) -> None:
+        """Put an item on a queue, blocking while it is full, unless the pipeline
+        is stopped."""
+        while not self.stopping.is_set():
+            try:
+                output_queue.put(item, timeout=_STOP_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, input_queue: queue.Queue):
+        """Take an item from a queue, blocking while it is empty, or `_DONE` once
+        the pipeline is stopped."""
+        while not self.stopping.is_set():
+            try:
+                return input_queue.get(timeout=_STOP_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _put(self, stage: str, output_queue: queue.Queue, item) -> None:
+        """Put an item on the next stage's queue, blocking while it is full."""
+        start = time.perf_counter()
+        self._offer(output_queue, item)
+        with self.lock:
+            self.stats.stages[stage].blocked_seconds += time.perf_counter() - start
+
+    def stop(self, threads: list[threading.Thread]) -> None:
+        """Stop the workers after a failure, e.g. in the embedding stage: they
+        finish the item in hand and stop waiting on the queues, which are drained,
+        and the threads are joined."""
+        self.stopping.set()
+        for pending in [self.url_queue, self.html_queue, self.doc_queue]:
+            while True:
+                try:
+                    pending.get_nowait()
+                except queue.Empty:
+                    break
+        for thread in threads:
+            thread.join()
+
+    def start_workers(
+        self,
+        target: Callable[[], None],
+        n_workers: int,
+        output_queue: queue.Queue,
+        n_consumers: int,
+    ) -> list[threading.Thread]:
+        """Start worker threads, the last of which to finish signals the end of
+        the items to each consumer of `output_queue`."""
+        remaining = [n_workers]
+
+        def run() -> None:
+            try:
+                target()
+            finally:
+                with self.lock:
+                    remaining[0] -= 1
+                    is_last = remaining[0] == 0
+                if is_last:
+                    for _ in range(n_consumers):
+                        self._offer(output_queue, _DONE)
+
+        threads = [
+            threading.Thread(target=run, name=f"{target.__name__}-{i}", daemon=True)
+            for i in range(n_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def fetch_worker(self) -> None:
+        """Save module pages and pass them on for conversion."""
+        while (url := self._get(self.url_queue)) is not _DONE:
+            start = time.perf_counter()
+            module_id = _module_id_from_url(url)
+            try:
+                status, entry = _save_module_page_html(
+                    url, self.html_dir, self.fetcher, self.manifest.get(url)
+                )
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error saving HTML for {url}: {e}")
+                self._record("fetch", start, error=True)
+                with self.lock:
+                    self.stats.scrape.n_errors += 1
+                # The page saved by a previous run is still converted and embedded
+                if not (self.html_dir / f"{module_id}.html").exists():
+                    continue
+            else:
+                self._record("fetch", start)
+                with self.lock:
+                    self.manifest[url] = entry
+                    getattr(self.stats.scrape, status).append(module_id)
+            self._put("fetch", self.html_queue, self.html_dir / f"{module_id}.html")
+
+    def _extract(self, module_html_path: Path) -> dict:
+        """Extract the module information from a page into the catalogue, unless
+        it is unchanged since the last run, and return it."""
+        stem = module_html_path.stem
+        html_hash = content_hash(module_html_path.read_bytes())
+        if self.cached_versions.get(stem) == (html_hash, self.version):
+            module_info = self.store.get(stem)
+            if module_info is not None:
+                with self.lock:
+                    self.stats.conversion.skipped.append(stem)
+                return module_info
+
+        if self.process_pool is not None:
+            module_info = self.process_pool.submit(
+                _extract_file_in_worker, module_html_path
+            ).result()
+        else:
+            module_info = _extract_module_html_file(
+                module_html_path, self.extract_function
+            )
+        self.store.put(stem, module_info, html_hash, self.version)
+        with self.lock:
+            self.stats.conversion.converted.append(stem)
+        return module_info
+
+    def convert_worker(self) -> None:
+        """Extract the module information from saved pages, render the markdown
+        documents and pass them on to be embedded."""
+        while (module_html_path := self._get(self.html_queue)) is not _DONE:
+            start = time.perf_counter()
+            stem = module_html_path.stem
+            try:
+                module_info = self._extract(module_html_path)
+            except Exception as e:
+                logger.error(f"Error converting {stem}: {e}")
+                self._record("convert", start, error=True)
+                self.store.delete([stem])
+                with self.lock:
+                    self.stats.conversion.errors.append((stem, str(e)))
+                continue
+            module_md = _module_info_to_markdown(module_info, self.markdown_template)
+            if self.markdown_dir is not None:
+                atomic_write_text(self.markdown_dir / f"{stem}.md", module_md)
+            doc = _module_document(module_md, _module_metadata(module_info), stem)
+            self._record("convert", start)
+            self._put("convert", self.doc_queue, doc)
+
+    def _embed_batch(
+        self, embedder: Embeddings, batch: list[Document]
+    ) -> tuple[list[Document], list[list[float]]]:
+        start = time.perf_counter()
+        texts = [doc.page_content for doc in batch]
+        if hasattr(embedder, "document_embedding_store"):
+            cached = embedder.document_embedding_store.mget(texts)
+            with self.lock:
+                self.stats.n_cached_embeddings += sum(v is not None for v in cached)
+        try:
+            embeddings = embedder.embed_documents(texts)
+        except Exception:
+            self._record("embed", start, error=True)
+            raise
+        self._record("embed", start, n_items=len(batch))
+        return batch, embeddings
+
+    def embed_stage(self) -> tuple[list[Document], list[list[float]]]:
+        """Split documents into chunks if configured, and embed them in batches as
+        they arrive, with at most `max_concurrent_batches` batches in flight.
+
+        Returns the documents and their embeddings, ordered by source file and
+        section so that the index does not depend on the order of arrival.
+        """
+        embed_config = self.embed_config
+        batch_size = embed_config.get("batch_size", 256)
+        n_workers = self.stats.stages["embed"].n_workers
+        embedder = BatchedEmbeddings(
+            self.embedding_model,
+            batch_size=batch_size,
+            max_concurrent_batches=1,
+            requests_per_second=embed_config.get("requests_per_second"),
+            show_progress=False,
+        )
+        if embed_config.get("cache_dir") is not None:
+            embedder = _cache_backed_embeddings(
+                embedder, self.embedding_model, embed_config["cache_dir"]
+            )
+
+        # Waiting for a free slot holds back the documents in the queue, and so
+        # the stages upstream, while the embedding model is the bottleneck
+        slots = threading.BoundedSemaphore(n_workers)
+        futures = []
+        seen_ids = set()
+        batch = []
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+
+            def submit(batch: list[Document]) -> None:
+                start = time.perf_counter()
+                slots.acquire()
+                with self.lock:
+                    self.stats.stages["embed"].blocked_seconds += (
+                        time.perf_counter() - start
+                    )
+                future = executor.submit(self._embed_batch, embedder, batch)
+                future.add_done_callback(lambda _: slots.release())
+                futures.append(future)
+
+            while (doc := self.doc_queue.get()) is not _DONE:
+                _ensure_unique_id(doc, seen_ids)
+                if embed_config.get("chunk_sections", False):
+                    batch.extend(split_module_document(doc))
+                else:
+                    batch.append(doc)
+                while len(batch) >= batch_size:
+                    submit(batch[:batch_size])
+                    batch = batch[batch_size:]
+            if batch:
+                submit(batch)
+
+        docs, embeddings, n_failed = [], [], 0
+        for future in futures:
+            try:
+                batch_docs, batch_embeddings = future.result()
+            except Exception as e:
+                logger.error(f"Embedding batch failed: {e}")
+                n_failed += 1
+                continue
+            docs.extend(batch_docs)
+            embeddings.extend(batch_embeddings)
+        if n_failed:
+            raise RuntimeError(
+                f"{n_failed} of {len(futures)} embedding batches failed, rerun to "
+                "resume from the cached embeddings"
+            )
+        order = sorted(
+            range(len(docs)),
+            key=lambda i: (
+                docs[i].metadata["source"],
+                docs[i].metadata.get("section_index", 0),
+            ),
+        )
+        return [docs[i] for i in order], [embeddings[i] for i in order]
+
+    def progress_line(self, elapsed_seconds: float) -> str:
+        with self.lock:
+            stages = {name: s.n_items for name, s in self.stats.stages.items()}
+        return (
+            f"Fetched {stages['fetch']}/{self.stats.scrape.n_pages} pages, "
+            f"converted {stages['convert']}, embedded {stages['embed']} documents "
+            f"({stages['embed'] / max(elapsed_seconds, 1e-9):.1f} docs/sec); "
+            f"queued for conversion {self.html_queue.qsize()}, for embedding "
+            f"{self.doc_queue.qsize()}"
+        )
+
+    def report_progress(self, start: float, interval: float, stop: threading.Event):
+        while not stop.wait(interval):
+            logger.info(self.progress_line(time.perf_counter() - start))
+
+    def save_state(self) -> None:
+        """Write the scraping manifest and summary."""
+        with self.lock:
+            atomic_write_json(self.html_dir / MANIFEST_FILENAME, self.manifest)
+            atomic_write_json(
+                self.html_dir / SUMMARY_FILENAME, asdict(self.stats.scrape)
+            )
+
+
+def _log_summary(stats: PipelineStats) -> None:
+    scrape, conversion = stats.scrape, stats.conversion
+    logger.info(
+        f"{len(scrape.new)} new, {len(scrape.changed)} changed, "
+        f"{len(scrape.unchanged)} unchanged and {len(scrape.deleted)} deleted pages, "
+        f"{scrape.n_errors} could not be saved"
+    )
+    logger.info(
+        f"{len(conversion.converted)} documents converted, "
+        f"{len(conversion.skipped)} unchanged, {len(conversion.errors)} failed and "
+        f"{len(conversion.removed)} orphaned documents removed"
+    )
+    logger.info(
+        f"{stats.n_cached_embeddings} embeddings reused from the cache, vectorstore "
+        f"created with {stats.n_vectors} vectors"
+    )
+    for name, stage in stats.stages.items():
+        throughput = stage.n_items / stats.elapsed_seconds
+        # Fraction of the run that the stage's workers were busy, on average
+        utilisation = stage.busy_seconds / (stage.n_workers * stats.elapsed_seconds)
+        logger.info(
+            f"{name:>7}: {stage.n_items:6d} items, {stage.n_errors} errors, "
+            f"{throughput:8.1f} items/sec, {stage.n_workers} workers "
+            f"{utilisation:.0%} busy, {stage.blocked_seconds:.1f}s blocked downstream"
+        )
+    logger.info(f"Pipeline finished in {stats.elapsed_seconds:.1f}s")
+
+
+def run_pipeline(
+    embedding_model: Embeddings,
+    scrape_config: Mapping,
+    convert_config: Mapping,
+    embed_config: Mapping,
+    queue_size: int = 64,
+    report_interval_seconds: float = 10.0,
+    extract_function: Callable = _extract_module_info_from_html,
+    markdown_template=module_template,
+) -> tuple[FAISS, PipelineStats]:
+    """Scrape, convert and embed module pages as a streaming pipeline.
+
+    Rather than waiting for every page to be fetched before converting, and every
+    document to be converted before embedding, each page moves on to the next
+    stage as soon as it is ready, so the network-bound fetching, CPU-bound parsing
+    and the calls to the embedding model overlap. Stages are connected by queues
+    of at most `queue_size` items; a stage that gets ahead blocks until the stage
+    after it catches up, which bounds memory use.
+
+    The stages take the settings of `scrape_documents`,
+    `convert_all_documents_html_to_markdown` and `embed_documents`, given as
+    `scrape_config`, `convert_config` and `embed_config`, and the worker count of
+    each stage is the `max_in_flight`, `n_workers` and `max_concurrent_batches`
+    setting respectively. The same files are written to the same directories as
+    when the stages are run one after the other: the HTML pages, manifest and
+    scrape summary, the catalogue store, any markdown documents, and cached
+    embeddings. Unchanged pages are not downloaded or parsed again, but
+    the vectorstore is always rebuilt, with embeddings reused from `cache_dir`;
+    the `update` and `checkpoint_dir` settings are not used. Batches are made up
+    in the order documents arrive, so a rerun resumes from the embedding cache
+    rather than from batch checkpoints. The index is created once every document is
+    embedded, since IVF indexes are trained on all the vectors.
+
+    Progress is logged every `report_interval_seconds`, and the throughput and
+    utilisation of each stage at the end.
+    """
+    pipeline = _StreamingPipeline(
+        embedding_model,
+        scrape_config,
+        convert_config,
+        embed_config,
+        queue_size,
+        extract_function,
+        markdown_template,
+    )
+    stats = pipeline.stats
+    n_fetch_workers = stats.stages["fetch"].n_workers
+    n_convert_workers = stats.stages["convert"].n_workers
+
+    pipeline.fetcher = ModulePageFetcher(
+        requests_per_second=scrape_config.get("requests_per_second", 2.0),
+        max_in_flight=n_fetch_workers,
+        max_retries=scrape_config.get("max_retries", 3),
+        backoff_seconds=scrape_config.get("backoff_seconds", 2.0),
+        timeout_seconds=scrape_config.get("timeout_seconds", 30.0),
+    )
+    index_page_url = scrape_config["index_page_url"]
+    logger.info(f"Identifying module pages from {index_page_url}")
+    index_page_html = _get_index_page_html(index_page_url, pipeline.fetcher)
+    module_urls = _get_module_urls_from_index_page(
+        index_page_html, scrape_config["regex_url_pattern"]
+    )
+    if not module_urls:
+        pipeline.fetcher.close()
+        pipeline.store.close()
+        raise RuntimeError(f"No module pages found on {index_page_url}")
+    stats.scrape.n_pages = len(module_urls)
+    logger.info(f"Identified {len(module_urls)} module pages")
+
+    stats.scrape.deleted = _remove_deleted_modules(
+        pipeline.manifest, module_urls, pipeline.html_dir
+    )
+    stats.conversion.removed = _remove_orphaned_modules(
+        pipeline.store,
+        pipeline.markdown_dir,
+        {_module_id_from_url(url) for url in module_urls},
+    )
+    for url in module_urls:
+        pipeline.url_queue.put(url)
+    for _ in range(n_fetch_workers):
+        pipeline.url_queue.put(_DONE)
+
+    if n_convert_workers > 1:
+        pipeline.process_pool = extraction_process_pool(
+            pipeline.extract_function, n_convert_workers
+        )
+        # Fork the worker processes before any threads are started
+        pipeline.process_pool.submit(int).result()
+
+    start = time.perf_counter()
+    stop_reporting = threading.Event()
+    threading.Thread(
+        target=pipeline.report_progress,
+        args=(start, report_interval_seconds, stop_reporting),
+        daemon=True,
+    ).start()
+    threads = []
+    try:
+        threads += pipeline.start_workers(
+            pipeline.fetch_worker,
+            n_fetch_workers,
+            pipeline.html_queue,
+            n_convert_workers,
+        )
+        threads += pipeline.start_workers(
+            pipeline.convert_worker, n_convert_workers, pipeline.doc_queue, 1
+        )
+        docs, embeddings = pipeline.embed_stage()
+        for thread in threads:
+            thread.join()
+    except BaseException:
+        # The fetcher and store are only closed once no worker is using them
+        pipeline.stop(threads)
+        raise
+    finally:
+        stop_reporting.set()
+        pipeline.fetcher.close()
+        if pipeline.process_pool is not None:
+            pipeline.process_pool.shutdown()
+        stats.scrape.elapsed_seconds = time.perf_counter() - start
+        pipeline.save_state()
+        pipeline.store.close()
+
+    vectorstore = _empty_vectorstore(
+        embedding_model, embeddings, dict(embed_config.get("index_config") or {})
+    )
+    vectorstore.add_embeddings(
+        zip([doc.page_content for doc in docs], embeddings),
+        metadatas=[doc.metadata for doc in docs],
+        ids=[doc.id for doc in docs],
+    )
+    stats.n_vectors = vectorstore.index.ntotal
+    stats.elapsed_seconds = time.perf_counter() - start
+    _log_summary(stats)
+    return vectorstore, stats
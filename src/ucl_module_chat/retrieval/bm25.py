@@ -0,0 +1,251 @@
+import asyncio
+import json
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
+from loguru import logger
+
+from .metadata import MetadataIndex, infer_filters
+
+BM25_INDEX_DIRNAME = "bm25"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Common words in questions and in the module template that carry no signal
+STOPWORDS = frozenset(
+    """a an and are as at be by can do does for from has have how i in is it
+    me module modules of on or that the their there this to what when which
+    who will with""".split()
+)
+
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase and split text into alphanumeric tokens, dropping stopwords."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over documents in FAISS position order.
+
+    Postings are stored in compressed sparse row form: the documents and term
+    frequencies for term `i` are `doc_ids[offsets[i]:offsets[i + 1]]` and
+    `term_frequencies[offsets[i]:offsets[i + 1]]`. The arrays are saved as `.npy`
+    files and memory-mapped when loaded, so only the postings for query terms
+    are read from disk.
+    """
+
+    def __init__(
+        self,
+        vocabulary: dict[str, int],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        term_frequencies: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_frequencies = term_frequencies
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(doc_lengths)
+        self.avg_doc_length = float(np.mean(doc_lengths)) if self.n_docs else 0.0
+
+    @classmethod
+    def from_texts(
+        cls, texts: list[str], k1: float = 1.5, b: float = 0.75
+    ) -> "BM25Index":
+        postings = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        vocabulary = {term: i for i, term in enumerate(sorted(postings))}
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        for term, i in vocabulary.items():
+            offsets[i + 1] = len(postings[term])
+        offsets = np.cumsum(offsets)
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        term_frequencies = np.empty(offsets[-1], dtype=np.float32)
+        for term, i in vocabulary.items():
+            term_postings = np.array(postings[term])
+            doc_ids[offsets[i] : offsets[i + 1]] = term_postings[:, 0]
+            term_frequencies[offsets[i] : offsets[i + 1]] = term_postings[:, 1]
+        return cls(vocabulary, offsets, doc_ids, term_frequencies, doc_lengths, k1, b)
+
+    def save(self, output_dir: str | Path) -> None:
+        index_dir = Path(output_dir) / BM25_INDEX_DIRNAME
+        index_dir.mkdir(parents=True, exist_ok=True)
+        np.save(index_dir / "offsets.npy", self.offsets)
+        np.save(index_dir / "doc_ids.npy", self.doc_ids)
+        np.save(index_dir / "term_frequencies.npy", self.term_frequencies)
+        np.save(index_dir / "doc_lengths.npy", self.doc_lengths)
+        with open(index_dir / "vocabulary.json", "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "vocabulary": self.vocabulary}, f)
+
+    @classmethod
+    def load(cls, vectorstore_dir: str | Path) -> "BM25Index":
+        index_dir = Path(vectorstore_dir) / BM25_INDEX_DIRNAME
+        with open(index_dir / "vocabulary.json", "r") as f:
+            params = json.load(f)
+        return cls(
+            vocabulary=params["vocabulary"],
+            offsets=np.load(index_dir / "offsets.npy", mmap_mode="r"),
+            doc_ids=np.load(index_dir / "doc_ids.npy", mmap_mode="r"),
+            term_frequencies=np.load(index_dir / "term_frequencies.npy", mmap_mode="r"),
+            doc_lengths=np.load(index_dir / "doc_lengths.npy"),
+            k1=params["k1"],
+            b=params["b"],
+        )
+
+    def search(
+        self, query: str, k: int, positions: np.ndarray | None = None
+    ) -> list[tuple[int, float]]:
+        """Return the top `k` (position, score) pairs for a query, optionally
+        restricted to the given positions."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        length_norm = self.k1 * (
+            1 - self.b + self.b * self.doc_lengths / (self.avg_doc_length or 1.0)
+        )
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            doc_ids = np.asarray(self.doc_ids[start:end])
+            tf = np.asarray(self.term_frequencies[start:end])
+            idf = np.log1p((self.n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            scores[doc_ids] += idf * tf * (self.k1 + 1) / (tf + length_norm[doc_ids])
+
+        if positions is not None:
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[positions] = True
+            scores[~allowed] = 0.0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            top = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[top]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in ranked]
+
+
+def build_bm25_index(vectorstore: FAISS) -> BM25Index:
+    """Build a BM25 index over the documents in the vectorstore."""
+    texts = []
+    for position in range(vectorstore.index.ntotal):
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+        texts.append(doc.page_content if isinstance(doc, Document) else "")
+    return BM25Index.from_texts(texts)
+
+
+def save_bm25_index(vectorstore: FAISS, output_dir: str | Path) -> None:
+    """Build the BM25 index and save it alongside the vectorstore."""
+    build_bm25_index(vectorstore).save(output_dir)
+
+
+def load_bm25_index(vectorstore_dir: str | Path, vectorstore: FAISS) -> BM25Index:
+    """Load the BM25 index, building it from the docstore if not saved or if it
+    is out of step with the FAISS index."""
+    if (Path(vectorstore_dir) / BM25_INDEX_DIRNAME / "vocabulary.json").exists():
+        bm25_index = BM25Index.load(vectorstore_dir)
+        if bm25_index.n_docs == vectorstore.index.ntotal:
+            return bm25_index
+    logger.info("No BM25 index saved with vectorstore, building from docstore")
+    return build_bm25_index(vectorstore)
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever combining BM25 lexical search with dense vector search.
+
+    In "hybrid" mode, the top `n_candidates` results from each are fused with
+    reciprocal rank fusion, scoring each document by the sum of
+    `1 / (rrf_k + rank)` over the two rankings, and the top `k` are returned.
+    "lexical" and "dense" modes return the results of one search only. The dense
+    retriever should return `n_candidates` documents. If a `metadata_index` is
+    given, filters inferred from the query also restrict the lexical search.
+    Async calls run the lexical search in a thread, alongside the dense search.
+    """
+
+    dense_retriever: BaseRetriever
+    vectorstore: FAISS
+    bm25_index: BM25Index
+    metadata_index: MetadataIndex | None = None
+    mode: str = "hybrid"
+    k: int = 4
+    n_candidates: int = 20
+    rrf_k: int = 60
+
+    def _lexical_search(self, query: str) -> list[Document]:
+        positions = None
+        if self.metadata_index is not None:
+            filters = infer_filters(query, self.metadata_index)
+            if filters:
+                positions = self.metadata_index.select(filters)
+                if len(positions) == 0:
+                    positions = None
+        return [
+            self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[i])
+            for i, _ in self.bm25_index.search(query, self.n_candidates, positions)
+        ]
+
+    def _fuse(
+        self, lexical_docs: list[Document], dense_docs: list[Document]
+    ) -> list[Document]:
+        scores = {}
+        docs = {}
+        for ranking in [lexical_docs, dense_docs]:
+            for rank, doc in enumerate(ranking, start=1):
+                key = doc.page_content
+                docs.setdefault(key, doc)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [docs[key] for key in ranked[: self.k]]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        if self.mode == "lexical":
+            return self._lexical_search(query)[: self.k]
+        dense_docs = self.dense_retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        if self.mode == "dense":
+            return dense_docs[: self.k]
+        return self._fuse(self._lexical_search(query), dense_docs)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        if self.mode == "dense":
+            dense_docs = await self.dense_retriever.ainvoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+            return dense_docs[: self.k]
+        lexical_search = run_in_executor(None, self._lexical_search, query)
+        if self.mode == "lexical":
+            return (await lexical_search)[: self.k]
+        lexical_docs, dense_docs = await asyncio.gather(
+            lexical_search,
+            self.dense_retriever.ainvoke(
+                query, config={"callbacks": run_manager.get_child()}
+            ),
+        )
+        return self._fuse(lexical_docs, dense_docs)
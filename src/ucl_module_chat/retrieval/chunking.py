@@ -0,0 +1,79 @@
+from langchain_core.documents import Document
+from langchain_text_splitters import MarkdownHeaderTextSplitter
+
+# Split on the module title and the sections of `document_templates.module_template`;
+# deliveries (###) stay together in the "Module deliveries" section
+SECTION_HEADERS = [("#", "module_heading"), ("##", "section")]
+
+CHUNK_METADATA_KEYS = ("parent_id", "section", "section_index")
+
+
+def split_module_document(doc: Document) -> list[Document]:
+    """Split a module document into one chunk per section.
+
+    Each chunk starts with the module title heading so that it identifies the
+    module on its own, and keeps the metadata of the parent document along with
+    the parent ID, section name and position of the section in the document.
+    """
+    splitter = MarkdownHeaderTextSplitter(SECTION_HEADERS, strip_headers=True)
+    chunks = []
+    for i, section in enumerate(splitter.split_text(doc.page_content)):
+        lines = []
+        if "module_heading" in section.metadata:
+            lines.append(f"# {section.metadata['module_heading']}")
+        if "section" in section.metadata:
+            lines.append(f"## {section.metadata['section']}")
+        lines.append(section.page_content)
+        metadata = {
+            **doc.metadata,
+            "parent_id": doc.id,
+            "section": section.metadata.get("section"),
+            "section_index": i,
+        }
+        chunks.append(
+            Document(
+                page_content="\n".join(lines), metadata=metadata, id=f"{doc.id}#{i}"
+            )
+        )
+    return chunks
+
+
+def _merge_chunks(chunks: list[Document]) -> Document:
+    """Merge chunks from one module into a single document in section order."""
+    chunks = sorted(chunks, key=lambda chunk: chunk.metadata["section_index"])
+    heading = None
+    sections = []
+    for chunk in chunks:
+        lines = chunk.page_content.split("\n")
+        if lines[0].startswith("# "):
+            heading = heading or lines[0]
+            lines = lines[1:]
+        sections.append("\n".join(lines))
+    metadata = {
+        key: value
+        for key, value in chunks[0].metadata.items()
+        if key not in CHUNK_METADATA_KEYS
+    }
+    metadata["sections"] = [chunk.metadata["section"] for chunk in chunks]
+    page_content = "\n\n".join(([heading] if heading else []) + sections)
+    return Document(page_content=page_content, metadata=metadata)
+
+
+def regroup_by_parent(docs: list[Document]) -> list[Document]:
+    """Merge retrieved chunks into one document per parent module.
+
+    Modules are ordered by their highest ranked chunk, and duplicate chunks are
+    dropped. Documents that are not chunks are returned unchanged.
+    """
+    groups = {}
+    for doc in docs:
+        parent_id = doc.metadata.get("parent_id")
+        if parent_id is None:
+            groups.setdefault(("doc", doc.page_content), doc)
+            continue
+        chunks = groups.setdefault(("parent", parent_id), {})
+        chunks.setdefault(doc.metadata["section_index"], doc)
+    return [
+        _merge_chunks(list(group.values())) if kind == "parent" else group
+        for (kind, _), group in groups.items()
+    ]
@@ -0,0 +1,194 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+
+import faiss
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings.embeddings import Embeddings
+from loguru import logger
+
+FAISS_INDEX_FILENAME = "index.faiss"
+PICKLED_DOCSTORE_FILENAME = "index.pkl"
+DOCSTORE_FILENAME = "docstore.sqlite"
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore backed by SQLite, fetching documents lazily by ID.
+
+    The database is opened when the docstore is created, and the connection is
+    shared by the worker threads that serve concurrent requests, guarded by a
+    lock. If `write_vectorstore` later replaces the database file, the docstore
+    keeps reading the database it was opened with, which matches the FAISS index
+    loaded with it.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(
+            f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+
+    def query(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        """Run a query on the shared connection and return all rows."""
+        with self._lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def search(self, search: str) -> Document | str:
+        rows = self.query(
+            "SELECT page_content, metadata FROM documents WHERE id = ?", (search,)
+        )
+        if not rows:
+            return f"ID {search} not found."
+        page_content, metadata = rows[0]
+        return Document(
+            page_content=page_content, metadata=json.loads(metadata), id=search
+        )
+
+    def ids_by_position(self) -> Iterator[tuple[int, str]]:
+        yield from self.query("SELECT position, id FROM documents ORDER BY position")
+
+
+class LazyIndexToDocstoreId(Mapping):
+    """Read-only mapping from FAISS position to document ID, looked up in SQLite
+    on demand rather than loaded in full."""
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        rows = self.docstore.query(
+            "SELECT id FROM documents WHERE position = ?", (int(position),)
+        )
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __iter__(self) -> Iterator[int]:
+        for position, _ in self.docstore.ids_by_position():
+            yield position
+
+    def __len__(self) -> int:
+        return self.docstore.query("SELECT COUNT(*) FROM documents")[0][0]
+
+    def values(self) -> Iterator[str]:
+        for _, doc_id in self.docstore.ids_by_position():
+            yield doc_id
+
+    def items(self) -> Iterator[tuple[int, str]]:
+        yield from self.docstore.ids_by_position()
+
+
+def _write_docstore(vectorstore: FAISS, path: Path) -> None:
+    """Write the documents in the vectorstore to a new SQLite database, replacing
+    any existing database atomically."""
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute(
+            """CREATE TABLE documents (
+                id TEXT PRIMARY KEY,
+                position INTEGER UNIQUE NOT NULL,
+                page_content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )"""
+        )
+        rows = []
+        for position, doc_id in vectorstore.index_to_docstore_id.items():
+            doc = vectorstore.docstore.search(doc_id)
+            rows.append((doc_id, position, doc.page_content, json.dumps(doc.metadata)))
+        connection.executemany("INSERT INTO documents VALUES (?, ?, ?, ?)", rows)
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, path)
+
+
+def write_vectorstore(vectorstore: FAISS, output_dir: str | Path) -> None:
+    """Save the FAISS index and a SQLite docstore to `output_dir`.
+
+    Unlike `FAISS.save_local`, the docstore is not pickled, so it can be loaded
+    without `allow_dangerous_deserialization` and read lazily.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    _write_docstore(vectorstore, output_dir / DOCSTORE_FILENAME)
+    tmp_path = output_dir / f"{FAISS_INDEX_FILENAME}.tmp"
+    faiss.write_index(vectorstore.index, str(tmp_path))
+    os.replace(tmp_path, output_dir / FAISS_INDEX_FILENAME)
+    # Remove any pickled docstore from an older save, which would now be stale
+    (output_dir / PICKLED_DOCSTORE_FILENAME).unlink(missing_ok=True)
+
+
+def _read_faiss_index(path: Path, mmap: bool) -> faiss.Index:
+    if mmap:
+        try:
+            return faiss.read_index(
+                str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
+        except RuntimeError as e:
+            logger.warning(f"Could not memory-map {path} ({e}), reading into memory")
+    return faiss.read_index(str(path))
+
+
+def load_vectorstore(
+    vectorstore_dir: str | Path,
+    embedding_model: Embeddings,
+    mmap: bool = True,
+    in_memory: bool = False,
+) -> FAISS:
+    """Load a vectorstore saved by `write_vectorstore`.
+
+    With `mmap`, the FAISS index is memory-mapped read-only, so the pages are
+    shared between processes through the page cache. Documents are fetched from
+    SQLite as needed, unless `in_memory` is set, in which case they are loaded
+    into an in-memory docstore so that the vectorstore can be updated.
+
+    Vectorstores saved with `FAISS.save_local` (a pickled docstore) are loaded
+    with that method instead.
+    """
+    vectorstore_dir = Path(vectorstore_dir)
+    docstore_path = vectorstore_dir / DOCSTORE_FILENAME
+    if not docstore_path.exists():
+        logger.warning(f"No {DOCSTORE_FILENAME} in {vectorstore_dir}, loading pickle")
+        return FAISS.load_local(
+            vectorstore_dir,
+            embeddings=embedding_model,
+            allow_dangerous_deserialization=True,
+        )
+
+    index_path = vectorstore_dir / FAISS_INDEX_FILENAME
+    # Open the docstore before reading the index, which `write_vectorstore`
+    # replaces last, and check that they were saved together
+    docstore = SQLiteDocstore(docstore_path)
+    if in_memory:
+        index = _read_faiss_index(index_path, mmap=False)
+        index_to_docstore_id = dict(docstore.ids_by_position())
+        docstore = InMemoryDocstore(
+            {
+                doc_id: docstore.search(doc_id)
+                for doc_id in index_to_docstore_id.values()
+            }
+        )
+    else:
+        index = _read_faiss_index(index_path, mmap=mmap)
+        index_to_docstore_id = LazyIndexToDocstoreId(docstore)
+    if index.ntotal != len(index_to_docstore_id):
+        raise ValueError(
+            f"The FAISS index in {vectorstore_dir} has {index.ntotal} vectors but "
+            f"the docstore has {len(index_to_docstore_id)} documents; the "
+            "vectorstore may have been saved while it was being loaded"
+        )
+    return FAISS(
+        embedding_function=embedding_model,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
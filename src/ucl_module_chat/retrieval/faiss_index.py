@@ -0,0 +1,126 @@
+import faiss
+import numpy as np
+from loguru import logger
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq", "ivfsq")
+
+# FAISS warns when training k-means with fewer than this many points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def create_faiss_index(
+    vectors: np.ndarray,
+    index_type: str = "flat",
+    hnsw_m: int = 32,
+    ef_construction: int = 200,
+    nlist: int = 256,
+    pq_m: int = 16,
+    pq_nbits: int = 8,
+    sq_type: str = "QT_8bit",
+) -> faiss.Index:
+    """Create an empty FAISS index of the given type, trained on `vectors`.
+
+    - "flat": exact search.
+    - "hnsw": HNSW graph with `hnsw_m` neighbours per node.
+    - "ivf": inverted file with `nlist` lists, storing full vectors.
+    - "ivfpq": inverted file with vectors compressed by product quantization into
+      `pq_m` codes of `pq_nbits` bits.
+    - "ivfsq": inverted file with vectors compressed by a scalar quantizer, e.g.
+      "QT_8bit" or "QT_fp16".
+
+    All indexes use L2 distance, like the flat index built by LangChain. For small
+    corpora, `nlist` is reduced so that each list has enough training points, and
+    a flat index is used if there are too few vectors to train product
+    quantization.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"index_type must be one of {INDEX_TYPES}, got {index_type}")
+    n_vectors, dimension = vectors.shape
+
+    if index_type == "ivfpq" and n_vectors < MIN_POINTS_PER_CENTROID * 2**pq_nbits:
+        logger.warning(
+            f"Too few vectors ({n_vectors}) to train product quantization, "
+            "using a flat index"
+        )
+        index_type = "flat"
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    max_nlist = max(1, n_vectors // MIN_POINTS_PER_CENTROID)
+    if nlist > max_nlist:
+        logger.warning(
+            f"Reducing nlist from {nlist} to {max_nlist} for {n_vectors} vectors"
+        )
+        nlist = max_nlist
+    quantizer = faiss.IndexFlatL2(dimension)
+    if index_type == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+    elif index_type == "ivfpq":
+        if dimension % pq_m != 0:
+            raise ValueError(
+                f"pq_m ({pq_m}) must divide the embedding dimension ({dimension})"
+            )
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits)
+    else:
+        qtype = getattr(faiss.ScalarQuantizer, sq_type)
+        index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, qtype)
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+    return index
+
+
+def faiss_index_type(index: faiss.Index) -> str:
+    """Return the index type name, as used by `create_faiss_index`."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVFScalarQuantizer):
+        return "ivfsq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Whether vectors can be removed from the index by LangChain's
+    `FAISS.delete`, which renumbers the remaining positions from zero.
+
+    Only a flat index shifts its remaining vectors down when some are removed, so
+    that positions stay in step. HNSW cannot remove vectors, and IVF indexes keep
+    the original IDs of the remaining vectors, so later positions would point to
+    the wrong documents.
+    """
+    return faiss_index_type(index) == "flat"
+
+
+def configure_search(
+    index: faiss.Index, nprobe: int | None = None, ef_search: int | None = None
+) -> None:
+    """Set search-time parameters: lists probed for IVF indexes and the size of
+    the candidate list for HNSW. Parameters for other index types are ignored."""
+    index_type = faiss_index_type(index)
+    if index_type.startswith("ivf") and nprobe is not None:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    elif index_type == "hnsw" and ef_search is not None:
+        faiss.downcast_index(index).hnsw.efSearch = ef_search
+
+
+def search_parameters(
+    index: faiss.Index, selector: faiss.IDSelector
+) -> faiss.SearchParameters:
+    """Search parameters restricting a search to `selector`, of the type the index
+    requires and keeping its configured nprobe or efSearch."""
+    index_type = faiss_index_type(index)
+    if index_type.startswith("ivf"):
+        nprobe = faiss.extract_index_ivf(index).nprobe
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if index_type == "hnsw":
+        ef_search = faiss.downcast_index(index).hnsw.efSearch
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    return faiss.SearchParameters(sel=selector)
@@ -0,0 +1,244 @@
+import re
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from loguru import logger
+
+from .faiss_index import search_parameters
+
+METADATA_INDEX_FILENAME = "metadata_index.npz"
+
+LEVEL_TYPES = ["Undergraduate", "Postgraduate"]
+
+# Patterns used to infer metadata filters from a (standalone) question
+POSTGRADUATE_PATTERN = re.compile(r"\b(postgraduate|masters?|msc|pg|pgt)\b", re.I)
+UNDERGRADUATE_PATTERN = re.compile(r"\b(undergraduate|bachelors?|bsc|ug)\b", re.I)
+TERM_PATTERN = re.compile(r"\bterms?\s+(\d)(?:\s*(?:and|or|,|&)\s*(\d))?", re.I)
+CREDIT_PATTERN = re.compile(r"\b(\d+)[\s-]?credits?\b", re.I)
+FHEQ_LEVEL_PATTERN = re.compile(r"\b(?:fheq\s+)?level\s+(\d)\b", re.I)
+
+
+def _terms(teaching_term: str) -> set[str]:
+    """Split a teaching term such as "Term 1 and Term 2" into individual terms."""
+    if "term" in teaching_term.lower():
+        return {f"Term {n}" for n in re.findall(r"\d", teaching_term)}
+    return {teaching_term.strip()}
+
+
+def _column_values(metadata: dict) -> dict[str, set[str]]:
+    """Values of each filterable column for a document, from its metadata.
+
+    Level, term and FHEQ level are collected from the module and all of its
+    deliveries, so a module matches a filter if any delivery matches.
+    """
+    columns = {
+        "faculty": set(),
+        "teaching_department": set(),
+        "credit_value": set(),
+        "level_type": set(),
+        "fheq_level": set(),
+        "teaching_term": set(),
+    }
+    for key in ["faculty", "teaching_department", "credit_value"]:
+        if metadata.get(key):
+            columns[key].add(str(metadata[key]).strip())
+
+    level = metadata.get("level") or ""
+    columns["fheq_level"].update(re.findall(r"\d", level))
+    columns["level_type"].update(t for t in LEVEL_TYPES if t.lower() in level.lower())
+    if metadata.get("teaching_term"):
+        columns["teaching_term"].update(_terms(metadata["teaching_term"]))
+
+    for delivery in metadata.get("deliveries", []):
+        if delivery.get("type"):
+            columns["level_type"].add(delivery["type"])
+        if delivery.get("fheq_level"):
+            columns["fheq_level"].add(delivery["fheq_level"])
+        if delivery.get("teaching_term"):
+            columns["teaching_term"].update(_terms(delivery["teaching_term"]))
+    return columns
+
+
+class MetadataIndex:
+    """Columnar index of filterable module metadata, aligned with FAISS positions.
+
+    Each column is stored as a vocabulary of values and a boolean matrix with a
+    row per vector in the FAISS index and a column per value, so a filter is
+    resolved to the eligible FAISS positions with a few vectorised operations.
+    """
+
+    def __init__(self, columns: dict[str, tuple[np.ndarray, np.ndarray]]):
+        self.columns = columns
+
+    @property
+    def n_rows(self) -> int:
+        return next(iter(self.columns.values()))[1].shape[0] if self.columns else 0
+
+    def vocabulary(self, column: str) -> list[str]:
+        return self.columns[column][0].tolist()
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: FAISS) -> "MetadataIndex":
+        n_rows = vectorstore.index.ntotal
+        rows = []
+        for position in range(n_rows):
+            doc = vectorstore.docstore.search(
+                vectorstore.index_to_docstore_id[position]
+            )
+            metadata = doc.metadata if isinstance(doc, Document) else {}
+            rows.append(_column_values(metadata))
+
+        columns = {}
+        for column in _column_values({}):
+            vocab = sorted({value for row in rows for value in row[column]})
+            value_index = {value: i for i, value in enumerate(vocab)}
+            mask = np.zeros((n_rows, len(vocab)), dtype=bool)
+            for position, row in enumerate(rows):
+                for value in row[column]:
+                    mask[position, value_index[value]] = True
+            columns[column] = (np.array(vocab, dtype=str), mask)
+        return cls(columns)
+
+    def save(self, output_dir: str | Path) -> None:
+        arrays = {}
+        for column, (vocab, mask) in self.columns.items():
+            arrays[f"{column}__vocab"] = vocab
+            arrays[f"{column}__mask"] = mask
+        np.savez_compressed(Path(output_dir) / METADATA_INDEX_FILENAME, **arrays)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "MetadataIndex":
+        with np.load(path) as arrays:
+            names = {name.rsplit("__", 1)[0] for name in arrays.files}
+            columns = {
+                column: (arrays[f"{column}__vocab"], arrays[f"{column}__mask"])
+                for column in names
+            }
+        return cls(columns)
+
+    def select(self, filters: dict[str, list[str]]) -> np.ndarray:
+        """FAISS positions of documents matching all filters.
+
+        Values within a column are combined with OR and columns with AND.
+        """
+        eligible = np.ones(self.n_rows, dtype=bool)
+        for column, values in filters.items():
+            vocab, mask = self.columns[column]
+            value_columns = np.flatnonzero(np.isin(vocab, values))
+            eligible &= mask[:, value_columns].any(axis=1)
+        return np.flatnonzero(eligible).astype(np.int64)
+
+
+def save_metadata_index(vectorstore: FAISS, output_dir: str | Path) -> None:
+    """Build the metadata index and save it alongside the vectorstore."""
+    MetadataIndex.from_vectorstore(vectorstore).save(output_dir)
+
+
+def load_metadata_index(
+    vectorstore_dir: str | Path, vectorstore: FAISS
+) -> MetadataIndex:
+    """Load the metadata index, building it from the docstore if not saved or if
+    it is out of step with the FAISS index."""
+    index_path = Path(vectorstore_dir) / METADATA_INDEX_FILENAME
+    if index_path.exists():
+        metadata_index = MetadataIndex.load(index_path)
+        if metadata_index.n_rows == vectorstore.index.ntotal:
+            return metadata_index
+    logger.info("No metadata index saved with vectorstore, building from docstore")
+    return MetadataIndex.from_vectorstore(vectorstore)
+
+
+def infer_filters(question: str, metadata_index: MetadataIndex) -> dict[str, list[str]]:
+    """Infer metadata filters from a question.
+
+    Only values present in the index are used, so a filter is never inferred
+    from, for example, a term number that no module is taught in.
+    """
+    filters = {}
+
+    is_postgraduate = POSTGRADUATE_PATTERN.search(question) is not None
+    is_undergraduate = UNDERGRADUATE_PATTERN.search(question) is not None
+    if is_postgraduate != is_undergraduate:
+        filters["level_type"] = ["Postgraduate" if is_postgraduate else "Undergraduate"]
+
+    filters["teaching_term"] = [
+        f"Term {n}"
+        for match in TERM_PATTERN.finditer(question)
+        for n in match.groups()
+        if n is not None
+    ]
+    filters["credit_value"] = CREDIT_PATTERN.findall(question)
+    filters["fheq_level"] = FHEQ_LEVEL_PATTERN.findall(question)
+
+    question_lower = question.lower()
+    for column in ["teaching_department", "faculty"]:
+        filters[column] = [
+            value
+            for value in metadata_index.vocabulary(column)
+            if len(value) > 3 and value.lower() in question_lower
+        ]
+
+    known_filters = {}
+    for column, values in filters.items():
+        vocab = set(metadata_index.vocabulary(column))
+        known_values = [value for value in values if value in vocab]
+        if known_values:
+            known_filters[column] = known_values
+    return known_filters
+
+
+class FilteredRetriever(BaseRetriever):
+    """Vector retriever that applies metadata filters during the FAISS search.
+
+    Filters are given explicitly with `filters` and/or, with `infer_filters`,
+    inferred from the query. They are resolved to the eligible FAISS positions
+    using the metadata index and passed to FAISS as an ID selector, so only
+    eligible modules are scored. If no module matches the filters, an unfiltered
+    search is performed.
+    """
+
+    vectorstore: FAISS
+    metadata_index: MetadataIndex
+    k: int = 4
+    filters: dict[str, list[str]] = {}
+    infer_filters: bool = True
+
+    def _search(self, query: str, positions: np.ndarray | None) -> list[Document]:
+        vector = np.asarray([self.vectorstore._embed_query(query)], dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(vector)
+        if positions is None:
+            _, indices = self.vectorstore.index.search(vector, self.k)
+        else:
+            selector = faiss.IDSelectorBatch(positions)
+            params = search_parameters(self.vectorstore.index, selector)
+            k = min(self.k, len(positions))
+            _, indices = self.vectorstore.index.search(vector, k, params=params)
+        return [
+            self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[i])
+            for i in indices[0]
+            if i != -1
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        filters = dict(self.filters)
+        if self.infer_filters:
+            filters.update(infer_filters(query, self.metadata_index))
+        if not filters:
+            return self._search(query, None)
+
+        positions = self.metadata_index.select(filters)
+        logger.debug(
+            f"Metadata filters {filters} matched {len(positions)} of "
+            f"{self.metadata_index.n_rows} modules"
+        )
+        if len(positions) == 0:
+            return self._search(query, None)
+        return self._search(query, positions)
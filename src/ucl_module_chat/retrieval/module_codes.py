@@ -0,0 +1,154 @@
+import json
+import re
+import threading
+from pathlib import Path
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
+from loguru import logger
+from pydantic import PrivateAttr
+
+from ..utils.file_io import content_hash
+
+MODULE_CODE_PATTERN = re.compile(r"\b[A-Z]{4}\d{4}\b")
+
+# The first heading of each document is "# {module_title} ({module_code})"
+TITLE_CODE_PATTERN = re.compile(r"^#\s.*\((?P<module_code>[A-Z]{4}\d{4})\)", re.M)
+
+MODULE_CODE_INDEX_FILENAME = "module_code_index.json"
+
+
+def module_code_from_markdown(module_md: str) -> str | None:
+    """Return the module code from the title heading of a module document."""
+    match = TITLE_CODE_PATTERN.search(module_md)
+    return match.group("module_code") if match else None
+
+
+def build_module_code_index(vectorstore: FAISS) -> dict[str, list[str]]:
+    """Map each module code to the IDs of its documents in the vectorstore."""
+    module_code_index = {}
+    for doc_id in vectorstore.index_to_docstore_id.values():
+        doc = vectorstore.docstore.search(doc_id)
+        module_code = doc.metadata.get("module_code") or module_code_from_markdown(
+            doc.page_content
+        )
+        if module_code is not None:
+            module_code_index.setdefault(module_code, []).append(doc_id)
+    return module_code_index
+
+
+def _docstore_fingerprint(vectorstore: FAISS) -> str:
+    """Hash of the document IDs in the vectorstore, which changes when documents
+    are added or removed."""
+    return content_hash("\n".join(sorted(vectorstore.index_to_docstore_id.values())))
+
+
+def save_module_code_index(vectorstore: FAISS, output_dir: str | Path) -> None:
+    """Build the module code index and save it alongside the vectorstore, with a
+    fingerprint of the documents it was built from."""
+    saved = {
+        "docstore_fingerprint": _docstore_fingerprint(vectorstore),
+        "module_codes": build_module_code_index(vectorstore),
+    }
+    with open(Path(output_dir) / MODULE_CODE_INDEX_FILENAME, "w") as f:
+        json.dump(saved, f)
+
+
+def load_module_code_index(
+    vectorstore_dir: str | Path, vectorstore: FAISS
+) -> dict[str, list[str]]:
+    """Load the module code index, building it from the docstore if not saved or if
+    it was built from different documents."""
+    index_path = Path(vectorstore_dir) / MODULE_CODE_INDEX_FILENAME
+    if index_path.exists():
+        with open(index_path, "r") as f:
+            saved = json.load(f)
+        if saved.get("docstore_fingerprint") == _docstore_fingerprint(vectorstore):
+            return saved["module_codes"]
+    logger.info("No module code index saved with vectorstore, building from docstore")
+    return build_module_code_index(vectorstore)
+
+
+class ModuleCodeRetriever(BaseRetriever):
+    """Retriever with a fast path for queries that name module codes.
+
+    Documents for any module codes in the query are looked up directly in the
+    docstore and placed first, followed by the results of the wrapped vector
+    retriever with duplicates removed. With `skip_vector_search`, the vector
+    search is bypassed entirely when every code in the query is found.
+    """
+
+    retriever: BaseRetriever
+    vectorstore: FAISS
+    module_code_index: dict[str, list[str]]
+    skip_vector_search: bool = False
+    n_queries: int = 0
+    n_fast_path_hits: int = 0
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def fast_path_hit_rate(self) -> float:
+        return self.n_fast_path_hits / self.n_queries if self.n_queries else 0.0
+
+    def _lookup(self, query: str) -> tuple[list[Document], bool]:
+        """Return documents for codes in the query and whether all were found."""
+        codes = list(dict.fromkeys(MODULE_CODE_PATTERN.findall(query)))
+        docs = []
+        for code in codes:
+            for doc_id in self.module_code_index.get(code, []):
+                doc = self.vectorstore.docstore.search(doc_id)
+                if isinstance(doc, Document):
+                    docs.append(doc)
+        all_found = bool(codes) and all(
+            code in self.module_code_index for code in codes
+        )
+
+        with self._lock:
+            self.n_queries += 1
+            if docs:
+                self.n_fast_path_hits += 1
+            hit_rate, n_queries = self.fast_path_hit_rate, self.n_queries
+        if docs:
+            logger.debug(
+                f"Module code fast path hit for {codes}, hit rate "
+                f"{hit_rate:.1%} over {n_queries} queries"
+            )
+        return docs, all_found
+
+    @staticmethod
+    def _merge(direct_docs: list[Document], vector_docs: list[Document]):
+        seen = {doc.page_content for doc in direct_docs}
+        merged = list(direct_docs)
+        for doc in vector_docs:
+            if doc.page_content not in seen:
+                seen.add(doc.page_content)
+                merged.append(doc)
+        return merged
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        direct_docs, all_found = self._lookup(query)
+        if all_found and self.skip_vector_search:
+            return direct_docs
+        vector_docs = self.retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return self._merge(direct_docs, vector_docs)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        direct_docs, all_found = await run_in_executor(None, self._lookup, query)
+        if all_found and self.skip_vector_search:
+            return direct_docs
+        vector_docs = await self.retriever.ainvoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return self._merge(direct_docs, vector_docs)
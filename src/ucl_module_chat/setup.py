@@ -1,13 +1,7 @@
 import hydra
 import omegaconf
 from dotenv import load_dotenv
-from loguru import logger
 
-from ucl_module_chat.data_processing.document_conversion import (
-    convert_all_documents_html_to_markdown,
-)
-from ucl_module_chat.data_processing.document_embedding import embed_documents
-from ucl_module_chat.data_processing.document_scraping import scrape_documents
 from ucl_module_chat.utils.resolve_paths import get_abs_path_using_repo_root
 
 load_dotenv()
@@ -20,24 +14,50 @@ def main(cfg: omegaconf.DictConfig) -> None:
     cfg.setup.scrape_documents.output_dir = get_abs_path_using_repo_root(
         cfg.setup.scrape_documents.output_dir
     )
-    cfg.setup.convert_documents.input_dir = get_abs_path_using_repo_root(
-        cfg.setup.convert_documents.input_dir
-    )
-    cfg.setup.convert_documents.output_dir = get_abs_path_using_repo_root(
-        cfg.setup.convert_documents.output_dir
-    )
-    cfg.setup.embed_documents.input_dir = get_abs_path_using_repo_root(
-        cfg.setup.embed_documents.input_dir
-    )
+    for path_key in ["input_dir", "catalogue_path", "markdown_dir"]:
+        if cfg.setup.convert_documents[path_key] is not None:
+            cfg.setup.convert_documents[path_key] = get_abs_path_using_repo_root(
+                cfg.setup.convert_documents[path_key]
+            )
+    for path_key in ["input_dir", "catalogue_path", "cache_dir", "checkpoint_dir"]:
+        if cfg.setup.embed_documents[path_key] is not None:
+            cfg.setup.embed_documents[path_key] = get_abs_path_using_repo_root(
+                cfg.setup.embed_documents[path_key]
+            )
     cfg.vectorstore.dir = get_abs_path_using_repo_root(cfg.vectorstore.dir)
 
-    scrape_documents(**cfg.setup.scrape_documents)
-    convert_all_documents_html_to_markdown(**cfg.setup.convert_documents)
+    # Stages are imported here so that config errors are reported without first
+    # importing LangChain, FAISS and the HTML parsers
+    from ucl_module_chat.data_processing.document_conversion import (
+        convert_all_documents_html_to_markdown,
+    )
+    from ucl_module_chat.data_processing.document_embedding import (
+        embed_documents,
+        save_vectorstore,
+    )
+    from ucl_module_chat.data_processing.document_scraping import scrape_documents
+    from ucl_module_chat.data_processing.pipeline import run_pipeline
+    from ucl_module_chat.utils.http_clients import http_client_kwargs
 
-    embedding_model = hydra.utils.instantiate(cfg.models.embedding)
-    vectorstore = embed_documents(cfg.setup.embed_documents.input_dir, embedding_model)
-    vectorstore.save_local(cfg.vectorstore.dir)
-    logger.info(f"Vectorstore saved to {cfg.vectorstore.dir}")
+    embedding_model = hydra.utils.instantiate(
+        cfg.models.embedding, **http_client_kwargs(cfg.http.embedding)
+    )
+    if cfg.setup.pipeline.enabled:
+        vectorstore, _ = run_pipeline(
+            embedding_model=embedding_model,
+            scrape_config=cfg.setup.scrape_documents,
+            convert_config=cfg.setup.convert_documents,
+            embed_config=cfg.setup.embed_documents,
+            queue_size=cfg.setup.pipeline.queue_size,
+            report_interval_seconds=cfg.setup.pipeline.report_interval_seconds,
+        )
+    else:
+        scrape_documents(**cfg.setup.scrape_documents)
+        convert_all_documents_html_to_markdown(**cfg.setup.convert_documents)
+        vectorstore = embed_documents(
+            embedding_model=embedding_model, **cfg.setup.embed_documents
+        )
+    save_vectorstore(vectorstore, cfg.vectorstore.dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,43 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+def content_hash(content: str | bytes) -> str:
+    """Return the SHA-256 hex digest of a string or bytes."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+def atomic_write_text(path: str | Path, text: str) -> None:
+    """Write text to a file atomically.
+
+    The text is written to a temporary file in the same directory which then
+    replaces the target, so readers never see a partially written file.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def read_json(path: str | Path, default=None):
+    """Read a JSON file, returning `default` if it does not exist."""
+    path = Path(path)
+    if not path.exists():
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def atomic_write_json(path: str | Path, data) -> None:
+    """Write data to a JSON file atomically."""
+    atomic_write_text(path, json.dumps(data, indent=2, sort_keys=True))
@@ -0,0 +1,41 @@
+from collections.abc import Mapping
+
+import httpx
+import openai
+
+
+def _limits(pool: Mapping) -> httpx.Limits:
+    """Pool limits, where a limit of None is unbounded."""
+    if (
+        pool["max_connections"] is not None
+        and pool["max_keepalive_connections"] is not None
+        and pool["max_keepalive_connections"] > pool["max_connections"]
+    ):
+        raise ValueError(
+            f"max_keepalive_connections ({pool['max_keepalive_connections']}) must "
+            f"not exceed max_connections ({pool['max_connections']})"
+        )
+    return httpx.Limits(
+        max_connections=pool["max_connections"],
+        max_keepalive_connections=pool["max_keepalive_connections"],
+        keepalive_expiry=pool["keepalive_expiry"],
+    )
+
+
+def http_client_kwargs(pool: Mapping | None) -> dict:
+    """`http_client` and `http_async_client` arguments for an OpenAI model, so
+    that its sync and async calls use connection pools of the given size.
+
+    Each pool holds at most `max_connections` connections, of which up to
+    `max_keepalive_connections` idle connections are kept open for
+    `keepalive_expiry` seconds; either limit may be None for no limit, e.g. when
+    the LLM pool follows an unset `app.max_concurrent_llm_calls`. The OpenAI
+    client's defaults for timeouts and redirects are kept. Returns no arguments if
+    `pool` is None, e.g. for models from other providers.
+    """
+    if pool is None:
+        return {}
+    return {
+        "http_client": openai.DefaultHttpxClient(limits=_limits(pool)),
+        "http_async_client": openai.DefaultAsyncHttpxClient(limits=_limits(pool)),
+    }
@@ -0,0 +1,37 @@
+import resource
+import sys
+from pathlib import Path
+
+
+def _proc_status_bytes(field: str) -> int | None:
+    """Read a memory field, in bytes, from /proc/self/status (Linux only)."""
+    status_path = Path("/proc/self/status")
+    if not status_path.exists():
+        return None
+    for line in status_path.read_text().splitlines():
+        if line.startswith(f"{field}:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def current_rss_bytes() -> int:
+    """Return the resident set size of this process in bytes.
+
+    Read from /proc on Linux; elsewhere the peak RSS is returned instead.
+    """
+    rss = _proc_status_bytes("VmRSS")
+    if rss is not None:
+        return rss
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def private_rss_bytes() -> int | None:
+    """Return the anonymous (private, not file-backed) resident memory of this
+    process in bytes, or None if unavailable.
+
+    Memory-mapped files count towards RSS but are shared between processes via the
+    page cache, so this is the better measure of the cost of each extra worker.
+    """
+    return _proc_status_bytes("RssAnon")
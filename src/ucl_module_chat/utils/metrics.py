@@ -0,0 +1,149 @@
+import bisect
+import json
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from loguru import logger
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """Histogram of observed values in fixed buckets, with a running count and
+    sum, as used by Prometheus."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate the `q` quantile as the upper bound of the bucket it falls in."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+
+class RequestMetrics:
+    """Thread-safe aggregate of request traces from `TracingCallbackHandler`.
+
+    Keeps latency histograms for each request and stage, and counters of requests,
+    tokens by stage, retrieved documents, cache hits by layer, requests coalesced
+    with an identical in-flight request and speculative retrieval outcomes, with a
+    histogram of the latency saved by speculation. Each
+    trace is also appended to `jsonl_path`, if given.
+    """
+
+    def __init__(self, jsonl_path: str | Path | None = None):
+        self.jsonl_path = Path(jsonl_path) if jsonl_path is not None else None
+        if self.jsonl_path is not None:
+            self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+        self.histograms: dict[str, Histogram] = defaultdict(Histogram)
+        self.counters: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, trace: dict) -> None:
+        with self._lock:
+            self.counters["requests"] += 1
+            self.histograms["request"].observe(trace["total_seconds"])
+            for stage, seconds in trace["stage_seconds"].items():
+                self.histograms[stage].observe(seconds)
+            for stage, tokens in trace["tokens"].items():
+                for direction, n_tokens in tokens.items():
+                    self.counters[f"{stage}_{direction}_tokens"] += n_tokens
+            self.counters["retrieved_documents"] += len(trace["document_ids"])
+            for layer in trace["cache_hits"]:
+                self.counters[f"{layer}_cache_hits"] += 1
+            if trace.get("coalesced"):
+                self.counters["coalesced_requests"] += 1
+            speculation = trace.get("speculative_retrieval")
+            if speculation is not None:
+                self.counters[f"speculative_retrieval_{speculation['outcome']}"] += 1
+                self.histograms["speculation_latency_saved"].observe(
+                    speculation["latency_saved_seconds"]
+                )
+            if self.jsonl_path is not None:
+                with self.jsonl_path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps({"timestamp": time.time(), **trace}) + "\n")
+
+    def summary(self) -> dict:
+        """Counters, and the count and estimated p50/p95 of each histogram."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "latency_seconds": {
+                    name: {
+                        "count": h.count,
+                        "p50": h.quantile(0.5),
+                        "p95": h.quantile(0.95),
+                    }
+                    for name, h in self.histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE ucl_module_chat_{name}_total counter")
+                lines.append(f"ucl_module_chat_{name}_total {value}")
+            lines.append("# TYPE ucl_module_chat_latency_seconds histogram")
+            for stage, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip([*h.buckets, "+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(
+                        f'ucl_module_chat_latency_seconds_bucket{{stage="{stage}",'
+                        f'le="{bound}"}} {cumulative}'
+                    )
+                lines.append(
+                    f'ucl_module_chat_latency_seconds_sum{{stage="{stage}"}} {h.sum}'
+                )
+                lines.append(
+                    f'ucl_module_chat_latency_seconds_count{{stage="{stage}"}} '
+                    f"{h.count}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(
+    metrics: RequestMetrics, port: int, host: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    """Serve the metrics at http://host:port/metrics from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving metrics at http://{host}:{port}/metrics")
+    return server
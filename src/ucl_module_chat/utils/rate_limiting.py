@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to cap the global rate of requests.
+
+    Tokens are added continuously at `rate` per second up to `capacity`. Each call
+    to `acquire` blocks until enough tokens are available, so a bucket shared between
+    worker threads enforces a single global requests-per-second limit.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until `tokens` tokens can be taken from the bucket."""
+        if tokens > self.capacity:
+            raise ValueError(
+                f"Cannot acquire {tokens} tokens from bucket of capacity "
+                f"{self.capacity}"
+            )
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
@@ -1,17 +1,38 @@
 import os
+from functools import lru_cache
 from pathlib import Path
 
-from git import Repo
+# Set to the project root to skip the search, e.g. in a container without .git
+PROJECT_ROOT_ENV_VAR = "UCL_MODULE_CHAT_ROOT"
+PROJECT_ROOT_MARKERS = ("pyproject.toml", ".git")
 
 
-def get_abs_path_using_repo_root(path: str | Path) -> Path:
-    """Takes path relative to the repo root and returns the absolute path."""
+def _is_project_root(path: Path) -> bool:
+    return any((path / marker).exists() for marker in PROJECT_ROOT_MARKERS)
+
+
+@lru_cache(maxsize=1)
+def find_project_root() -> Path:
+    """Return the root directory of the project.
 
-    # Initialize the repo (this will automatically find the root if
-    # you're in a subdirectory)
-    repo = Repo(os.getcwd(), search_parent_directories=True)
+    Uses the UCL_MODULE_CHAT_ROOT environment variable if set. Otherwise, searches
+    upwards from the working directory, then from this file, for a directory
+    containing pyproject.toml or .git. Unlike asking git, this works when the
+    project is not a git checkout, and the result is cached so the filesystem is
+    only searched once per process.
+    """
+    if root := os.environ.get(PROJECT_ROOT_ENV_VAR):
+        return Path(root).resolve()
+    for start in [Path.cwd(), Path(__file__).resolve().parent]:
+        for path in [start, *start.parents]:
+            if _is_project_root(path):
+                return path
+    raise FileNotFoundError(
+        "Could not find the project root, set the "
+        f"{PROJECT_ROOT_ENV_VAR} environment variable"
+    )
 
-    # Get the root directory
-    repo_root = repo.git.rev_parse("--show-toplevel")
-    abs_path = Path(repo_root) / path
-    return abs_path
+
+def get_abs_path_using_repo_root(path: str | Path) -> Path:
+    """Takes path relative to the repo root and returns the absolute path."""
+    return find_project_root() / path
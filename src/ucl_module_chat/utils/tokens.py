@@ -0,0 +1,33 @@
+from functools import lru_cache
+
+from loguru import logger
+
+# Encoding used for models that tiktoken does not know, e.g. from other providers
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str | None):
+    """Load the tiktoken encoding of a model, or `DEFAULT_ENCODING` if the model is
+    not given or unknown, or return None if it is unavailable offline."""
+    try:
+        import tiktoken
+
+        if model_name is not None:
+            try:
+                return tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                logger.debug(f"No tiktoken encoding for {model_name}, using default")
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        logger.debug(f"tiktoken encoding unavailable ({e}), approximating tokens")
+        return None
+
+
+def count_tokens(text: str, model_name: str | None = None) -> int:
+    """Count tokens in text with the encoding of `model_name`, approximating as
+    four characters per token if the tiktoken encoding cannot be loaded."""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from ucl_module_chat.batch_qa import answered_ids, run_batch_qa
+
+
+def _write_jsonl(path: Path, records: list[dict]) -> None:
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+def _stub_chain(questions: list[str]) -> RunnableLambda:
+    async def answer(input: dict) -> dict:
+        questions.append(input["input"])
+        if "fail" in input["input"]:
+            raise ValueError("LLM failed")
+        context = [Document("", metadata={"module_code": "COMP0010"})]
+        return {"answer": f"Answer to {input['input']}", "context": context}
+
+    return RunnableLambda(answer)
+
+
+def test_batch_qa_resumes_after_answered_questions(tmp_path: Path):
+    input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    _write_jsonl(
+        input_path,
+        [{"id": i, "question": f"Question {i}"} for i in range(1, 5)],
+    )
+    # Question 1 answered, question 2 failed and question 3 cut off mid-write
+    _write_jsonl(
+        output_path,
+        [{"id": 1, "answer": "Answer"}, {"id": 2, "error": "ValueError()"}],
+    )
+    with open(output_path, "a") as f:
+        f.write('{"id": 3, "ans')
+
+    questions = []
+    summary = run_batch_qa(_stub_chain(questions), input_path, output_path)
+    assert sorted(questions) == ["Question 2", "Question 3", "Question 4"]
+    assert summary["n_answered"] == 3
+    assert answered_ids(output_path) == {1, 2, 3, 4}
+
+    lines = output_path.read_text().splitlines()
+    assert lines[2] == '{"id": 3, "ans'
+    new_records = [json.loads(line) for line in lines[3:]]
+    assert all(record["module_codes"] == ["COMP0010"] for record in new_records)
+
+    questions.clear()
+    run_batch_qa(_stub_chain(questions), input_path, output_path)
+    assert questions == []
+
+
+def test_failed_questions_are_recorded_and_retried(tmp_path: Path):
+    input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    _write_jsonl(input_path, [{"question": "ok"}, {"question": "fail"}])
+
+    questions = []
+    summary = run_batch_qa(_stub_chain(questions), input_path, output_path)
+    assert summary["n_answered"] == 1 and summary["n_errors"] == 1
+    assert answered_ids(output_path) == {1}
+
+    questions.clear()
+    run_batch_qa(_stub_chain(questions), input_path, output_path)
+    assert questions == ["fail"]
+
+    questions.clear()
+    run_batch_qa(_stub_chain(questions), input_path, output_path, resume=False)
+    assert sorted(questions) == ["fail", "ok"]
+    assert len(output_path.read_text().splitlines()) == 2
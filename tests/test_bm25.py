@@ -0,0 +1,54 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from ucl_module_chat.benchmarks.stub_models import HashingEmbeddings
+from ucl_module_chat.benchmarks.synthetic_catalogue import build_synthetic_vectorstore
+from ucl_module_chat.chains.rag_chain import build_retriever
+from ucl_module_chat.retrieval.bm25 import BM25Index, HybridRetriever
+
+
+def test_bm25_ranks_documents_with_query_terms_first():
+    index = BM25Index.from_texts(
+        ["medical statistics", "machine learning", "statistics of learning"]
+    )
+    positions = [position for position, _ in index.search("medical statistics", 3)]
+    assert positions[0] == 0
+    assert 1 not in positions
+
+
+def test_reciprocal_rank_fusion_favours_documents_in_both_rankings():
+    a, b, c = (Document(page_content=text) for text in "abc")
+    retriever = HybridRetriever.model_construct(k=2, rrf_k=60)
+    assert retriever._fuse([a, b], [c, b]) == [b, a]
+
+
+@pytest.fixture(scope="module")
+def vectorstore_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    vectorstore_dir = tmp_path_factory.mktemp("vectorstore")
+    build_synthetic_vectorstore(vectorstore_dir, 50, HashingEmbeddings(size=64))
+    return vectorstore_dir
+
+
+def _retriever(vectorstore_dir: Path, retrieval_mode: str) -> BaseRetriever:
+    return build_retriever(
+        HashingEmbeddings(size=64),
+        vectorstore_dir,
+        module_code_lookup=False,
+        retrieval_mode=retrieval_mode,
+    )
+
+
+@pytest.mark.parametrize("retrieval_mode", ["dense", "lexical", "hybrid"])
+def test_async_retrieval_matches_sync(vectorstore_dir: Path, retrieval_mode: str):
+    retriever = _retriever(vectorstore_dir, retrieval_mode)
+    query = "Are there any modules on statistics and programming?"
+    sync_docs = retriever.invoke(query)
+    async_docs = asyncio.run(retriever.ainvoke(query))
+    assert len(sync_docs) == 4
+    assert [doc.page_content for doc in async_docs] == [
+        doc.page_content for doc in sync_docs
+    ]
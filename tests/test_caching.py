@@ -0,0 +1,93 @@
+import asyncio
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+from ucl_module_chat.chains.caching import CachedQueryEmbeddings, RagCache, TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(ttl_seconds=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 0, "hits": 0, "misses": 1, "evictions": 1}
+
+
+def _rebuild(vectorstore_dir: Path) -> None:
+    index_path = vectorstore_dir / "index.faiss"
+    index_path.write_bytes(index_path.read_bytes() + b"rebuilt")
+
+
+def test_cache_is_cleared_when_vectorstore_is_rebuilt(tmp_path: Path):
+    (tmp_path / "index.faiss").write_bytes(b"index")
+    cache = RagCache(tmp_path, check_interval_seconds=0)
+    cache.retrieval.set("query", ["doc"])
+    cache.check_vectorstore()
+    assert cache.retrieval.get("query") == ["doc"]
+
+    _rebuild(tmp_path)
+    cache.check_vectorstore()
+    assert cache.retrieval.get("query") is None
+
+
+def test_vectorstore_is_checked_at_most_every_interval(tmp_path: Path):
+    (tmp_path / "index.faiss").write_bytes(b"index")
+    cache = RagCache(tmp_path, check_interval_seconds=3600)
+    cache.retrieval.set("query", ["doc"])
+    _rebuild(tmp_path)
+    cache.check_vectorstore()
+    assert cache.retrieval.get("query") == ["doc"]
+
+
+def test_semantic_answer_cache_matches_similar_questions(tmp_path: Path):
+    cache = RagCache(tmp_path, similarity_threshold=0.9)
+    result = {"answer": "Yes", "context": []}
+    cache.store_answer("Tell me about COMP0001", [1.0, 0.0], result)
+    assert cache.lookup_answer("Describe COMP0001", [1.0, 0.1]) == result
+    # Different module codes or dissimilar embeddings are not matched
+    assert cache.lookup_answer("Describe COMP0002", [1.0, 0.1]) is None
+    assert cache.lookup_answer("Describe COMP0001", [0.0, 1.0]) is None
+    assert cache.answers.stats()["hits"] == 1
+    assert cache.answers.stats()["misses"] == 2
+
+
+class _CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append("embed_documents")
+        return [[1.0] for _ in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls.append("embed_query")
+        return [1.0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append("aembed_documents")
+        return [[1.0] for _ in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        self.calls.append("aembed_query")
+        return [1.0]
+
+
+def test_cached_query_embeddings_use_native_async_calls():
+    embedding_model = _CountingEmbeddings()
+    embeddings = CachedQueryEmbeddings(embedding_model, TTLCache())
+    assert asyncio.run(embeddings.aembed_query("query")) == [1.0]
+    assert asyncio.run(embeddings.aembed_query("query")) == [1.0]
+    assert embeddings.embed_query("query") == [1.0]
+    asyncio.run(embeddings.aembed_documents(["a", "b"]))
+    assert embedding_model.calls == ["aembed_query", "aembed_documents"]
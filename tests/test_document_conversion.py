@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from ucl_module_chat.benchmarks.synthetic_catalogue import write_synthetic_html_corpus
+from ucl_module_chat.data_processing.document_conversion import (
+    convert_all_documents_html_to_markdown,
+)
+
+
+def test_unchanged_pages_are_skipped_unless_parser_options_change(tmp_path: Path):
+    html_dir = tmp_path / "html"
+    catalogue_path = tmp_path / "catalogue.sqlite"
+    write_synthetic_html_corpus(html_dir, 10)
+
+    stats = convert_all_documents_html_to_markdown(html_dir, catalogue_path)
+    assert len(stats.converted) == 10
+
+    stats = convert_all_documents_html_to_markdown(html_dir, catalogue_path)
+    assert (len(stats.converted), len(stats.skipped)) == (0, 10)
+
+    stats = convert_all_documents_html_to_markdown(
+        html_dir, catalogue_path, targeted_parse=True
+    )
+    assert len(stats.converted) == 10
+
+
+def test_removed_pages_are_removed_from_the_catalogue(tmp_path: Path):
+    html_dir = tmp_path / "html"
+    markdown_dir = tmp_path / "module_md"
+    write_synthetic_html_corpus(html_dir, 5)
+    convert_all_documents_html_to_markdown(
+        html_dir, tmp_path / "catalogue.sqlite", markdown_dir=markdown_dir
+    )
+    removed_path = sorted(html_dir.glob("*.html"))[0]
+    removed_path.unlink()
+
+    stats = convert_all_documents_html_to_markdown(
+        html_dir, tmp_path / "catalogue.sqlite", markdown_dir=markdown_dir
+    )
+    assert stats.removed == [removed_path.stem]
+    assert sorted(path.stem for path in markdown_dir.glob("*.md")) == sorted(
+        path.stem for path in html_dir.glob("*.html")
+    )
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import pytest
+
+from ucl_module_chat.benchmarks.stub_models import HashingEmbeddings
+from ucl_module_chat.benchmarks.synthetic_catalogue import build_synthetic_vectorstore
+from ucl_module_chat.data_processing.document_embedding import (
+    embed_documents,
+    save_vectorstore,
+)
+from ucl_module_chat.retrieval.docstore import load_vectorstore
+from ucl_module_chat.retrieval.faiss_index import configure_search
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "ivfsq"])
+def test_update_keeps_documents_retrievable(tmp_path: Path, index_type: str):
+    """After an update that removes and changes documents, each document is still
+    its own nearest neighbour."""
+    embedding_model = HashingEmbeddings(size=64)
+    index_config = {"index_type": index_type, "nlist": 4}
+    build_synthetic_vectorstore(
+        tmp_path, 200, embedding_model, index_config=index_config
+    )
+    md_paths = sorted((tmp_path / "module_md").glob("*.md"))
+    for md_path in md_paths[:20]:
+        md_path.unlink()
+        md_path.with_suffix(".json").unlink()
+    changed_path = md_paths[20]
+    changed_path.write_text(
+        changed_path.read_text(encoding="utf-8") + "\nUpdated.\n", encoding="utf-8"
+    )
+
+    vectorstore = embed_documents(
+        tmp_path / "module_md",
+        embedding_model,
+        output_dir=tmp_path,
+        update=True,
+        index_config=index_config,
+    )
+    save_vectorstore(vectorstore, tmp_path)
+    vectorstore = load_vectorstore(tmp_path, embedding_model)
+    if index_type != "flat":
+        configure_search(vectorstore.index, nprobe=4)
+
+    assert vectorstore.index.ntotal == 180
+    for doc_id in vectorstore.index_to_docstore_id.values():
+        doc = vectorstore.docstore.search(doc_id)
+        vector = embedding_model.embed_query(doc.page_content)
+        [(top_doc, _)] = vectorstore.similarity_search_with_score_by_vector(vector, k=1)
+        assert top_doc.id == doc_id
@@ -0,0 +1,63 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from ucl_module_chat.benchmarks.stub_catalogue_server import StubCatalogueServer
+from ucl_module_chat.data_processing.document_scraping import scrape_documents
+from ucl_module_chat.utils.rate_limiting import TokenBucket
+
+
+def test_token_bucket_caps_request_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+def test_token_bucket_rejects_invalid_arguments():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, capacity=1).acquire(2)
+
+
+def _scrape(server: StubCatalogueServer, output_dir: Path, **kwargs):
+    return scrape_documents(
+        server.index_page_url,
+        output_dir,
+        server.regex_url_pattern,
+        requests_per_second=1000,
+        backoff_seconds=0,
+        **kwargs,
+    )
+
+
+def test_failed_requests_are_retried(tmp_path: Path):
+    with StubCatalogueServer(n_modules=20, failure_rate=0.5) as server:
+        stats = _scrape(server, tmp_path, max_retries=10)
+        assert server.n_requests > 21
+    assert stats.n_errors == 0
+    assert len(stats.new) == 20
+    assert len(list(tmp_path.glob("*.html"))) == 20
+
+
+def test_requests_fail_once_retries_are_exhausted(tmp_path: Path):
+    with StubCatalogueServer(n_modules=5, failure_rate=1.0) as server:
+        stats = _scrape(server, tmp_path, max_retries=2)
+        assert server.n_requests == 1 + 5 * 3
+    assert stats.n_errors == 5
+
+
+def test_rescraping_detects_changed_and_deleted_pages(tmp_path: Path):
+    with StubCatalogueServer(n_modules=10) as server:
+        _scrape(server, tmp_path)
+        changed, deleted = sorted(server.pages)[:2]
+        server.update_page(changed, server.pages[changed] + "<p>Updated</p>")
+        server.remove_page(deleted)
+        stats = _scrape(server, tmp_path)
+    assert stats.changed == [Path(changed).name]
+    assert stats.deleted == [Path(deleted).name]
+    assert len(stats.unchanged) == 8
+    assert not (tmp_path / f"{Path(deleted).name}.html").exists()
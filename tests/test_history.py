@@ -0,0 +1,55 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from ucl_module_chat.benchmarks.stub_models import SimulatedLatencyChatModel
+from ucl_module_chat.chains.history import HistoryManager, split_turns
+
+
+def _conversation(n_turns: int) -> list:
+    messages = []
+    for i in range(n_turns):
+        messages += [HumanMessage(f"Question {i}"), AIMessage(f"Answer {i}")]
+    return messages
+
+
+def test_split_turns_starts_a_turn_at_each_user_message():
+    turns = split_turns([AIMessage("Hello")] + _conversation(2))
+    assert [len(turn) for turn in turns] == [1, 2, 2]
+
+
+def test_history_within_budget_is_unchanged():
+    manager = HistoryManager(max_turns=6)
+    messages = _conversation(6)
+    assert manager.compact("session", messages) == messages
+
+
+def test_turns_beyond_budget_are_dropped_without_an_llm():
+    manager = HistoryManager(max_turns=3)
+    assert manager.compact("session", _conversation(5)) == _conversation(5)[4:]
+
+
+def test_turns_beyond_budget_are_summarised():
+    llm = SimulatedLatencyChatModel(response="Summary", latency_seconds=0)
+    manager = HistoryManager(llm, max_turns=4)
+    messages = _conversation(5)
+    compacted = asyncio.run(manager.acompact("session", messages))
+    # Enough turns are folded to bring the history down to half the budget
+    assert compacted == [
+        SystemMessage("Summary of the earlier conversation: Summary"),
+        *messages[6:],
+    ]
+    assert llm.n_calls == 1
+
+    # The summary is reused until the history outgrows the budget again
+    messages += _conversation(6)[10:]
+    assert manager.compact("session", messages)[1:] == messages[6:]
+    assert llm.n_calls == 1
+
+
+def test_summary_is_recomputed_if_earlier_history_changes():
+    llm = SimulatedLatencyChatModel(response="Summary", latency_seconds=0)
+    manager = HistoryManager(llm, max_turns=4)
+    manager.compact("session", _conversation(5))
+    manager.compact("session", [HumanMessage("New question")] + _conversation(5))
+    assert llm.n_calls == 2
@@ -0,0 +1,34 @@
+import pytest
+
+from ucl_module_chat.utils.http_clients import _limits, http_client_kwargs
+
+POOL = {"max_connections": 8, "max_keepalive_connections": 4, "keepalive_expiry": 60}
+
+
+def test_limits_are_applied():
+    limits = _limits(POOL)
+    assert limits.max_connections == 8
+    assert limits.max_keepalive_connections == 4
+    assert limits.keepalive_expiry == 60
+
+
+def test_unset_limits_are_unbounded():
+    limits = _limits(
+        {**POOL, "max_connections": None, "max_keepalive_connections": None}
+    )
+    assert limits.max_connections is None
+    assert limits.max_keepalive_connections is None
+    assert _limits({**POOL, "max_connections": None}).max_keepalive_connections == 4
+
+
+def test_more_keepalive_than_connections_is_rejected():
+    with pytest.raises(ValueError):
+        _limits({**POOL, "max_keepalive_connections": 16})
+
+
+def test_no_pool_gives_no_client_arguments():
+    assert http_client_kwargs(None) == {}
+    kwargs = http_client_kwargs(
+        {**POOL, "max_connections": None, "max_keepalive_connections": None}
+    )
+    assert set(kwargs) == {"http_client", "http_async_client"}
@@ -0,0 +1,69 @@
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from ucl_module_chat.benchmarks.stub_models import HashingEmbeddings
+from ucl_module_chat.retrieval.metadata import MetadataIndex, infer_filters
+
+MODULES = [
+    {
+        "teaching_department": "Computer Science",
+        "credit_value": "15",
+        "level": "Undergraduate (FHEQ Level 6)",
+        "teaching_term": "Term 1",
+    },
+    {
+        "teaching_department": "Statistical Science",
+        "credit_value": "15",
+        "level": "Postgraduate (FHEQ Level 7)",
+        "teaching_term": "Term 2",
+    },
+    {
+        "teaching_department": "Computer Science",
+        "credit_value": "30",
+        "level": "Postgraduate (FHEQ Level 7)",
+        "teaching_term": "Term 1 and Term 2",
+        "deliveries": [{"type": "Undergraduate", "fheq_level": "6"}],
+    },
+]
+
+
+@pytest.fixture(scope="module")
+def metadata_index() -> MetadataIndex:
+    docs = [
+        Document(f"Module {i}", metadata=metadata) for i, metadata in enumerate(MODULES)
+    ]
+    vectorstore = FAISS.from_documents(docs, HashingEmbeddings(size=16))
+    return MetadataIndex.from_vectorstore(vectorstore)
+
+
+def test_select_combines_values_with_or_and_columns_with_and(
+    metadata_index: MetadataIndex,
+):
+    assert metadata_index.select({"teaching_term": ["Term 2"]}).tolist() == [1, 2]
+    assert metadata_index.select({"level_type": ["Undergraduate"]}).tolist() == [0, 2]
+    assert metadata_index.select(
+        {"teaching_department": ["Computer Science"], "credit_value": ["15", "30"]}
+    ).tolist() == [0, 2]
+    assert metadata_index.select({"fheq_level": ["5"]}).tolist() == []
+
+
+def test_filters_are_inferred_from_the_question(metadata_index: MetadataIndex):
+    question = "Which 15-credit postgraduate computer science modules run in term 2?"
+    assert infer_filters(question, metadata_index) == {
+        "level_type": ["Postgraduate"],
+        "teaching_term": ["Term 2"],
+        "credit_value": ["15"],
+        "teaching_department": ["Computer Science"],
+    }
+
+
+def test_only_known_and_unambiguous_values_are_inferred(
+    metadata_index: MetadataIndex,
+):
+    assert infer_filters("Undergraduate or masters modules?", metadata_index) == {}
+    assert infer_filters("Any 45 credit modules in term 3?", metadata_index) == {}
+    assert infer_filters("Level 7 modules in terms 1 and 2", metadata_index) == {
+        "teaching_term": ["Term 1", "Term 2"],
+        "fheq_level": ["7"],
+    }
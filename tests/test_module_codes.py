@@ -0,0 +1,45 @@
+import asyncio
+import shutil
+from pathlib import Path
+
+from ucl_module_chat.benchmarks.stub_models import HashingEmbeddings
+from ucl_module_chat.benchmarks.synthetic_catalogue import build_synthetic_vectorstore
+from ucl_module_chat.retrieval.docstore import load_vectorstore
+from ucl_module_chat.retrieval.module_codes import (
+    MODULE_CODE_INDEX_FILENAME,
+    ModuleCodeRetriever,
+    build_module_code_index,
+    load_module_code_index,
+)
+
+EMBEDDING_MODEL = HashingEmbeddings(size=64)
+
+
+def test_stale_module_code_index_is_rebuilt(tmp_path: Path):
+    build_synthetic_vectorstore(tmp_path / "old", 20, EMBEDDING_MODEL)
+    build_synthetic_vectorstore(tmp_path / "new", 30, EMBEDDING_MODEL)
+    shutil.copy(
+        tmp_path / "old" / MODULE_CODE_INDEX_FILENAME,
+        tmp_path / "new" / MODULE_CODE_INDEX_FILENAME,
+    )
+    vectorstore = load_vectorstore(tmp_path / "new", EMBEDDING_MODEL)
+    module_code_index = load_module_code_index(tmp_path / "new", vectorstore)
+    assert module_code_index == build_module_code_index(vectorstore)
+    assert len(module_code_index) == 30
+
+
+def test_module_codes_in_query_are_looked_up_directly(tmp_path: Path):
+    build_synthetic_vectorstore(tmp_path, 20, EMBEDDING_MODEL)
+    vectorstore = load_vectorstore(tmp_path, EMBEDDING_MODEL)
+    module_code_index = load_module_code_index(tmp_path, vectorstore)
+    module_code = sorted(module_code_index)[0]
+    retriever = ModuleCodeRetriever(
+        retriever=vectorstore.as_retriever(search_kwargs={"k": 4}),
+        vectorstore=vectorstore,
+        module_code_index=module_code_index,
+        skip_vector_search=True,
+    )
+    docs = asyncio.run(retriever.ainvoke(f"Tell me about {module_code}"))
+    assert [doc.metadata["module_code"] for doc in docs] == [module_code]
+    retriever.invoke("Which modules cover statistics?")
+    assert (retriever.n_queries, retriever.n_fast_path_hits) == (2, 1)
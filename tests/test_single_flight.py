@@ -0,0 +1,104 @@
+import asyncio
+from typing import AsyncIterator
+
+from langchain_core.runnables import RunnableGenerator, RunnableLambda
+
+from ucl_module_chat.chains.single_flight import SingleFlightRunnable
+
+
+class _StubChain:
+    """Stub RAG chain that streams an answer slowly and records its executions."""
+
+    def __init__(self, error: Exception | None = None):
+        self.inputs = []
+        self.n_cancelled = 0
+        self.error = error
+
+    async def _astream(self, inputs: AsyncIterator[dict]) -> AsyncIterator[dict]:
+        async for input in inputs:
+            self.inputs.append(input)
+            try:
+                for token in ["An ", "answer"]:
+                    await asyncio.sleep(0.05)
+                    yield {"answer": token}
+                    if self.error is not None:
+                        raise self.error
+            except asyncio.CancelledError:
+                self.n_cancelled += 1
+                raise
+
+    def runnable(self) -> RunnableGenerator:
+        return RunnableGenerator(self._astream)
+
+
+def _request(question: str) -> dict:
+    return {"input": question, "chat_history": []}
+
+
+def test_identical_concurrent_requests_share_one_execution():
+    chain = _StubChain()
+    single_flight = SingleFlightRunnable(chain.runnable())
+
+    async def run() -> list[dict]:
+        return await asyncio.gather(
+            *(single_flight.ainvoke(_request("What is COMP0010?")) for _ in range(4)),
+            single_flight.ainvoke(_request("  what is   comp0010? ")),
+            single_flight.ainvoke(_request("What is COMP0020?")),
+        )
+
+    results = asyncio.run(run())
+    assert all(result == {"answer": "An answer"} for result in results)
+    assert len(chain.inputs) == 2
+    assert single_flight.stats() == {"executions": 2, "coalesced": 4}
+
+
+def test_requests_after_an_execution_finishes_run_the_chain_again():
+    chain = _StubChain()
+    single_flight = SingleFlightRunnable(chain.runnable())
+
+    async def run() -> None:
+        for _ in range(2):
+            await single_flight.ainvoke(_request("What is COMP0010?"))
+
+    asyncio.run(run())
+    assert len(chain.inputs) == 2
+    assert single_flight.stats() == {"executions": 2, "coalesced": 0}
+
+
+def test_errors_are_raised_to_every_caller():
+    chain = _StubChain(error=ValueError("LLM failed"))
+    single_flight = SingleFlightRunnable(chain.runnable())
+
+    async def run() -> list:
+        return await asyncio.gather(
+            *(single_flight.ainvoke(_request("What is COMP0010?")) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(chain.inputs) == 1
+
+
+def test_execution_is_cancelled_when_every_caller_stops():
+    chain = _StubChain()
+    single_flight = SingleFlightRunnable(chain.runnable())
+
+    async def run() -> None:
+        stream = single_flight.astream(_request("What is COMP0010?"))
+        assert await stream.__anext__() == {"answer": "An "}
+        await stream.aclose()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert chain.n_cancelled == 1
+
+
+def test_sync_calls_are_passed_through():
+    single_flight = SingleFlightRunnable(
+        RunnableLambda(lambda x: {"answer": x["input"]})
+    )
+    assert single_flight.invoke(_request("What is COMP0010?")) == {
+        "answer": "What is COMP0010?"
+    }
+    assert single_flight.stats() == {"executions": 0, "coalesced": 0}
@@ -0,0 +1,28 @@
+import pytest
+import tiktoken
+
+from ucl_module_chat.utils import tokens
+
+
+@pytest.fixture(autouse=True)
+def fake_encodings(monkeypatch: pytest.MonkeyPatch):
+    """Resolve encodings by name, without downloading their files."""
+    monkeypatch.setattr(
+        tiktoken,
+        "encoding_for_model",
+        lambda model_name: tiktoken.model.encoding_name_for_model(model_name),
+    )
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: name)
+    tokens._get_encoding.cache_clear()
+    yield
+    tokens._get_encoding.cache_clear()
+
+
+def test_encoding_follows_the_model():
+    assert tokens._get_encoding("gpt-4o-mini") == "o200k_base"
+    assert tokens._get_encoding("gpt-4") == "cl100k_base"
+
+
+def test_unknown_or_unset_models_use_the_default_encoding():
+    assert tokens._get_encoding("some-other-model") == tokens.DEFAULT_ENCODING
+    assert tokens._get_encoding(None) == tokens.DEFAULT_ENCODING